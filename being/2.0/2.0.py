@@ -2,23 +2,93 @@ import os
 import sys
 import json
 import time
+
+# 启动耗时记录（--profile-startup）
+STARTUP_MARKS = [("进程启动", time.perf_counter())]
+IMPORT_TIMES = []
+
 import threading
-import tkinter as tk
-from tkinter import ttk, messagebox
 import subprocess
 import datetime
-import winreg
 import platform
 import ctypes
-from PIL import Image, ImageDraw, ImageFont
-import pystray
-import keyboard
 import logging
 import logging.handlers
+import importlib
+import atexit
+import queue
 from pathlib import Path
+from collections import deque
+import re
 import shutil
 import tempfile
 import webbrowser
+import hashlib
+import hmac
+from xml.sax.saxutils import escape as xml_escape
+from multiprocessing.connection import Listener, Client
+from restart_supervisor import RestartSupervisor
+
+if platform.system() == "Windows":
+    import winreg
+
+STARTUP_MARKS.append(("导入标准库", time.perf_counter()))
+
+# Tk 在创建主窗口时才导入（单实例检查和参数转发之后），无界面模式和常驻服务模式下不加载；
+# PIL、pystray、keyboard 等在首次使用时才导入
+SERVICE = "--service" in sys.argv
+HEADLESS = "--headless" in sys.argv or SERVICE
+START_MINIMIZED = "--minimized" in sys.argv
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+# 命令行子命令（如 logs），不启动界面
+CLI_COMMANDS = ("logs", "list", "add", "rm", "enable", "disable", "import", "export", "next")
+CLI = len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS
+# 可转发给正在运行实例的参数；--shutdown-in、--snooze 后跟分钟数
+FORWARD_FLAGS = ("--show", "--shutdown-in", "--cancel", "--snooze")
+tk = ttk = messagebox = None
+
+# 延迟初始化在首帧绘制后多久执行（毫秒）
+STARTUP_DEFER_MS = 100
+
+def lazy_import(module_name):
+    """首次使用时再导入较重的模块，并记录导入耗时"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES.append((module_name, time.perf_counter() - start))
+    return module
+
+def load_tk():
+    """导入 tkinter（只在真正需要界面时）"""
+    global tk, ttk, messagebox
+    if tk is None:
+        tk = lazy_import("tkinter")
+        ttk = lazy_import("tkinter.ttk")
+        messagebox = lazy_import("tkinter.messagebox")
+    return tk
+
+def mark_startup(phase):
+    STARTUP_MARKS.append((phase, time.perf_counter()))
+
+def report_startup():
+    """输出启动各阶段及延迟导入的耗时"""
+    if not PROFILE_STARTUP:
+        return
+    lines = ["启动耗时分析:"]
+    previous = STARTUP_MARKS[0][1]
+    for phase, stamp in STARTUP_MARKS[1:]:
+        lines.append(f"  {phase:<16} {(stamp - previous) * 1000:8.1f} ms  (累计 {(stamp - STARTUP_MARKS[0][1]) * 1000:.1f} ms)")
+        previous = stamp
+    for module_name, cost in IMPORT_TIMES:
+        lines.append(f"  导入 {module_name:<13} {cost * 1000:8.1f} ms  (延迟导入)")
+    report = "\n".join(lines)
+    logging.info(report)
+    try:
+        print(report, flush=True)
+    except Exception:
+        pass
 
 # 常量定义
 APP_NAME = "懒人关机器"
@@ -33,8 +103,98 @@ else:
 # 确保目录存在
 CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 CONFIG_FILE = CONFIG_DIR / "lazy_shutdown_config.json"
+GUARDIAN_METRICS_FILE = CONFIG_DIR / "Logs" / "Guardian.metrics.json"
+
+# 日志查询：各来源的日志文件（含轮转文件），及旁路索引
+LOG_SOURCES = {
+    "main": CONFIG_DIR / "lazy_shutdown.log",
+    "guardian": CONFIG_DIR / "Logs" / "Guardian.log",
+}
+LOG_INDEX_VERSION = 2
+LOG_INDEX_HEAD = 256  # 用文件开头多少字节判断日志是否被替换（轮转）
+LOG_VIEW_LIMIT = 2000  # 设置页中最多显示的记录数
+LOG_RECORD_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}):\d{2}[^\n]*", re.M)
+LOG_SCHEDULE_RE = re.compile("计划 '(.+?)'".encode("utf-8"))
 
 AUTO_START_KEY = r"Software\Microsoft\Windows\CurrentVersion\Run"
+AUTO_START_NAME = "LazyShutdown"  # 注册表值名 / 任务计划名
+AUTO_START_TASK_FILE = Path(os.getenv('SystemRoot', r"C:\Windows")) / "System32" / "Tasks" / AUTO_START_NAME
+AUTO_START_CACHE = CONFIG_DIR / "autostart_state.json"  # 自启动任务的探测结果缓存
+CONFIG_CHANGED_EVENT = "Local\\LazyShutdownConfigChanged"  # 通知守护进程重新加载配置
+
+# 本地 IPC（Windows 使用命名管道，其他平台使用 Unix 套接字）
+if platform.system() == "Windows":
+    IPC_ADDRESS = r"\\.\pipe\LazyShutdownIPC"
+    IPC_FAMILY = "AF_PIPE"
+else:
+    IPC_ADDRESS = str(CONFIG_DIR / "ipc.sock")
+    IPC_FAMILY = "AF_UNIX"
+IPC_KEY_FILE = CONFIG_DIR / "ipc.key"
+# 命名管道的访问控制：默认 DACL 只给 Everyone 读权限，未提权的命令行连不上以管理员身份运行的实例；
+# 这里允许交互式登录的用户读写（仍需共享密钥），拒绝网络访问
+IPC_PIPE_SDDL = "D:(D;;GA;;;NU)(A;;GA;;;SY)(A;;GA;;;BA)(A;;GA;;;OW)(A;;GRGW;;;IU)"
+REMOTE_POLL_MS = 3000  # 客户端检查服务端配置变化的间隔（毫秒）
+CLIENT_WAIT_TIMEOUT = 20  # 界面客户端等待“显示到前台”请求的长轮询超时（秒）
+CLIENT_START_GRACE = 15   # 刚启动、尚未登记的界面客户端在这段时间内视为存在，不重复启动（秒）
+
+# 本机 HTTP/JSON-RPC 控制接口（可选，供管理工具使用）
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+API_TOKEN_FILE = CONFIG_DIR / "api.token"  # 通过 TCP 访问时的 Bearer 令牌
+API_WORKERS = 8  # 执行请求的线程数，事件循环本身不做可能阻塞的操作
+API_MAX_BODY = 1024 * 1024
+API_IDLE_TIMEOUT = 30  # 保持连接空闲多久后关闭（秒）
+API_HTTP_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                    405: "Method Not Allowed", 413: "Payload Too Large"}
+
+# Prometheus 指标：直方图分桶上界（秒）
+FIRE_LATENESS_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 300)
+CONFIG_SAVE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+# 托盘图标：按状态预先渲染的颜色变体，提示文字显示下一次关机
+TRAY_STATE_COLORS = {
+    "idle": "#8a8f98",   # 没有启用的计划
+    "armed": "#4b6eaf",  # 有待执行的计划
+    "soon": "#d9822b",   # 即将执行
+}
+TRAY_SOON_MINUTES = 10
+TRAY_REFRESH_MS = 30000
+
+# 界面事件总线：工作线程投递，Tk 主循环定时取出
+EVENT_BUS_POLL_MS = 100
+EVENT_BUS_BATCH = 1000  # 每次最多取出的事件数，避免积压时卡住界面
+EVENT_CALL = "call"  # 在界面线程执行的回调
+EVENT_SCHEDULE_FIRED = "schedule_fired"
+EVENT_SCHEDULE_REMOVED = "schedule_removed"
+EVENT_CONFIG_CHANGED = "config_changed"
+EVENT_GUARDIAN_STATE = "guardian_state"
+EVENT_HOTKEY_STATE = "hotkey_state"
+EVENT_QUICK_ACTION = "quick_action"  # 快捷定时、取消、推迟（不涉及配置，界面无需重建）
+EVENT_SHOW_WINDOW = "show_window"  # 第二个实例转发了 --show
+GUARDIAN_STATE_TEXT = {
+    "stopped": "",
+    "running": "守护进程运行中",
+    "restarting": "守护进程重启中",
+    "tripped": "守护进程频繁退出，已暂停重启",
+}
+
+# 全局热键注册失败后的重试间隔（秒，指数退避）
+HOTKEY_RETRY_BASE = 5
+HOTKEY_RETRY_MAX = 600
+# 无法查询系统按键状态时，超过这么多秒没有新的按下事件的键视为已松开（抬起事件丢失）
+HOTKEY_STALE_AFTER = 10
+QUICK_TIMER_NAME = "快捷定时"
+QUICK_PENDING_WINDOW = 60  # 取消/推迟只作用于这么多分钟内将要执行的操作
+HOTKEY_STATE_TEXT = {
+    "unregistered": "未设置",
+    "registered": "已注册",
+    "failed": "注册失败",
+}
+
+# 界面卡顿监测
+UI_WATCHDOG_TICK_MS = 100
+UI_WATCHDOG_SAMPLES = 3000  # 约最近 5 分钟的延迟样本
+UI_STALL_LOG = CONFIG_DIR / "ui_stall.log"
 
 # 关机类型映射
 SHUTDOWN_TYPES = {
@@ -45,6 +205,20 @@ SHUTDOWN_TYPES = {
     "休眠": "shutdown /h"
 }
 
+# Linux 下交给系统计划时使用的命令
+LINUX_SHUTDOWN_TYPES = {
+    "关机": "systemctl poweroff",
+    "重启": "systemctl reboot",
+    "注销": "loginctl terminate-user $USER",
+    "睡眠": "systemctl suspend",
+    "休眠": "systemctl hibernate"
+}
+
+# 交给系统计划程序时使用的任务文件夹 / crontab 标记
+OFFLOAD_TASK_FOLDER = "LazyShutdownSchedules"
+CRON_BEGIN = "# BEGIN LazyShutdown schedules"
+CRON_END = "# END LazyShutdown schedules"
+
 # 默认配置
 DEFAULT_CONFIG = {
     "auto_start": False,
@@ -54,6 +228,27 @@ DEFAULT_CONFIG = {
     "schedules": [],
     "run_as_admin": True,
     "use_task_scheduler": False,
+    "service_mode": False,  # 常驻服务 + 按需启动的界面客户端
+    "offload_schedules": False,  # 把计划交给系统计划程序执行
+    "ui_watchdog": False,  # 记录界面事件循环延迟，卡顿时转储线程栈
+    "ui_stall_threshold_ms": 1000,
+    # 快捷操作热键：组合键 -> shutdown_in:分钟 / cancel / snooze:分钟
+    "quick_hotkeys_enabled": False,
+    "quick_hotkeys": {
+        "ctrl+alt+3": "shutdown_in:30",
+        "ctrl+alt+6": "shutdown_in:60",
+        "ctrl+alt+9": "shutdown_in:90",
+        "ctrl+alt+c": "cancel",
+        "ctrl+alt+s": "snooze:15",
+    },
+    "log_level": "INFO",
+    "log_json": False,  # 额外以 JSON Lines 格式写出结构化日志
+    "api_enabled": False,  # 本机 HTTP/JSON-RPC 控制接口
+    "api_port": API_PORT,
+    "api_socket": "",  # 非空时改为监听该 Unix 套接字（Windows 下忽略）
+    # 非空时定期把 Prometheus 指标写入该文件（node_exporter / windows_exporter 的 textfile 目录）
+    "metrics_textfile": "",
+    "metrics_interval": 30,
     # 守护进程配置
     "guardian_enabled": False,
     "guardian_autostart": False,
@@ -61,7 +256,12 @@ DEFAULT_CONFIG = {
     "guardian_autorestart": True,
     "guardian_hide_window": True,
     "guardian_show_window": False,
-    "guardian_show_console": False  # 新增控制台显示选项
+    "guardian_show_console": False,  # 新增控制台显示选项
+    "guardian_log_max_bytes": 1024 * 1024,
+    "guardian_log_backup_count": 3,
+    "guardian_log_compress": False,
+    "guardian_rules": [],  # 守护进程自定义进程规则
+    "guardian_max_interval": 60  # 守护进程空闲时的最长检查间隔（秒）
 }
 
 # Windows API函数
@@ -75,6 +275,189 @@ if platform.system() == "Windows":
     SW_SHOWNORMAL = 1
     SW_SHOW = 5
     SEE_MASK_NOCLOSEPROCESS = 0x00000040
+    EVENT_MODIFY_STATE = 0x0002
+    
+    OpenEventW = ctypes.windll.kernel32.OpenEventW
+    OpenEventW.argtypes = (ctypes.c_uint32, ctypes.c_bool, ctypes.c_wchar_p)
+    OpenEventW.restype = ctypes.c_void_p
+    SetEvent = ctypes.windll.kernel32.SetEvent
+    SetEvent.argtypes = (ctypes.c_void_p,)
+    CloseHandle = ctypes.windll.kernel32.CloseHandle
+    CloseHandle.argtypes = (ctypes.c_void_p,)
+
+# 守护进程重启策略
+GUARDIAN_RESTART_WINDOW = 600      # 统计重启次数的滑动窗口（秒）
+GUARDIAN_RESTART_MAX = 5           # 窗口内最多重启次数，超过则熔断
+GUARDIAN_BACKOFF_BASE = 10         # 首次退避时间（秒）
+GUARDIAN_BACKOFF_MAX = 300         # 单次退避上限（秒）
+GUARDIAN_BREAKER_COOLDOWN = 1800   # 熔断后冷却时间（秒）
+GUARDIAN_STABLE_AFTER = 60         # 守护进程持续运行多久视为启动成功（秒）
+
+class Histogram:
+    """Prometheus 直方图：各桶分别计数，导出时再累加"""
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.total += value
+        self.count += 1
+    
+    def samples(self, name, labels=""):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.bounds, "+Inf"), self.buckets):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum {self.total:.6f}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+class CoreMetrics:
+    """本进程的计数器和直方图；记录时只持有一个很短的锁，导出时复制一份快照"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.fires = {}     # 操作类型 -> 执行次数
+        self.failures = {}  # 操作类型 -> 执行失败次数
+        self.lateness = Histogram(FIRE_LATENESS_BUCKETS)
+        self.save_seconds = Histogram(CONFIG_SAVE_BUCKETS)
+        self.guardian_file = (None, None)  # (mtime, 内容)，守护进程指标文件变化时才重新读取
+    
+    def record_fire(self, action, lateness):
+        with self.lock:
+            self.fires[action] = self.fires.get(action, 0) + 1
+            self.lateness.observe(max(0.0, lateness))
+    
+    def record_failure(self, action):
+        with self.lock:
+            self.failures[action] = self.failures.get(action, 0) + 1
+    
+    def record_save(self, seconds):
+        with self.lock:
+            self.save_seconds.observe(seconds)
+    
+    def guardian_metrics(self):
+        try:
+            mtime = GUARDIAN_METRICS_FILE.stat().st_mtime
+        except OSError:
+            return None
+        if mtime != self.guardian_file[0]:
+            self.guardian_file = (mtime, load_guardian_metrics())
+        return self.guardian_file[1]
+
+CORE_METRICS = CoreMetrics()
+
+def prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_metrics(core):
+    """调度核心、执行器和守护进程的指标，Prometheus 文本格式"""
+    metrics = CORE_METRICS
+    with metrics.lock:
+        fires, failures = dict(metrics.fires), dict(metrics.failures)
+        lateness = metrics.lateness.samples("lazy_shutdown_fire_lateness_seconds")
+        save_seconds = metrics.save_seconds.samples("lazy_shutdown_config_save_seconds")
+    # reload/set_config 会先清空配置再填充，在核心的锁内复制一份计划列表
+    with core.lock:
+        schedules = list(core.config.get("schedules", []))
+    next_fire, _ = next_enabled_fire(schedules)
+    quick = core.engine.quick
+    if quick and (next_fire is None or quick["time"] < next_fire):
+        next_fire = quick["time"]
+    lines = []
+    
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    
+    def by_action(name, counts):
+        return [f'{name}{{action="{prometheus_label(action)}"}} {count}' for action, count in sorted(counts.items())]
+    
+    metric("lazy_shutdown_schedules", "gauge", "Schedules in the configuration.",
+           [f"lazy_shutdown_schedules {len(schedules)}"])
+    metric("lazy_shutdown_schedules_enabled", "gauge", "Enabled schedules.",
+           [f"lazy_shutdown_schedules_enabled {sum(1 for s in schedules if s.get('enabled', True))}"])
+    metric("lazy_shutdown_schedules_running", "gauge", "Schedules with a running scheduler thread.",
+           [f"lazy_shutdown_schedules_running {len(core.engine.schedules)}"])
+    metric("lazy_shutdown_next_fire_timestamp_seconds", "gauge", "Unix time of the next enabled schedule or quick timer.",
+           [f"lazy_shutdown_next_fire_timestamp_seconds {next_fire.timestamp():.0f}"] if next_fire else [])
+    metric("lazy_shutdown_fires_total", "counter", "Executed actions by action type.",
+           by_action("lazy_shutdown_fires_total", fires))
+    metric("lazy_shutdown_fire_lateness_seconds", "histogram", "Delay between the scheduled and actual execution time.",
+           lateness)
+    metric("lazy_shutdown_executor_failures_total", "counter", "Failed action executions by action type.",
+           by_action("lazy_shutdown_executor_failures_total", failures))
+    metric("lazy_shutdown_config_save_seconds", "histogram", "Duration of configuration saves.", save_seconds)
+    metric("lazy_shutdown_threads", "gauge", "Live threads in the process.",
+           [f"lazy_shutdown_threads {threading.active_count()}"])
+    metric("lazy_shutdown_start_time_seconds", "gauge", "Unix time the process started.",
+           [f"lazy_shutdown_start_time_seconds {metrics.started:.0f}"])
+    
+    guardian = core.guardian.status() if core.guardian else None
+    if guardian:
+        metric("lazy_shutdown_guardian_up", "gauge", "Whether the guardian process is running.",
+               [f"lazy_shutdown_guardian_up {int(guardian['state'] == 'running')}"])
+        metric("lazy_shutdown_guardian_restarts_total", "counter", "Guardian restarts by the main program.",
+               [f"lazy_shutdown_guardian_restarts_total {guardian['restarts']}"])
+        metric("lazy_shutdown_guardian_breaker_trips_total", "counter", "Times the guardian restart breaker opened.",
+               [f"lazy_shutdown_guardian_breaker_trips_total {guardian['trips']}"])
+    counters = (metrics.guardian_metrics() or {}).get("counters")
+    if counters:
+        metric("lazy_shutdown_guardian_main_restarts_total", "counter", "Main program restarts by the guardian.",
+               [f"lazy_shutdown_guardian_main_restarts_total {counters.get('main_restarts', 0)}"])
+        metric("lazy_shutdown_guardian_kills_total", "counter", "Processes terminated by guardian rules.",
+               [f"lazy_shutdown_guardian_kills_total {counters.get('kills', 0)}"])
+        metric("lazy_shutdown_guardian_taskmgr_kills_total", "counter", "Task Manager instances terminated by the guardian.",
+               [f"lazy_shutdown_guardian_taskmgr_kills_total {counters.get('taskmgr_kills', 0)}"])
+    return "\n".join(lines) + "\n"
+
+def metrics_interval(config):
+    """指标文件的写入间隔（秒），配置无效时使用默认值"""
+    try:
+        return max(5, int(config.get("metrics_interval", 30)))
+    except (TypeError, ValueError):
+        return 30
+
+class MetricsTextfileWriter:
+    """定期把指标写入 textfile collector 目录下的文件（先写临时文件再替换，避免读到半个文件）"""
+    def __init__(self, core, path, interval):
+        self.core = core
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+    
+    @property
+    def key(self):
+        return (self.path, self.interval)
+    
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="MetricsTextfile").start()
+        logging.info(f"指标文件: {self.path}（每 {self.interval} 秒更新）")
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def _run(self):
+        while True:
+            try:
+                temp = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp, "w", encoding="utf-8", newline="\n") as f:
+                    f.write(render_metrics(self.core))
+                os.replace(temp, self.path)
+            except Exception as e:
+                logging.warning(f"写入指标文件失败: {e}")
+            if self.stop_event.wait(self.interval):
+                return
 
 class ShutdownSchedule:
     def __init__(self, name, shutdown_type, time, days, enabled=True, one_time=False, app=None):
@@ -87,6 +470,7 @@ class ShutdownSchedule:
         self.thread = None
         self.running = False
         self.executed = False
+        self.skip_at = None  # 跳过这一次执行（取消或推迟）
         self.app = app
         
     def to_dict(self):
@@ -118,12 +502,12 @@ class ShutdownSchedule:
         self.running = True
         self.thread = threading.Thread(target=self._schedule_check, daemon=True)
         self.thread.start()
-        logging.info(f"计划 '{self.name}' 已启动")
+        logging.info(f"计划 '{self.name}' 已启动", extra={"schedule": self.name, "action": "start"})
     
     def stop(self):
         if self.running:
             self.running = False
-            logging.info(f"计划 '{self.name}' 已停止")
+            logging.info(f"计划 '{self.name}' 已停止", extra={"schedule": self.name, "action": "stop"})
     
     def _schedule_check(self):
         while self.running:
@@ -148,39 +532,63 @@ class ShutdownSchedule:
                 if time_diff < 0:
                     if self.one_time:
                         self.stop()
-                        if self.app and self.app.root:
-                            self.app.root.after(0, self.app.remove_executed_schedule, self.name)
+                        if self.app:
+                            self.app.schedule_executed(self.name)
                         return
                     time_diff += 24 * 3600
                 
                 if 0 < time_diff <= 60:
-                    logging.info(f"计划 '{self.name}' 即将执行: {self.shutdown_type} (等待 {time_diff} 秒)")
+                    logging.info(f"计划 '{self.name}' 即将执行: {self.shutdown_type} (等待 {time_diff} 秒)",
+                                 extra={"schedule": self.name, "action": self.shutdown_type})
                     
                     start_wait = time.time()
                     while time.time() - start_wait < time_diff and self.running:
                         time.sleep(0.5)
                     
-                    if self.running:
-                        self.execute_shutdown()
+                    if self.running and self.skip_at == scheduled_time:
+                        logging.info(f"计划 '{self.name}' 本次执行已取消", extra={"schedule": self.name, "action": "skip"})
+                        self.skip_at = None
+                    elif self.running:
+                        if self.app:
+                            self.app.notify(EVENT_SCHEDULE_FIRED, self.name)
+                        self.execute_shutdown(scheduled_time)
                     
                     if self.one_time:
                         self.executed = True
                         self.stop()
-                        if self.app and self.app.root:
-                            self.app.root.after(0, self.app.remove_executed_schedule, self.name)
+                        if self.app:
+                            self.app.schedule_executed(self.name)
                     
                     time.sleep(60)
                 else:
                     time.sleep(10)
             except Exception as e:
-                logging.error(f"计划 '{self.name}' 执行出错: {str(e)}")
+                logging.error(f"计划 '{self.name}' 执行出错: {str(e)}", extra={"schedule": self.name, "action": "error"})
                 time.sleep(10)
     
-    def execute_shutdown(self):
+    def next_fire(self, now=None):
+        """下一次执行时间，单次计划已过期时返回 None"""
+        now = now or datetime.datetime.now()
+        scheduled_time = datetime.datetime.strptime(self.time, "%H:%M")
+        candidate = now.replace(hour=scheduled_time.hour, minute=scheduled_time.minute, second=0, microsecond=0)
+        if self.one_time:
+            return candidate if candidate > now else None
+        for offset in range(8):
+            day = candidate + datetime.timedelta(days=offset)
+            if day > now and day.isoweekday() in self.days:
+                return day
+        return None
+    
+    def execute_shutdown(self, scheduled=None):
+        """执行操作；scheduled 为计划的执行时间，用于统计延迟"""
         command = SHUTDOWN_TYPES.get(self.shutdown_type, "")
         if command:
+            fields = {"schedule": self.name, "action": self.shutdown_type}
+            if scheduled is not None:
+                CORE_METRICS.record_fire(self.shutdown_type, (datetime.datetime.now() - scheduled).total_seconds())
+            start = time.perf_counter()
             try:
-                logging.info(f"执行命令: {command}")
+                logging.info(f"计划 '{self.name}' 执行命令: {command}", extra=fields)
                 
                 run_as_admin = True
                 if self.app:
@@ -191,10 +599,12 @@ class ShutdownSchedule:
                 else:
                     subprocess.run(command, shell=True, check=True)
                 
-                logging.info(f"命令执行成功: {command}")
+                logging.info(f"计划 '{self.name}' 命令执行成功: {command}",
+                             extra={**fields, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)})
             except Exception as e:
-                error_msg = f"执行关机命令失败: {str(e)}"
-                logging.error(error_msg)
+                CORE_METRICS.record_failure(self.shutdown_type)
+                error_msg = f"计划 '{self.name}' 执行关机命令失败: {str(e)}"
+                logging.error(error_msg, extra={**fields, "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)})
     
     def execute_as_admin(self, command):
         try:
@@ -221,45 +631,2193 @@ class ShutdownSchedule:
             else:
                 raise e
 
-class LazyShutdownApp:
-    def __init__(self, root, icon_path):
-        self.root = root
-        self.icon_path = icon_path
-        self.root.title(APP_NAME)        
-        self.root.geometry("600x500")
+class ScheduleEngine:
+    """按名称管理正在运行的计划线程，保证同一个计划只有一个线程"""
+    def __init__(self, app):
+        self.app = app
+        self.schedules = {}
+        self.quick = None
+        self.lock = threading.RLock()
+    
+    def sync(self, schedule_dicts):
+        """与配置中的计划列表对齐：停止已删除、已禁用或已修改的计划，启动新增的计划"""
+        with self.lock:
+            wanted = {}
+            for data in schedule_dicts:
+                schedule = ShutdownSchedule.from_dict(data, self.app)
+                if schedule.enabled:
+                    wanted[schedule.name] = schedule
+            
+            for name, running in list(self.schedules.items()):
+                target = wanted.get(name)
+                if target is None or target.to_dict() != running.to_dict() or not running.running:
+                    running.stop()
+                    del self.schedules[name]
+            
+            for name, schedule in wanted.items():
+                if name not in self.schedules:
+                    schedule.start()
+                    self.schedules[name] = schedule
+    
+    def stop_all(self):
+        with self.lock:
+            logging.info("停止所有计划")
+            for schedule in self.schedules.values():
+                schedule.stop()
+            self.schedules.clear()
+            self.cancel_quick()
+    
+    def start_quick(self, deadline, shutdown_type):
+        """快捷定时：只在内存中，不写入配置；同一时间只保留一个"""
+        with self.lock:
+            self.cancel_quick()
+            delay = max(0.0, (deadline - datetime.datetime.now()).total_seconds())
+            quick = {"time": deadline, "type": shutdown_type}
+            quick["timer"] = timer = threading.Timer(delay, self._fire_quick, args=(quick,))
+            timer.daemon = True
+            self.quick = quick
+            timer.start()
+    
+    def cancel_quick(self):
+        with self.lock:
+            quick, self.quick = self.quick, None
+        if quick:
+            quick["timer"].cancel()
+        return quick
+    
+    def _fire_quick(self, quick):
+        """quick 为触发的定时器所属的快捷定时；已被取消或替换（如刚推迟）时什么也不做"""
+        with self.lock:
+            if self.quick is not quick:
+                return
+            self.quick = None
+        self.app.notify(EVENT_SCHEDULE_FIRED, QUICK_TIMER_NAME)
+        ShutdownSchedule(QUICK_TIMER_NAME, quick["type"], quick["time"].strftime("%H:%M"), [],
+                         one_time=True, app=self.app).execute_shutdown(quick["time"])
+    
+    def status(self):
+        """正在运行的计划及其下一次执行时间"""
+        with self.lock:
+            result = []
+            for schedule in self.schedules.values():
+                next_fire = schedule.next_fire()
+                item = schedule.to_dict()
+                item["next_fire"] = next_fire.isoformat(timespec="seconds") if next_fire else None
+                result.append(item)
+            return sorted(result, key=lambda x: x["next_fire"] or "9999")
+
+def decode_schtasks_output(raw):
+    """schtasks /query /xml 的输出：带 BOM 时为 UTF-16，否则按 UTF-8，再不行按控制台代码页"""
+    if raw.startswith(b"\xff\xfe"):
+        return raw.decode("utf-16", "replace")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeError:
+        return raw.decode("oem", "replace")
+
+class TaskSchedulerBackend:
+    """把计划编译为 Windows 任务计划程序中的任务，按差异增删"""
+    TASK_DIR = Path(os.getenv('SystemRoot', r"C:\Windows")) / "System32" / "Tasks" / OFFLOAD_TASK_FOLDER
+    DIGEST_RE = re.compile(r"lazy-shutdown:([0-9a-f]{40})")
+    UNKNOWN = "unknown"  # 任务存在但读不到摘要
+    
+    @staticmethod
+    def task_name(schedule_name):
+        """任务名：替换任务计划不允许的字符，并附上原名的短哈希，避免 a/b 与 a_b（或只差大小写）对应同一个任务"""
+        safe = re.sub(r'[\\/:*?"<>|]', "_", schedule_name)
+        return f"{safe}-{hashlib.sha1(schedule_name.encode('utf-8')).hexdigest()[:8]}"
+    
+    def compile(self, data):
+        schedule = ShutdownSchedule.from_dict(data)
+        command = SHUTDOWN_TYPES.get(schedule.shutdown_type)
+        if not command:
+            return None
         
-        style = ttk.Style()
-        style.configure(".", font=("微软雅黑", 10))
-        style.configure("TButton", padding=6)
-        style.configure("TCheckbutton", padding=8)
+        if schedule.one_time:
+            start = schedule.next_fire()
+            if start is None:
+                return None
+            end = start + datetime.timedelta(hours=1)
+            trigger = f"""<TimeTrigger>
+      <StartBoundary>{start.isoformat(timespec="seconds")}</StartBoundary>
+      <EndBoundary>{end.isoformat(timespec="seconds")}</EndBoundary>
+      <Enabled>true</Enabled>
+    </TimeTrigger>"""
+            expire = "\n    <DeleteExpiredTaskAfter>PT0S</DeleteExpiredTaskAfter>"
+        else:
+            day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+            days = "".join(f"<{day_names[d - 1]} />" for d in sorted(set(schedule.days)))
+            # 起始日期固定，避免每天的编译结果不同导致重复注册
+            trigger = f"""<CalendarTrigger>
+      <StartBoundary>2020-01-01T{schedule.time}:00</StartBoundary>
+      <Enabled>true</Enabled>
+      <ScheduleByWeek>
+        <DaysOfWeek>{days}</DaysOfWeek>
+        <WeeksInterval>1</WeeksInterval>
+      </ScheduleByWeek>
+    </CalendarTrigger>"""
+            expire = ""
+        
+        return f"""<?xml version="1.0" encoding="UTF-16"?>
+<Task version="1.4" xmlns="http://schemas.microsoft.com/windows/2004/02/mit/task">
+  <RegistrationInfo>
+    <Description>{xml_escape(APP_NAME)}: {xml_escape(schedule.name)} lazy-shutdown:__DIGEST__</Description>
+  </RegistrationInfo>
+  <Principals>
+    <Principal id="Author">
+      <RunLevel>HighestAvailable</RunLevel>
+    </Principal>
+  </Principals>
+  <Settings>
+    <MultipleInstancesPolicy>IgnoreNew</MultipleInstancesPolicy>
+    <DisallowStartIfOnBatteries>false</DisallowStartIfOnBatteries>
+    <StopIfGoingOnBatteries>false</StopIfGoingOnBatteries>
+    <StartWhenAvailable>false</StartWhenAvailable>
+    <Enabled>true</Enabled>
+    <ExecutionTimeLimit>PT1H</ExecutionTimeLimit>{expire}
+  </Settings>
+  <Triggers>
+    {trigger}
+  </Triggers>
+  <Actions Context="Author">
+    <Exec>
+      <Command>cmd.exe</Command>
+      <Arguments>/c {xml_escape(command)}</Arguments>
+    </Exec>
+  </Actions>
+</Task>
+"""
+    
+    def registered(self):
+        """已注册的任务及其摘要：优先直接读取任务文件，不需要启动 schtasks；
+        目录无权访问（非管理员）时改用 schtasks /query 一次读出全部任务"""
+        try:
+            paths = list(self.TASK_DIR.iterdir())
+        except FileNotFoundError:
+            return {}
+        except OSError:
+            return self.query_registered()
+        result = {}
+        for path in paths:
+            try:
+                match = self.DIGEST_RE.search(path.read_text(encoding="utf-16"))
+                result[path.name] = match.group(1) if match else None
+            except Exception:
+                result[path.name] = self.query_digest(path.name)
+        return result
+    
+    def _query(self, *args):
+        result = subprocess.run(
+            ["schtasks", "/query", *args, "/xml"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode("gbk", errors="replace").strip())
+        return decode_schtasks_output(result.stdout)
+    
+    def query_registered(self):
+        """schtasks /query /xml 的输出中每个任务前有一行 <!-- \\路径\\任务名 --> 注释"""
+        text = self._query()
+        pattern = re.compile(r"<!--\s*\\" + re.escape(OFFLOAD_TASK_FOLDER) + r"\\([^\\]+?)\s*-->(.*?)</Task>", re.S)
+        result = {}
+        for name, body in pattern.findall(text):
+            match = self.DIGEST_RE.search(body)
+            result[name] = match.group(1) if match else None
+        return result
+    
+    def query_digest(self, name):
+        """单个任务文件读不出时经 schtasks 读取；仍然失败时返回 UNKNOWN，同步时不重复注册"""
+        try:
+            match = self.DIGEST_RE.search(self._query("/tn", f"{OFFLOAD_TASK_FOLDER}\\{name}"))
+            return match.group(1) if match else None
+        except Exception as e:
+            logging.debug(f"读取系统任务 {name} 失败: {e}")
+            return self.UNKNOWN
+    
+    def _schtasks(self, *args):
+        result = subprocess.run(
+            ["schtasks", *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode("gbk", errors="replace").strip())
+    
+    def install(self, name, content):
+        xml_path = os.path.join(tempfile.gettempdir(), "lazy_shutdown_offload.xml")
+        with open(xml_path, "w", encoding="utf-16") as f:
+            f.write(content)
+        self._schtasks("/create", "/tn", f"{OFFLOAD_TASK_FOLDER}\\{name}", "/xml", xml_path, "/f")
+    
+    def remove(self, name):
+        self._schtasks("/delete", "/tn", f"{OFFLOAD_TASK_FOLDER}\\{name}", "/f")
+    
+    def sync(self, schedules):
+        """只对新增、变化和已删除的计划调用 schtasks"""
+        desired = {}
+        for data in schedules:
+            if not data.get("enabled", True):
+                continue
+            content = self.compile(data)
+            if content is None:
+                continue
+            digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+            desired[self.task_name(data["name"])] = (content.replace("__DIGEST__", digest), digest)
+        
+        current = self.registered()
+        changed = 0
+        for name in current.keys() - desired.keys():
+            self.remove(name)
+            changed += 1
+        for name, (content, digest) in desired.items():
+            if current.get(name) == self.UNKNOWN:
+                logging.warning(f"无法读取系统任务 {name}，本次不更新")
+            elif current.get(name) != digest:
+                self.install(name, content)
+                changed += 1
+        if changed:
+            logging.info(f"已同步系统任务计划: {changed} 项变更, 共 {len(desired)} 项")
+
+class CronBackend:
+    """把计划编译为当前用户 crontab 中的一段受管理的条目"""
+    @staticmethod
+    def comment(name):
+        """计划名只用作行尾注释：去掉换行等控制字符和 cron 会特殊处理的 %"""
+        return re.sub(r"[\x00-\x1f\x7f%]", "", name)
+    
+    def compile(self, data):
+        schedule = ShutdownSchedule.from_dict(data)
+        command = LINUX_SHUTDOWN_TYPES.get(schedule.shutdown_type)
+        if not command:
+            return None
+        hour, minute = schedule.time.split(":")
+        if schedule.one_time:
+            fire = schedule.next_fire()
+            if fire is None:
+                return None
+            # cron 没有年份字段，用 date 判断年份避免来年重复执行
+            return (f"{int(minute)} {int(hour)} {fire.day} {fire.month} * "
+                    f"[ \"$(date +\\%Y)\" = \"{fire.year}\" ] && {command}  # {self.comment(schedule.name)}")
+        days = ",".join(str(d % 7) for d in sorted(set(schedule.days)))
+        return f"{int(minute)} {int(hour)} * * {days} {command}  # {self.comment(schedule.name)}"
+    
+    def sync(self, schedules):
+        result = subprocess.run(["crontab", "-l"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        current = result.stdout.decode("utf-8", errors="replace").splitlines() if result.returncode == 0 else []
+        
+        kept, inside = [], False
+        for line in current:
+            if line == CRON_BEGIN:
+                inside = True
+            elif line == CRON_END:
+                inside = False
+            elif not inside:
+                kept.append(line)
+        
+        entries = []
+        for data in schedules:
+            if data.get("enabled", True):
+                entry = self.compile(data)
+                if entry:
+                    entries.append(entry)
+        block = [CRON_BEGIN, *entries, CRON_END] if entries else []
+        desired = kept + block
+        if desired == current:
+            return
         
-        self.center_window(self.root, 600, 500)
-        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
-        self.root.resizable(True, True)
-        self.root.bind("<Unmap>", self.on_minimize)
-        self.guardian_process = None
-        self.guardian_monitor_running = False
-        self.guardian_monitor_thread = None
+        text = "\n".join(desired) + "\n" if desired else ""
+        subprocess.run(["crontab", "-"], input=text.encode("utf-8"), check=True)
+        logging.info(f"已同步 crontab: 共 {len(entries)} 项")
+
+def offload_backend():
+    """当前平台可用的系统计划程序后端"""
+    if platform.system() == "Windows":
+        return TaskSchedulerBackend()
+    if shutil.which("crontab"):
+        return CronBackend()
+    return None
+
+def notify_config_changed():
+    """唤醒守护进程立即检查配置（守护进程未运行时什么也不做）"""
+    if platform.system() != "Windows":
+        return
+    try:
+        handle = OpenEventW(EVENT_MODIFY_STATE, False, CONFIG_CHANGED_EVENT)
+        if handle:
+            SetEvent(handle)
+            CloseHandle(handle)
+    except Exception as e:
+        logging.debug(f"发送配置变更通知失败: {e}")
+
+def read_registry_autostart():
+    """注册表中当前的自启动命令，没有时返回 None"""
+    try:
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, AUTO_START_KEY, 0, winreg.KEY_READ) as key:
+            return winreg.QueryValueEx(key, AUTO_START_NAME)[0]
+    except OSError:
+        return None
+
+class AutostartProbe:
+    """自启动任务状态探测：按任务文件的指纹和内容哈希缓存结果，状态未变时不读取、不启动 schtasks
+
+    状态为 "absent"（不存在）、"match"（与期望一致）、"differs" 或 "unknown"（无法判断）
+    """
+    def __init__(self, path=AUTO_START_CACHE):
+        self.path = path
+        try:
+            self.cache = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.cache = {}
+    
+    @staticmethod
+    def fingerprint():
+        """任务文件的 (mtime, size)；文件不存在时返回 "absent"，无权访问时返回 None"""
+        try:
+            st = AUTO_START_TASK_FILE.stat()
+        except FileNotFoundError:
+            return "absent"
+        except OSError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+    
+    @staticmethod
+    def compare(text, command, arguments):
+        if f"<Command>{xml_escape(command)}</Command>" in text and f"<Arguments>{xml_escape(arguments)}</Arguments>" in text:
+            return "match"
+        return "differs"
+    
+    def query_state(self, command, arguments):
+        """任务文件无权访问（非管理员）时用 schtasks /query 读取任务定义；
+        此时无法判断任务是否在外部被删除或修改，不使用缓存"""
+        try:
+            result = subprocess.run(["schtasks", "/query", "/tn", AUTO_START_NAME, "/xml"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    creationflags=subprocess.CREATE_NO_WINDOW)
+        except OSError:
+            return "unknown"
+        if result.returncode != 0:
+            return "absent"
+        return self.compare(decode_schtasks_output(result.stdout), command, arguments)
+    
+    def task_state(self, command, arguments):
+        expected = [command, arguments]
+        fingerprint = self.fingerprint()
+        if fingerprint == "absent":
+            return "absent"
+        if fingerprint is None:
+            return self.query_state(command, arguments)
+        cached = self.cache.get("task", {})
+        if cached.get("expected") == expected and cached.get("fingerprint") == fingerprint:
+            return cached["state"]
         
-        # 加载配置
-        self.config = self.load_config()
+        try:
+            data = AUTO_START_TASK_FILE.read_bytes()
+        except OSError:
+            return self.query_state(command, arguments)
+        digest = hashlib.sha256(data).hexdigest()
+        if cached.get("expected") == expected and cached.get("hash") == digest:
+            state = cached["state"]
+        else:
+            try:
+                text = data.decode("utf-16")
+            except UnicodeError:
+                return "unknown"
+            state = self.compare(text, command, arguments)
+        self.remember(expected, state, fingerprint, digest)
+        return state
+    
+    def applied(self, command, arguments, state):
+        """schtasks 成功后记录结果（任务文件无权读取时该记录不会被使用）"""
+        fingerprint = self.fingerprint()
+        digest = None
+        if isinstance(fingerprint, list):
+            try:
+                digest = hashlib.sha256(AUTO_START_TASK_FILE.read_bytes()).hexdigest()
+            except OSError:
+                pass
+        self.remember([command, arguments], state, fingerprint, digest)
+    
+    def remember(self, expected, state, fingerprint, digest):
+        self.cache["task"] = {"expected": expected, "state": state, "fingerprint": fingerprint, "hash": digest}
+        try:
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.cache, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.debug(f"保存自启动状态缓存失败: {e}")
+
+def load_guardian_metrics():
+    """读取守护进程定期写出的指标文件，不存在或损坏时返回 None"""
+    try:
+        with open(GUARDIAN_METRICS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def format_guardian_metrics(metrics):
+    if not metrics:
+        return "暂无数据（守护进程未运行或尚未写出指标）"
+    counters = metrics.get("counters", {})
+    gauges = metrics.get("gauges", {})
+    scan = metrics.get("scan_ms", {})
+    return (
+        f"更新时间: {metrics.get('updated', '-')}  运行 {metrics.get('uptime_seconds', 0) // 60} 分钟\n"
+        f"内存: {gauges.get('rss_bytes', 0) / 1048576:.1f} MB  CPU 时间: {gauges.get('cpu_seconds', 0):.1f} 秒\n"
+        f"检查: {counters.get('ticks', 0)} 次, 间隔 {gauges.get('check_interval', 0):.0f} 秒, "
+        f"扫描平均 {scan.get('avg', 0):.1f} ms / 最长 {scan.get('max', 0):.1f} ms\n"
+        f"进程数: {gauges.get('processes_seen', 0)}  重启主程序: {counters.get('main_restarts', 0)} 次  "
+        f"终止任务管理器: {counters.get('taskmgr_kills', 0)} 次  重载配置: {counters.get('config_reloads', 0)} 次"
+    )
+
+def log_files(source="main"):
+    """某个来源的日志文件，从最旧的轮转文件到当前文件"""
+    base = LOG_SOURCES[source]
+    rotated = []
+    for path in base.parent.glob(base.name + ".*"):
+        suffix = path.name[len(base.name) + 1:]
+        number = suffix[:-3] if suffix.endswith(".gz") else suffix
+        if number.isdigit():
+            rotated.append((int(number), path))
+    files = [path for _, path in sorted(rotated, reverse=True)]
+    if base.exists():
+        files.append(base)
+    return files
+
+class LogIndex:
+    """日志文件的旁路索引（<日志>.idx）：每分钟第一条记录的偏移，以及每个计划相关记录的偏移
+
+    文件通过 mmap 读取；文件只追加时增量更新索引，被替换（轮转）时重建
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self.data = None
+    
+    @staticmethod
+    def _head(mm, length):
+        return hashlib.sha1(mm[:length]).hexdigest()
+    
+    def _empty(self, mm):
+        length = min(LOG_INDEX_HEAD, len(mm))
+        return {"version": LOG_INDEX_VERSION, "head": self._head(mm, length), "head_size": length,
+                "size": 0, "minutes": [], "schedules": {}}
+    
+    def _load(self, mm):
+        # 只比较建索引时已有的开头部分，小文件增长时不会被当作轮转而重建
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+            length = data["head_size"]
+            if (data.get("version") == LOG_INDEX_VERSION and data["size"] <= len(mm) and length <= len(mm)
+                    and data.get("head") == self._head(mm, length)):
+                return data
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._empty(mm)
+    
+    def update(self, mm):
+        """把上次索引之后追加的完整行加入索引"""
+        data = self._load(mm)
+        end = mm.rfind(b"\n") + 1
+        if end > data["size"]:
+            minutes = data["minutes"]
+            schedules = data["schedules"]
+            last_minute = minutes[-1][0] if minutes else None
+            for match in LOG_RECORD_RE.finditer(mm, data["size"], end):
+                minute = match.group(1).decode()
+                if minute != last_minute:
+                    minutes.append([minute, match.start()])
+                    last_minute = minute
+                found = LOG_SCHEDULE_RE.search(match.group(0))
+                if found:
+                    name = found.group(1).decode("utf-8", "replace")
+                    schedules.setdefault(name, []).append([match.group(0)[:19].decode(), match.start()])
+            data["size"] = end
+            if data["head_size"] < LOG_INDEX_HEAD:
+                data["head_size"] = min(LOG_INDEX_HEAD, end)
+                data["head"] = self._head(mm, data["head_size"])
+            try:
+                tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+                tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, self.index_path)
+            except OSError as e:
+                logging.debug(f"保存日志索引失败: {e}")
+        self.data = data
+        return data
+    
+    @staticmethod
+    def record_at(mm, offset, limit):
+        """从 offset 开始的一条记录（包括异常堆栈等续行）"""
+        following = LOG_RECORD_RE.search(mm, mm.find(b"\n", offset, limit) + 1 or limit, limit)
+        end = following.start() if following else limit
+        return mm[offset:end].decode("utf-8", "replace").rstrip("\n")
+    
+    def query(self, since=None, until=None, schedule=None):
+        """按时间范围（"YYYY-MM-DD HH:MM[:SS]" 字符串）和计划名查询，按时间顺序返回记录"""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return []
+        mmap = lazy_import("mmap")
+        bisect = lazy_import("bisect")
+        in_range = lambda ts: (since is None or ts >= since) and (until is None or ts[:len(until)] <= until)
+        # 只映射当前大小的快照，并在过滤前复制出需要的部分后立即解除映射：
+        # Windows 上映射未关闭时 RotatingFileHandler 无法重命名日志文件进行轮转
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return []
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                data = self.update(mm)
+                limit = data["size"]
+                if schedule is not None:
+                    entries = data["schedules"].get(schedule, [])
+                    entries = entries[bisect.bisect_left(entries, [since]) if since else 0:]
+                    position = entries[0][1] if entries else limit
+                else:
+                    minutes = data["minutes"]
+                    position = 0
+                    if since and minutes:
+                        index = bisect.bisect_right(minutes, [since[:16], float("inf")]) - 1
+                        position = minutes[index][1] if index >= 0 else 0
+                snapshot = mm[position:limit]
+        
+        limit = len(snapshot)
+        result = []
+        if schedule is not None:
+            for ts, offset in entries:
+                if until is not None and ts[:len(until)] > until:
+                    break
+                if in_range(ts):
+                    result.append(self.record_at(snapshot, offset - position, limit))
+            return result
+        
+        matches = LOG_RECORD_RE.finditer(snapshot)
+        current = next(matches, None)
+        while current is not None:
+            following = next(matches, None)
+            ts = current.group(0)[:19].decode()
+            if until is not None and ts[:len(until)] > until:
+                break
+            if in_range(ts):
+                end = following.start() if following else limit
+                result.append(snapshot[current.start():end].decode("utf-8", "replace").rstrip("\n"))
+            current = following
+        return result
+
+def scan_compressed_log(path, since=None, until=None, schedule=None):
+    """压缩的轮转日志无法随机访问，解压后顺序过滤"""
+    gzip = lazy_import("gzip")
+    try:
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logging.error(f"读取压缩日志 {path} 失败: {e}")
+        return []
+    result = []
+    records = list(LOG_RECORD_RE.finditer(data))
+    for current, following in zip(records, records[1:] + [None]):
+        ts = current.group(0)[:19].decode()
+        if since is not None and ts < since:
+            continue
+        if until is not None and ts[:len(until)] > until:
+            break
+        found = LOG_SCHEDULE_RE.search(current.group(0))
+        if schedule is not None and (not found or found.group(1).decode("utf-8", "replace") != schedule):
+            continue
+        end = following.start() if following else len(data)
+        result.append(data[current.start():end].decode("utf-8", "replace").rstrip("\n"))
+    return result
+
+def query_logs(source="main", since=None, until=None, schedule=None, limit=None):
+    """查询某来源的全部日志文件，返回按时间排列的记录文本；limit 只保留最后若干条"""
+    result = []
+    for path in log_files(source):
+        if path.suffix == ".gz":
+            result.extend(scan_compressed_log(path, since, until, schedule))
+        else:
+            result.extend(LogIndex(path).query(since, until, schedule))
+    return result[-limit:] if limit else result
+
+def logs_main(argv):
+    """命令行: logs [-s 计划名] [--since 时间] [--until 时间] [--guardian] [-n 条数]"""
+    argparse = lazy_import("argparse")
+    parser = argparse.ArgumentParser(prog="lazy_shutdown logs", description="按计划和时间范围查询日志")
+    parser.add_argument("-s", "--schedule", help="只显示与该计划相关的记录")
+    parser.add_argument("--since", help="开始时间，如 2024-05-01 或 \"2024-05-01 22:00\"")
+    parser.add_argument("--until", help="结束时间（含）")
+    parser.add_argument("--guardian", action="store_true", help="查询守护进程日志")
+    parser.add_argument("-n", "--limit", type=int, help="只显示最后 N 条")
+    args = parser.parse_args(argv)
+    records = query_logs("guardian" if args.guardian else "main", args.since, args.until, args.schedule, args.limit)
+    for record in records:
+        print(record)
+    return 0
+
+def attach_console():
+    """--windowed 打包后没有标准输入输出：命令行子命令改用被重定向的句柄，
+    否则附加到启动它的控制台（cmd 不会等待窗口程序，输出会出现在提示符之后）"""
+    if platform.system() != "Windows" or None not in (sys.stdin, sys.stdout, sys.stderr):
+        return
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetStdHandle.restype = ctypes.c_void_p
+    msvcrt = lazy_import("msvcrt")
+    attached = None
+    for name, std_id, mode, device in (("stdin", -10, "r", "CONIN$"), ("stdout", -11, "w", "CONOUT$"),
+                                       ("stderr", -12, "w", "CONOUT$")):
+        if getattr(sys, name) is not None:
+            continue
+        stream = None
+        handle = kernel32.GetStdHandle(std_id)
+        if handle and handle != ctypes.c_void_p(-1).value:
+            try:
+                fd = msvcrt.open_osfhandle(handle, os.O_RDONLY if mode == "r" else os.O_WRONLY)
+                stream = os.fdopen(fd, mode, encoding="utf-8", errors="replace")
+            except OSError:
+                stream = None
+        if stream is None:
+            if attached is None:
+                attached = bool(kernel32.AttachConsole(-1))  # ATTACH_PARENT_PROCESS
+            if not attached:
+                continue
+            stream = open(device, mode, encoding=f"cp{kernel32.GetConsoleOutputCP()}", errors="replace")
+        setattr(sys, name, stream)
+
+def describe_schedule(data):
+    """一条计划的单行说明（与主界面列表的写法一致）"""
+    days = data.get("days") or []
+    days_str = "每天" if len(days) == 7 else "周" + "".join(str(d) for d in days)
+    text = f"{data['name']}: {data['type']} @ {data['time']} ({days_str})"
+    if data.get("one_time"):
+        text += " [单次]"
+    return text + ("" if data.get("enabled", True) else " [已禁用]")
+
+def edit_schedules_offline(ops):
+    """没有实例运行时直接修改配置文件，返回结果说明"""
+    # 配置文件损坏时直接报错，不能用默认配置覆盖它
+    config = json.loads(CONFIG_FILE.read_text(encoding="utf-8")) if CONFIG_FILE.exists() else load_config()
+    config.setdefault("schedules", [])
+    schedules, messages = apply_schedule_ops(config["schedules"], ops)
+    if schedules != config["schedules"]:
+        config["schedules"] = schedules
+        if not save_config(config):
+            raise RuntimeError("保存配置失败")
+        backend = offload_backend() if config.get("offload_schedules", False) else None
+        if backend:
+            backend.sync(schedules)
+    return messages
+
+def schedules_main(command, argv):
+    """命令行: list / add / rm / enable / disable / import / export / next
+    
+    有实例运行时通过本地 IPC 交给它执行，否则直接读写配置文件；
+    一次调用中的所有修改作为一个事务，只保存一次
+    """
+    argparse = lazy_import("argparse")
+    parser = argparse.ArgumentParser(prog=f"lazy_shutdown {command}")
+    if command in ("list", "next"):
+        parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+    elif command == "add":
+        parser.add_argument("name", help="计划名称")
+        parser.add_argument("-t", "--time", required=True, help="执行时间 HH:MM")
+        parser.add_argument("--type", default="关机", choices=list(SHUTDOWN_TYPES), help="操作类型")
+        parser.add_argument("-d", "--days", default="", help="逗号分隔的星期（1-7 表示周一到周日），如 1,2,3,4,5")
+        parser.add_argument("--once", action="store_true", help="单次执行")
+        parser.add_argument("--disabled", action="store_true", help="添加后暂不启用")
+    elif command in ("rm", "enable", "disable"):
+        parser.add_argument("names", nargs="+", metavar="name", help="计划名称，可以有多个")
+    elif command == "import":
+        parser.add_argument("file", help="JSON 文件（export 的输出或计划列表），- 表示标准输入")
+        parser.add_argument("--replace", action="store_true", help="替换全部现有计划（默认同名覆盖、其余保留）")
+    elif command == "export":
+        parser.add_argument("file", nargs="?", default="-", help="输出文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+    try:
+        running = probe_instance() is not None
+    except Exception as e:
+        # 不能改为直接写配置文件，运行中的实例下次保存时会把修改覆盖掉
+        print(f"错误: 无法连接正在运行的实例: {e}", file=sys.stderr)
+        return 1
+    
+    try:
+        if command in ("list", "export"):
+            schedules = ipc_request({"cmd": "list"})["schedules"] if running else load_config()["schedules"]
+            if command == "export":
+                text = json.dumps({"schedules": schedules}, ensure_ascii=False, indent=2)
+                if args.file == "-":
+                    print(text)
+                else:
+                    Path(args.file).write_text(text + "\n", encoding="utf-8")
+            elif args.json:
+                print(json.dumps(schedules, ensure_ascii=False, indent=2))
+            else:
+                for data in schedules:
+                    print(describe_schedule(data))
+            return 0
         
-        # 初始化
-        self.tray_icon = None
-        self.tray_running = False
-        self.init_logging()
-        self.create_widgets()
-        self.start_all_schedules()
-        self.set_auto_start(self.config.get("auto_start", False))
-        self.show_main_window_hotkey = None
-        self.setup_hotkey()
-        self.check_admin_privileges()
-        self.start_heartbeat()
+        if command == "next":
+            if running:
+                items = ipc_request({"cmd": "next"})["next"]
+            else:
+                items = []
+                for data in load_config()["schedules"]:
+                    if data.get("enabled", True):
+                        fire = ShutdownSchedule.from_dict(data).next_fire()
+                        items.append(dict(data, next_fire=fire.isoformat(timespec="seconds") if fire else None))
+                items.sort(key=lambda x: x["next_fire"] or "9999")
+            if args.json:
+                print(json.dumps(items, ensure_ascii=False, indent=2))
+            else:
+                for item in items:
+                    print(f"{(item['next_fire'] or '-').replace('T', ' '):<19}  {describe_schedule(item)}")
+            return 0
+        
+        if command == "add":
+            days = [int(d) for d in args.days.replace("，", ",").split(",") if d.strip()]
+            ops = [{"op": "add", "schedule": {"name": args.name, "type": args.type, "time": args.time, "days": days,
+                                             "enabled": not args.disabled, "one_time": args.once}}]
+        elif command == "import":
+            if args.file == "-":
+                if sys.stdin is None:
+                    raise ValueError("没有可用的标准输入，请指定文件")
+                data = json.load(sys.stdin)
+            else:
+                data = json.loads(Path(args.file).read_text(encoding="utf-8"))
+            schedules = data.get("schedules") if isinstance(data, dict) else data
+            # 格式不对时不能当作空列表处理，否则 --replace 会删除全部计划
+            if not isinstance(schedules, list):
+                raise ValueError("导入文件须为计划列表或包含 \"schedules\" 列表的对象")
+            ops = [{"op": "import", "schedules": schedules, "replace": args.replace}]
+        else:
+            ops = [{"op": command, "name": name} for name in args.names]
         
-        # 设置守护进程
-        self.setup_guardian()
-        self.start_guardian_monitor()
+        if running:
+            reply = ipc_request({"cmd": "batch", "ops": ops})
+            if not reply.get("ok"):
+                raise RuntimeError(reply.get("error", "未知错误"))
+            messages = reply["messages"]
+        else:
+            messages = edit_schedules_offline(ops)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    for message in messages:
+        print(message)
+    return 0
+
+def load_config():
+    try:
+        if CONFIG_FILE.exists():
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            config.setdefault("schedules", [])
+            return config
+    except Exception as e:
+        error_msg = f"加载配置失败: {e}"
+        logging.error(error_msg)
+    config = DEFAULT_CONFIG.copy()
+    config["schedules"] = []
+    return config
+
+def save_config(config):
+    try:
+        start = time.perf_counter()
+        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        CORE_METRICS.record_save(time.perf_counter() - start)
+        logging.info("配置文件已保存")
+        notify_config_changed()
+        return True
+    except Exception as e:
+        error_msg = f"保存配置失败: {e}"
+        logging.error(error_msg)
+        return False
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条记录一行 JSON，带上计划名、动作和耗时等结构化字段"""
+    FIELDS = ("schedule", "action", "elapsed_ms")
+    
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+_log_listener = None
+
+def init_logging(log_name="lazy_shutdown.log", config=None):
+    """记录经队列交给后台线程写入文件，计划线程和界面线程不等待磁盘"""
+    global _log_listener
+    config = config or {}
+    log_file = CONFIG_DIR / log_name
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+
+    handler = logging.handlers.RotatingFileHandler(
+        log_file, 
+        maxBytes=1024*1024,
+        backupCount=3,
+        encoding='utf-8'
+    )
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    handlers = [handler]
+    
+    if config.get("log_json", False):
+        json_handler = logging.handlers.RotatingFileHandler(
+            log_file.with_suffix(".jsonl"),
+            maxBytes=1024*1024,
+            backupCount=3,
+            encoding='utf-8'
+        )
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.Queue()
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+    level = config.get("log_level", DEFAULT_CONFIG["log_level"])
+    logger = logging.getLogger()
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    logging.info(f"{APP_NAME} 启动")
 
+def stop_logging():
+    """写完队列中剩余的日志并关闭文件"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
+
+def private_secret(path, generate):
+    """读取只有当前用户可读写的密钥文件，不存在时以 0600 独占创建
+    
+    两个进程同时首次启动时只有一个能创建成功，另一个读取它写入的内容
+    """
+    for _ in range(50):
+        try:
+            data = path.read_bytes()
+            if data:
+                if platform.system() != "Windows" and path.stat().st_mode & 0o077:
+                    os.chmod(path, 0o600)  # 旧版本以默认权限创建的文件
+                return data
+        except FileNotFoundError:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, "O_BINARY", 0), 0o600)
+            except FileExistsError:
+                pass
+            else:
+                data = generate()
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                return data
+        time.sleep(0.02)  # 另一个进程刚创建、还没写完
+    raise OSError(f"无法读取密钥文件: {path}")
+
+def ipc_authkey():
+    """本机 IPC 的共享密钥，首次使用时生成"""
+    return private_secret(IPC_KEY_FILE, lambda: os.urandom(32))
+
+def ipc_request(request):
+    """向正在运行的实例发送一条命令并返回响应，没有实例运行时抛出 OSError"""
+    with Client(IPC_ADDRESS, family=IPC_FAMILY, authkey=ipc_authkey()) as conn:
+        conn.send(request)
+        return conn.recv()
+
+def ipc_listener():
+    """本地 IPC 的监听器；Windows 上命名管道使用 IPC_PIPE_SDDL 作为安全描述符"""
+    if IPC_FAMILY != "AF_PIPE":
+        return Listener(IPC_ADDRESS, family=IPC_FAMILY, authkey=ipc_authkey())
+    import _winapi
+    from multiprocessing import connection
+    
+    class SECURITY_ATTRIBUTES(ctypes.Structure):
+        _fields_ = [("nLength", ctypes.c_uint32), ("lpSecurityDescriptor", ctypes.c_void_p),
+                    ("bInheritHandle", ctypes.c_int)]
+    
+    descriptor = ctypes.c_void_p()
+    if not ctypes.windll.advapi32.ConvertStringSecurityDescriptorToSecurityDescriptorW(
+            IPC_PIPE_SDDL, 1, ctypes.byref(descriptor), None):
+        raise ctypes.WinError()
+    attributes = SECURITY_ATTRIBUTES(ctypes.sizeof(SECURITY_ATTRIBUTES), descriptor, 0)
+    
+    class PipeListener(connection.PipeListener):
+        # 与 multiprocessing 的实现相同，只是每个管道实例都带上安全描述符
+        def _new_handle(self, first=False):
+            flags = _winapi.PIPE_ACCESS_DUPLEX | _winapi.FILE_FLAG_OVERLAPPED
+            if first:
+                flags |= _winapi.FILE_FLAG_FIRST_PIPE_INSTANCE
+            return _winapi.CreateNamedPipe(
+                self._address, flags,
+                _winapi.PIPE_TYPE_MESSAGE | _winapi.PIPE_READMODE_MESSAGE | _winapi.PIPE_WAIT,
+                _winapi.PIPE_UNLIMITED_INSTANCES, connection.BUFSIZE, connection.BUFSIZE,
+                _winapi.NMPWAIT_WAIT_FOREVER, ctypes.addressof(attributes))
+    
+    listener = Listener.__new__(Listener)
+    listener._listener = PipeListener(IPC_ADDRESS)
+    listener._authkey = ipc_authkey()
+    listener._descriptor = attributes  # 描述符须在监听器存活期间保持有效
+    return listener
+
+class InstanceRunningError(RuntimeError):
+    """已有实例在监听本地 IPC 地址"""
+
+class IpcServer:
+    """本地 IPC 服务：每条连接发送一个 dict 命令，收到一个 dict 响应"""
+    def __init__(self, handler):
+        self.handler = handler
+        self.listener = None
+        self.running = False
+    
+    def start(self):
+        if IPC_FAMILY == "AF_UNIX" and os.path.exists(IPC_ADDRESS):
+            # 只清理无人监听的残留套接字；抢占正在运行实例的地址会让每个计划执行两次
+            try:
+                ipc_request({"cmd": "ping"})
+            except ConnectionRefusedError:
+                os.remove(IPC_ADDRESS)
+            except Exception as e:
+                # 有进程在监听但无法正常应答（如密钥不一致），同样不能抢占
+                raise InstanceRunningError(f"已有实例在运行: {IPC_ADDRESS} ({e})")
+            else:
+                raise InstanceRunningError(f"已有实例在运行: {IPC_ADDRESS}")
+        self.listener = ipc_listener()
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True, name="IpcServer").start()
+        logging.info(f"本地 IPC 已启动: {IPC_ADDRESS}")
+    
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        try:
+            # 连接一次以唤醒阻塞中的 accept；不做认证、不等响应，
+            # 接受线程若已先一步退出，没人应答的请求会让这里一直阻塞
+            Client(IPC_ADDRESS, family=IPC_FAMILY).close()
+        except Exception:
+            pass
+        try:
+            self.listener.close()
+        except Exception:
+            pass
+    
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn = self.listener.accept()
+            except Exception as e:
+                if self.running:
+                    logging.warning(f"IPC 接受连接失败: {e}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+    
+    def _serve(self, conn):
+        try:
+            with conn:
+                request = conn.recv()
+                try:
+                    response = self.handler(request)
+                except Exception as e:
+                    logging.error(f"处理 IPC 命令失败 {request}: {e}")
+                    response = {"ok": False, "error": str(e)}
+                conn.send(response)
+        except Exception as e:
+            logging.debug(f"IPC 连接异常: {e}")
+
+def api_token():
+    """控制接口的访问令牌，首次使用时生成"""
+    # 令牌以文本保存，管理工具直接读取该文件
+    return private_secret(API_TOKEN_FILE, lambda: os.urandom(24).hex().encode("ascii")).decode("ascii").strip()
+
+def api_address(config):
+    """控制接口的监听地址：Unix 套接字路径，或 (主机, 端口)"""
+    path = config.get("api_socket", "")
+    if path and platform.system() != "Windows":
+        return path
+    return (API_HOST, int(config.get("api_port", API_PORT)))
+
+class ApiServer:
+    """本机 HTTP/JSON-RPC 控制接口，在独立线程的 asyncio 事件循环中运行
+    
+    POST /rpc 接收 JSON-RPC 2.0 请求（单个或批量），GET /health 用于探活，GET /metrics 为 Prometheus 指标；
+    方法在线程池中调用调度核心，界面只会经由核心的事件通知（事件总线）得知变化
+    """
+    def __init__(self, core):
+        self.core = core
+        self.loop = None
+        self.server = None
+        self.executor = None
+        self.address = None
+        self.token = None
+    
+    def start(self, address):
+        asyncio = lazy_import("asyncio")
+        loop = asyncio.new_event_loop()
+        try:
+            if isinstance(address, str):
+                if os.path.exists(address):
+                    os.remove(address)
+                server = loop.run_until_complete(asyncio.start_unix_server(self.handle, path=address))
+                os.chmod(address, 0o600)
+            else:
+                # 通过 TCP 访问时本机其他用户也能连接，需要令牌
+                self.token = api_token()
+                server = loop.run_until_complete(asyncio.start_server(self.handle, *address, backlog=512))
+        except Exception:
+            loop.close()
+            raise
+        self.executor = lazy_import("concurrent.futures").ThreadPoolExecutor(API_WORKERS, thread_name_prefix="ApiWorker")
+        loop.set_default_executor(self.executor)
+        self.loop, self.server, self.address = loop, server, address
+        threading.Thread(target=loop.run_forever, daemon=True, name="ApiServer").start()
+        logging.info(f"控制接口已启动: {address}")
+    
+    def stop(self):
+        loop = self.loop
+        if loop is None:
+            return
+        self.loop = None
+        loop.call_soon_threadsafe(self.server.close)
+        loop.call_soon_threadsafe(loop.stop)
+        self.executor.shutdown(wait=False)
+        logging.info("控制接口已停止")
+    
+    async def handle(self, reader, writer):
+        """一条连接上可以有多个请求（HTTP/1.1 保持连接）"""
+        asyncio = lazy_import("asyncio")
+        try:
+            while True:
+                line = await asyncio.wait_for(reader.readline(), API_IDLE_TIMEOUT)
+                if not line:
+                    break
+                method, path, version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), API_IDLE_TIMEOUT)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > API_MAX_BODY:
+                    await self.respond(writer, 413, {"error": "请求过大"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.route(method, path, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            logging.error(f"控制接口处理请求失败: {e}")
+        finally:
+            writer.close()
+    
+    async def respond(self, writer, status, payload, keep_alive):
+        """payload 为字符串时按 Prometheus 文本格式返回，其余按 JSON 返回"""
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {API_HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+    
+    async def route(self, method, path, headers, body):
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            return 200, {"ok": True, "mode": self.core.mode}
+        if path not in ("/rpc", "/metrics"):
+            return 404, {"error": "未知路径"}
+        if method != ("POST" if path == "/rpc" else "GET"):
+            return 405, {"error": f"{path} 不支持 {method}"}
+        if self.token is not None:
+            scheme, _, token = headers.get("authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), self.token):
+                return 401, {"error": "缺少或错误的令牌"}
+        if path == "/metrics":
+            text = await lazy_import("asyncio").get_running_loop().run_in_executor(None, render_metrics, self.core)
+            return 200, text
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 200, self.rpc_error(None, -32700, "JSON 解析失败")
+        loop = lazy_import("asyncio").get_running_loop()
+        if isinstance(request, list):
+            if not request:
+                return 200, self.rpc_error(None, -32600, "空的批量请求")
+            replies = [await loop.run_in_executor(None, self.call, item) for item in request]
+            return 200, [reply for reply in replies if reply is not None] or None
+        return 200, await loop.run_in_executor(None, self.call, request)
+    
+    @staticmethod
+    def rpc_error(request_id, code, message):
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+    
+    def call(self, request):
+        """执行一个 JSON-RPC 请求（在线程池中），通知（没有 id）返回 None"""
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self.rpc_error(None, -32600, "无效的请求")
+        request_id = request.get("id")
+        handler = getattr(self, "rpc_" + request["method"].replace(".", "_"), None)
+        params = request.get("params") or {}
+        try:
+            if handler is None:
+                return self.rpc_error(request_id, -32601, f"未知方法: {request['method']}")
+            if not isinstance(params, dict):
+                return self.rpc_error(request_id, -32602, "参数须为对象")
+            result = handler(**params)
+        except TypeError as e:
+            return self.rpc_error(request_id, -32602, f"参数错误: {e}")
+        except ValueError as e:
+            return self.rpc_error(request_id, -32000, str(e))
+        except Exception as e:
+            logging.error(f"控制接口方法 {request['method']} 出错: {e}")
+            return self.rpc_error(request_id, -32603, str(e))
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+    
+    # JSON-RPC 方法：名称中的 . 对应这里的 _
+    def rpc_schedules_list(self):
+        with self.core.lock:
+            return [dict(s) for s in self.core.config["schedules"]]
+    
+    def rpc_schedules_get(self, name):
+        schedule = next((s for s in self.rpc_schedules_list() if s["name"] == name), None)
+        if schedule is None:
+            raise ValueError(f"没有名为 '{name}' 的计划")
+        return schedule
+    
+    def rpc_schedules_add(self, schedule):
+        return self.core.batch([{"op": "add", "schedule": schedule}])
+    
+    def rpc_schedules_update(self, name, schedule):
+        return self.core.batch([{"op": "update", "name": name, "schedule": schedule}])
+    
+    def rpc_schedules_remove(self, name):
+        return self.core.batch([{"op": "rm", "name": name}])
+    
+    def rpc_schedules_enable(self, name):
+        return self.core.batch([{"op": "enable", "name": name}])
+    
+    def rpc_schedules_disable(self, name):
+        return self.core.batch([{"op": "disable", "name": name}])
+    
+    def rpc_schedules_batch(self, ops):
+        return self.core.batch(ops)
+    
+    def rpc_schedules_next(self):
+        return self.core.engine.status()
+    
+    def rpc_pending_get(self):
+        pending = self.core.pending_action()
+        if pending is None:
+            return None
+        return {"time": pending["time"].isoformat(timespec="seconds"), "type": pending["type"],
+                "schedule": pending["schedule"].name if pending["schedule"] else None}
+    
+    def rpc_pending_cancel(self):
+        return self.core.cancel_pending()
+    
+    def rpc_pending_snooze(self, minutes=15):
+        return self.core.snooze(minutes)
+    
+    def rpc_quick_start(self, minutes, type="关机"):
+        if type not in SHUTDOWN_TYPES:
+            raise ValueError(f"操作类型无效: {type}")
+        return self.core.quick_timer(minutes, type)
+    
+    def rpc_guardian_state(self):
+        return self.core.guardian.status() if self.core.guardian else {"state": "stopped"}
+    
+    def rpc_metrics(self):
+        return self.core.metrics()
+
+def validate_schedule(data):
+    """校验一条计划（来自命令行或导入文件），返回规范化后的 dict，无效时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError(f"计划格式无效: {data!r}")
+    name = str(data.get("name") or "").strip()
+    if not name:
+        raise ValueError("计划缺少名称")
+    if re.search(r"[\x00-\x1f\x7f%]", name):
+        raise ValueError(f"计划名称不能包含控制字符或 %: {name!r}")
+    if data.get("type", "关机") not in SHUTDOWN_TYPES:
+        raise ValueError(f"计划 '{name}' 的操作类型无效: {data.get('type')}（可选: {'、'.join(SHUTDOWN_TYPES)}）")
+    try:
+        datetime.datetime.strptime(str(data.get("time", "")), "%H:%M")
+    except ValueError:
+        raise ValueError(f"计划 '{name}' 的时间无效: {data.get('time')}（格式 HH:MM）")
+    days = data.get("days") or []
+    if not isinstance(days, list) or any(not isinstance(d, int) or not 1 <= d <= 7 for d in days):
+        raise ValueError(f"计划 '{name}' 的日期无效: {days}（1-7 表示周一到周日）")
+    one_time = bool(data.get("one_time", False))
+    if not days and not one_time:
+        raise ValueError(f"计划 '{name}' 至少需要一个日期或为单次执行")
+    return ShutdownSchedule(name, data.get("type", "关机"), data["time"], sorted(set(days)),
+                            bool(data.get("enabled", True)), one_time).to_dict()
+
+def apply_schedule_ops(schedules, ops):
+    """在计划列表的副本上依次执行修改操作，全部成功才返回 (新列表, 结果说明)，任一失败抛出 ValueError
+    
+    操作: {"op": "add", "schedule": {...}}、{"op": "update", "name": 名称, "schedule": {要修改的字段}}、
+    {"op": "rm"/"enable"/"disable", "name": 名称}、{"op": "import", "schedules": [...], "replace": 是否替换全部}
+    """
+    result = [dict(s) for s in schedules]
+    messages = []
+    
+    def find(name):
+        index = next((i for i, s in enumerate(result) if s["name"] == name), -1)
+        if index == -1:
+            raise ValueError(f"没有名为 '{name}' 的计划")
+        return index
+    
+    for op in ops:
+        kind = op.get("op")
+        if kind == "add":
+            schedule = validate_schedule(op.get("schedule"))
+            if any(s["name"] == schedule["name"] for s in result):
+                raise ValueError(f"计划 '{schedule['name']}' 已存在")
+            result.append(schedule)
+            messages.append(f"已添加计划 '{schedule['name']}'")
+        elif kind == "update":
+            index = find(op.get("name"))
+            schedule = validate_schedule(dict(result[index], **(op.get("schedule") or {})))
+            if schedule["name"] != op["name"] and any(s["name"] == schedule["name"] for s in result):
+                raise ValueError(f"计划 '{schedule['name']}' 已存在")
+            result[index] = schedule
+            messages.append(f"已修改计划 '{op['name']}'")
+        elif kind == "rm":
+            del result[find(op.get("name"))]
+            messages.append(f"已删除计划 '{op['name']}'")
+        elif kind in ("enable", "disable"):
+            result[find(op.get("name"))]["enabled"] = kind == "enable"
+            messages.append(f"已{'启用' if kind == 'enable' else '禁用'}计划 '{op['name']}'")
+        elif kind == "import":
+            if not isinstance(op.get("schedules"), list):
+                raise ValueError("导入的计划须为列表")
+            imported = [validate_schedule(s) for s in op["schedules"]]
+            names = [s["name"] for s in imported]
+            if len(set(names)) != len(names):
+                raise ValueError("导入的计划中有重复的名称")
+            # 同名计划被导入的版本覆盖
+            kept = [] if op.get("replace") else [s for s in result if s["name"] not in set(names)]
+            result = kept + imported
+            messages.append(f"已导入 {len(imported)} 个计划" + ("（替换原有计划）" if op.get("replace") else ""))
+        else:
+            raise ValueError(f"未知的计划操作: {kind}")
+    return result, messages
+
+def guardian_settings(config):
+    """配置中与守护进程有关的部分"""
+    return {key: value for key, value in config.items() if key.startswith("guardian_")}
+
+class SchedulerCore:
+    """调度核心：配置存储、计划引擎和本地 IPC，不依赖任何界面模块"""
+    remote = False
+    
+    def __init__(self, mode="gui"):
+        self.mode = mode
+        self.config = load_config()
+        self.revision = 0
+        self.guardian = None
+        self.lock = threading.RLock()
+        self.engine = ScheduleEngine(self)
+        self.ipc = IpcServer(self.handle_command)
+        self.listeners = []
+        self.stop_event = threading.Event()
+        self.offload = offload_backend()
+        self.offload_active = None  # 系统中是否可能留有本程序的任务，None 表示启动后尚未确认
+        self.api = None
+        self.metrics_writer = None
+        self.started_at = time.time()
+        # 服务模式下唯一的界面客户端：唤醒热键和 --show 让它显示到前台，而不是再启动一个
+        self.client_pid = None
+        self.client_launched = 0.0
+        self.client_show = threading.Event()
+    
+    def start(self):
+        """启动本地 IPC 和所有计划；已有实例在运行时抛出 InstanceRunningError，不启动任何计划"""
+        try:
+            self.ipc.start()
+        except InstanceRunningError:
+            raise
+        except Exception as e:
+            logging.error(f"启动本地 IPC 失败: {e}")
+        logging.info("启动所有计划")
+        with self.lock:
+            if self.prune_offloaded():
+                self.save()
+            self.sync_schedules()
+        self.setup_api()
+        self.setup_metrics_textfile()
+    
+    def setup_api(self):
+        """按配置启动、停止或换地址重启本机控制接口"""
+        address = api_address(self.config) if self.config.get("api_enabled", False) else None
+        if self.api is not None and self.api.address == address:
+            return
+        if self.api is not None:
+            self.api.stop()
+            self.api = None
+        if address is None:
+            return
+        api = ApiServer(self)
+        try:
+            api.start(address)
+            self.api = api
+        except Exception as e:
+            logging.error(f"启动控制接口失败: {e}")
+    
+    def setup_metrics_textfile(self):
+        """按配置启动或停止定期写出的 Prometheus 指标文件"""
+        path = self.config.get("metrics_textfile", "")
+        writer = self.metrics_writer
+        interval = metrics_interval(self.config)
+        if writer is not None and writer.key == (path, interval):
+            return
+        if writer is not None:
+            writer.stop()
+            self.metrics_writer = None
+        if path:
+            self.metrics_writer = MetricsTextfileWriter(self, path, interval)
+            self.metrics_writer.start()
+    
+    def metrics(self):
+        """运行状态快照，只读取计数，不做任何可能阻塞的操作"""
+        with self.lock:
+            schedules = list(self.config.get("schedules", []))
+        return {
+            "mode": self.mode,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "schedules": len(schedules),
+            "schedules_enabled": sum(1 for s in schedules if s.get("enabled", True)),
+            "schedules_running": len(self.engine.schedules),
+            "quick_timer": self.engine.quick is not None,
+            "threads": threading.active_count(),
+            "revision": self.revision,
+            "guardian": self.guardian.status() if self.guardian else None,
+        }
+    
+    def stop(self):
+        if self.api is not None:
+            self.api.stop()
+        if self.metrics_writer is not None:
+            self.metrics_writer.stop()
+        self.ipc.stop()
+        self.engine.stop_all()
+        if self.guardian:
+            self.guardian.shutdown()
+        self.stop_event.set()
+    
+    def add_listener(self, callback):
+        """注册配置变化回调 callback(event, data)，在发生变化的线程中调用"""
+        self.listeners.append(callback)
+    
+    def notify(self, event, data=None):
+        for callback in self.listeners:
+            try:
+                callback(event, data)
+            except Exception as e:
+                logging.error(f"配置变化回调出错: {e}")
+    
+    def save(self):
+        with self.lock:
+            self.revision += 1
+            return save_config(self.config)
+    
+    def sync_schedules(self):
+        """启用交给系统计划时只注册系统任务，否则由本进程的计划线程执行"""
+        with self.lock:
+            if self.config.get("offload_schedules", False) and self.offload:
+                self.offload_active = True
+                try:
+                    self.offload.sync(self.config["schedules"])
+                    self.engine.sync([])
+                    return
+                except Exception as e:
+                    logging.error(f"同步系统计划失败，改由本程序执行: {e}")
+            elif self.offload and self.offload_active is not False:
+                # 只在刚关闭该选项（或启动时）清理一次系统中的残留任务，不必每次保存都查询系统计划
+                try:
+                    self.offload.sync([])
+                    self.offload_active = False
+                except Exception as e:
+                    logging.error(f"清理系统计划失败: {e}")
+            self.engine.sync(self.config["schedules"])
+    
+    def prune_offloaded(self):
+        """交给系统计划时没有常驻线程来清理过期的单次计划，在保存前清理；有改动时返回 True"""
+        with self.lock:
+            if not (self.config.get("offload_schedules", False) and self.offload):
+                return False
+            now = datetime.datetime.now()
+            schedules = self.config["schedules"]
+            live = [s for s in schedules if not s.get("one_time") or ShutdownSchedule.from_dict(s).next_fire(now)]
+            if len(live) == len(schedules):
+                return False
+            self.config["schedules"] = live
+            return True
+    
+    def apply_schedules(self):
+        """保存配置并让运行中的计划与配置保持一致"""
+        with self.lock:
+            self.prune_offloaded()
+            self.save()
+            self.sync_schedules()
+    
+    def schedule_executed(self, name):
+        """单次计划执行（或过期）后从配置中移除，可在计划线程中调用"""
+        with self.lock:
+            self.config["schedules"] = [s for s in self.config["schedules"] if s["name"] != name]
+            self.apply_schedules()
+        self.notify(EVENT_SCHEDULE_REMOVED, name)
+    
+    def reload(self):
+        with self.lock:
+            self.config.clear()
+            self.config.update(load_config())
+            self.revision += 1
+            if self.prune_offloaded():
+                self.save()
+            self.sync_schedules()
+        self.setup_api()
+        self.setup_metrics_textfile()
+        self.notify(EVENT_CONFIG_CHANGED)
+    
+    def set_config(self, config, revision=None):
+        """整体替换配置（来自界面客户端），保存并应用
+        
+        revision 为客户端读取配置时的版本，期间配置已被修改（计划执行、命令行、控制接口）时不做修改并返回 False
+        """
+        with self.lock:
+            if revision is not None and revision != self.revision:
+                return False
+            guardian_before = guardian_settings(self.config)
+            self.config.clear()
+            self.config.update(config)
+            self.config.setdefault("schedules", [])
+            self.apply_schedules()
+        # 守护进程设置未变时不必检查、重启守护进程
+        if self.guardian and guardian_settings(self.config) != guardian_before:
+            self.guardian.setup_guardian()
+        self.setup_api()
+        self.setup_metrics_textfile()
+        self.notify(EVENT_CONFIG_CHANGED)
+        return True
+    
+    def batch(self, ops):
+        """作为一个事务执行一批计划修改：全部校验通过后只保存、同步和通知一次"""
+        with self.lock:
+            schedules, messages = apply_schedule_ops(self.config["schedules"], ops)
+            if schedules == self.config["schedules"]:
+                return messages
+            self.config["schedules"] = schedules
+            self.apply_schedules()
+        self.notify(EVENT_CONFIG_CHANGED)
+        return messages
+    
+    def pending_action(self, window=QUICK_PENDING_WINDOW):
+        """即将执行的操作：快捷定时优先，否则为 window 分钟内最早的计划；没有时返回 None"""
+        now = datetime.datetime.now()
+        with self.engine.lock:
+            quick = self.engine.quick
+            if quick:
+                return {"time": quick["time"], "type": quick["type"], "schedule": None}
+            best = None
+            for schedule in self.engine.schedules.values():
+                fire = schedule.next_fire(now)
+                if not fire or fire == schedule.skip_at or fire - now > datetime.timedelta(minutes=window):
+                    continue
+                if best is None or fire < best["time"]:
+                    best = {"time": fire, "type": schedule.shutdown_type, "schedule": schedule}
+            return best
+    
+    def quick_timer(self, minutes, shutdown_type="关机"):
+        positive_minutes(minutes)
+        deadline = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
+        self.engine.start_quick(deadline, shutdown_type)
+        message = f"将在 {minutes} 分钟后（{deadline:%H:%M}）{shutdown_type}"
+        logging.info(f"计划 '{QUICK_TIMER_NAME}' {message}", extra={"schedule": QUICK_TIMER_NAME, "action": shutdown_type})
+        self.notify(EVENT_QUICK_ACTION, message)
+        return message
+    
+    def cancel_pending(self):
+        """取消即将执行的操作（快捷定时或计划的这一次执行）"""
+        with self.engine.lock:
+            pending = self.pending_action()
+            if pending is None:
+                message = "没有即将执行的操作"
+            elif pending["schedule"] is None:
+                self.engine.cancel_quick()
+                message = f"已取消 {pending['time']:%H:%M} 的{pending['type']}"
+            else:
+                pending["schedule"].skip_at = pending["time"]
+                message = f"已取消计划 '{pending['schedule'].name}' 在 {pending['time']:%H:%M} 的{pending['type']}"
+        logging.info(message)
+        self.notify(EVENT_QUICK_ACTION, message)
+        return message
+    
+    def snooze(self, minutes=15):
+        """把即将执行的操作推迟若干分钟（计划跳过这一次，改为一个快捷定时）"""
+        positive_minutes(minutes)
+        with self.engine.lock:
+            pending = self.pending_action()
+            if pending is None:
+                message = "没有即将执行的操作"
+            else:
+                if pending["schedule"] is not None:
+                    pending["schedule"].skip_at = pending["time"]
+                deadline = pending["time"] + datetime.timedelta(minutes=minutes)
+                self.engine.start_quick(deadline, pending["type"])
+                message = f"{pending['type']}已推迟到 {deadline:%H:%M}"
+        logging.info(message)
+        self.notify(EVENT_QUICK_ACTION, message)
+        return message
+    
+    def handle_command(self, request):
+        cmd = request.get("cmd") if isinstance(request, dict) else None
+        if cmd == "ping":
+            return {"ok": True, "mode": self.mode, "pid": os.getpid()}
+        if cmd == "get_config":
+            with self.lock:
+                return {"ok": True, "config": json.loads(json.dumps(self.config)), "revision": self.revision}
+        if cmd == "set_config":
+            if not self.set_config(request["config"], request.get("revision")):
+                return {"ok": False, "conflict": True, "revision": self.revision, "error": "配置已被其他途径修改"}
+            return {"ok": True, "revision": self.revision}
+        if cmd == "revision":
+            return {"ok": True, "revision": self.revision}
+        if cmd == "list":
+            with self.lock:
+                return {"ok": True, "schedules": [dict(s) for s in self.config["schedules"]]}
+        if cmd == "next":
+            return {"ok": True, "next": self.engine.status()}
+        if cmd == "reload":
+            self.reload()
+            return {"ok": True}
+        if cmd == "batch":
+            try:
+                return {"ok": True, "messages": self.batch(request.get("ops", []))}
+            except ValueError as e:
+                # 校验失败是调用方的问题，整批不生效，不记为错误日志
+                return {"ok": False, "error": str(e)}
+        if cmd == "quick":
+            return {"ok": True, "message": self.quick_timer(request.get("minutes"), request.get("type", "关机"))}
+        if cmd == "cancel":
+            return {"ok": True, "message": self.cancel_pending()}
+        if cmd == "snooze":
+            return {"ok": True, "message": self.snooze(request.get("minutes", 15))}
+        if cmd == "client_attach":
+            return {"ok": True, "attached": self.attach_client(request["pid"])}
+        if cmd == "client_wait":
+            timeout = min(float(request.get("timeout", CLIENT_WAIT_TIMEOUT)), CLIENT_WAIT_TIMEOUT)
+            return {"ok": True, **self.wait_client_show(request["pid"], timeout)}
+        if cmd == "client_detach":
+            self.detach_client(request["pid"])
+            return {"ok": True}
+        if cmd == "forward":
+            return {"ok": True, "messages": self.run_actions(request.get("actions", []))}
+        if cmd == "stop":
+            if self.mode not in ("headless", "service"):
+                return {"ok": False, "error": "只有无界面模式和服务模式支持远程停止"}
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {"ok": True}
+        return {"ok": False, "error": f"未知命令: {cmd}"}
+    
+    def show_client(self):
+        """服务模式下显示界面：已有界面客户端时让它显示到前台，否则启动一个"""
+        with self.lock:
+            if self.client_pid is not None and process_alive(self.client_pid):
+                if platform.system() == "Windows":
+                    # 按下热键的是本进程，把切换前台窗口的权限交给客户端
+                    ctypes.windll.user32.AllowSetForegroundWindow(self.client_pid)
+                self.client_show.set()
+                return "已显示界面"
+            if time.time() - self.client_launched < CLIENT_START_GRACE:
+                return "界面正在启动"
+            self.client_launched = time.time()
+        launch_gui_client()
+        return "已打开界面"
+    
+    def attach_client(self, pid):
+        """界面客户端启动时登记；已有另一个界面客户端在运行时让它显示到前台并返回 False"""
+        with self.lock:
+            if self.client_pid not in (None, pid) and process_alive(self.client_pid):
+                self.client_show.set()
+                return False
+            self.client_pid = pid
+            self.client_launched = 0.0
+            self.client_show.clear()
+            return True
+    
+    def wait_client_show(self, pid, timeout):
+        """界面客户端的长轮询：有显示请求时 show 为真；该客户端已不是登记的客户端时 attached 为假"""
+        if pid != self.client_pid:
+            return {"show": False, "attached": False}
+        show = self.client_show.wait(timeout)
+        with self.lock:
+            if pid != self.client_pid:
+                return {"show": False, "attached": False}
+            if show:
+                self.client_show.clear()
+        return {"show": show, "attached": True}
+    
+    def detach_client(self, pid):
+        with self.lock:
+            if pid == self.client_pid:
+                self.client_pid = None
+                # 唤醒该客户端仍在等待的请求
+                self.client_show.set()
+    
+    def run_actions(self, actions):
+        """执行命令行参数对应的动作（可能由第二个实例转发而来），返回每个动作的结果"""
+        messages = []
+        for action, minutes in actions:
+            if action == "show":
+                if self.mode == "service":
+                    messages.append(self.show_client())
+                elif self.mode == "gui":
+                    self.notify(EVENT_SHOW_WINDOW)
+                    messages.append("已显示主界面")
+                else:
+                    messages.append("无界面模式不支持 --show")
+            elif action == "shutdown_in":
+                messages.append(self.quick_timer(minutes))
+            elif action == "cancel":
+                messages.append(self.cancel_pending())
+            elif action == "snooze":
+                messages.append(self.snooze(minutes))
+        return messages
+    
+    def run_forever(self):
+        """无界面/服务模式下阻塞主线程直到收到停止命令"""
+        try:
+            while not self.stop_event.wait(5):
+                pass
+        except KeyboardInterrupt:
+            logging.info("程序被用户中断")
+            self.stop()
+
+class RemoteCore:
+    """界面客户端使用的调度核心代理，修改通过本地 IPC 交给常驻服务"""
+    remote = True
+    
+    def __init__(self):
+        reply = self._call({"cmd": "get_config"})
+        self.config = reply["config"]
+        self.revision = reply["revision"]
+        self.listeners = []
+    
+    def _call(self, request):
+        reply = ipc_request(request)
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "未知错误"))
+        return reply
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        # 客户端退出不影响服务中的计划，只注销界面客户端
+        try:
+            ipc_request({"cmd": "client_detach", "pid": os.getpid()})
+        except Exception:
+            pass
+    
+    def attach(self):
+        """登记为常驻服务的界面客户端；已有另一个界面客户端时服务会让它显示，返回 False（本进程应退出）"""
+        if not self._call({"cmd": "client_attach", "pid": os.getpid()})["attached"]:
+            return False
+        threading.Thread(target=self._wait_show, daemon=True, name="ClientShow").start()
+        return True
+    
+    def _wait_show(self):
+        """长轮询服务端的显示请求（唤醒热键、--show），转为显示主窗口的事件"""
+        while True:
+            try:
+                reply = self._call({"cmd": "client_wait", "pid": os.getpid(), "timeout": CLIENT_WAIT_TIMEOUT})
+                if not reply["attached"]:
+                    # 服务重启过（或本客户端已注销）：重新登记，已有别的客户端时不再等待
+                    if not self._call({"cmd": "client_attach", "pid": os.getpid()})["attached"]:
+                        return
+                    continue
+            except Exception as e:
+                logging.debug(f"等待常驻服务的显示请求失败: {e}")
+                time.sleep(REMOTE_POLL_MS / 1000)
+                continue
+            if reply["show"]:
+                for callback in self.listeners:
+                    callback(EVENT_SHOW_WINDOW, None)
+    
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+    
+    def save(self):
+        """把设置保存到常驻服务；服务端配置已变化时（如单次计划执行后被移除），
+        计划以服务端为准、设置以本地为准合并后重试，不会覆盖别处做的计划修改"""
+        for _ in range(3):
+            try:
+                reply = ipc_request({"cmd": "set_config", "config": self.config, "revision": self.revision})
+                if reply.get("ok"):
+                    self.revision = reply["revision"]
+                    return True
+                if not reply.get("conflict"):
+                    raise RuntimeError(reply.get("error", "未知错误"))
+                settings = {key: value for key, value in self.config.items() if key != "schedules"}
+                self.refresh(settings)
+            except Exception as e:
+                logging.error(f"保存配置到常驻服务失败: {e}")
+                return False
+        logging.error("保存配置到常驻服务失败: 配置持续被其他途径修改")
+        return False
+    
+    def apply_schedules(self):
+        self.save()
+    
+    def batch(self, ops):
+        """计划修改交给服务端作为一个事务执行，校验失败时抛出 ValueError"""
+        reply = ipc_request({"cmd": "batch", "ops": ops})
+        if not reply.get("ok"):
+            raise ValueError(reply.get("error", "未知错误"))
+        self.refresh()
+        return reply["messages"]
+    
+    def refresh(self, overrides=None):
+        """从服务端重新读取配置（overrides 中的项保留本地的值）并通知界面"""
+        reply = self._call({"cmd": "get_config"})
+        self.config.clear()
+        self.config.update(reply["config"])
+        self.config.update(overrides or {})
+        self.revision = reply["revision"]
+        for callback in self.listeners:
+            callback(EVENT_CONFIG_CHANGED, None)
+    
+    def poll(self):
+        revision = self._call({"cmd": "revision"})["revision"]
+        if revision != self.revision:
+            self.refresh()
+
+def autostart_args(config):
+    """开机自启动使用的命令行参数"""
+    return "--service" if config.get("service_mode", False) else "--minimized"
+
+def self_command(*args):
+    """启动本程序自身的命令行"""
+    if getattr(sys, 'frozen', False):
+        return [sys.executable, *args]
+    return [sys.executable, os.path.abspath(sys.argv[0]), *args]
+
+def process_alive(pid):
+    """进程是否仍在运行"""
+    if platform.system() == "Windows":
+        kernel32 = ctypes.windll.kernel32
+        kernel32.OpenProcess.restype = ctypes.c_void_p
+        kernel32.WaitForSingleObject.argtypes = (ctypes.c_void_p, ctypes.c_uint32)
+        handle = kernel32.OpenProcess(0x00100000, False, pid)  # SYNCHRONIZE
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == 0x102  # WAIT_TIMEOUT：尚未退出
+        finally:
+            CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def launch_gui_client():
+    """从常驻服务按需启动界面客户端"""
+    try:
+        kwargs = {}
+        if platform.system() == "Windows":
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS
+        subprocess.Popen(self_command("--client"), **kwargs)
+        logging.info("已启动界面客户端")
+    except Exception as e:
+        logging.error(f"启动界面客户端失败: {e}")
+
+def positive_minutes(value):
+    """校验分钟数：须为正整数，否则抛出 ValueError（0 或负数会让快捷定时立即执行）"""
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        raise ValueError(f"分钟数须为正整数: {value!r}")
+    return value
+
+def parse_instance_args(argv):
+    """解析可转发的命令行参数，返回 [(动作, 分钟数或 None), ...]，参数有误时抛出 ValueError"""
+    actions = []
+    args = iter(argv)
+    for arg in args:
+        flag, _, value = arg.partition("=")
+        if flag not in FORWARD_FLAGS:
+            continue
+        if flag in ("--show", "--cancel"):
+            actions.append((flag[2:], None))
+            continue
+        if not value:
+            value = next(args, "")
+        if not value.isdigit() or int(value) <= 0:
+            raise ValueError(f"{flag} 需要一个正整数分钟数")
+        actions.append((flag[2:].replace("-", "_"), int(value)))
+    return actions
+
+def forward_to_instance(actions):
+    """把参数转发给正在运行的实例，成功转发（本进程应退出）时返回 True"""
+    try:
+        info = probe_instance()
+    except Exception as e:
+        logging.error(f"无法连接正在运行的实例: {e}")
+        return False
+    if info is None:
+        return False
+    if not actions:
+        if info.get("mode") == "service":
+            # 常驻服务没有界面，由本进程作为界面客户端连接
+            return False
+        if START_MINIMIZED:
+            # 开机自启动时已有实例在运行，静默退出
+            return True
+        actions = [("show", None)]
+    try:
+        reply = ipc_request({"cmd": "forward", "actions": actions})
+    except Exception as e:
+        logging.error(f"转发参数失败: {e}")
+        return False
+    if sys.stdout:
+        for message in reply.get("messages", []) if reply.get("ok") else [reply.get("error", "未知错误")]:
+            print(message)
+    return True
+
+def probe_instance():
+    """返回正在运行实例的 ping 响应，没有实例（IPC 地址不存在或无人监听）时返回 None
+    
+    其他错误（超时、密钥不符、无权访问管道等）说明实例在运行但连不上，照常抛出，
+    调用方不能把它当作没有实例而绕过正在运行的实例
+    """
+    try:
+        return ipc_request({"cmd": "ping"})
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+def start_service_process(timeout=10):
+    """启动常驻服务进程并等待其 IPC 可用"""
+    kwargs = {}
+    if platform.system() == "Windows":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NO_WINDOW
+    subprocess.Popen(self_command("--service"), **kwargs)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if probe_instance():
+                return True
+        except Exception as e:
+            logging.error(f"连接常驻服务失败: {e}")
+            return False
+        time.sleep(0.2)
+    return False
+
+class SessionWatcher(threading.Thread):
+    """Windows 会话变化通知（解锁、重新连接等）：隐藏窗口阻塞在消息循环上，没有空闲唤醒"""
+    WM_WTSSESSION_CHANGE = 0x02B1
+    EVENTS = {0x1: "控制台连接", 0x3: "远程连接", 0x5: "登录", 0x8: "解锁"}
+    
+    def __init__(self, callback):
+        super().__init__(daemon=True, name="SessionWatcher")
+        self.callback = callback
+    
+    def run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            logging.error(f"会话变化监听失败: {e}")
+    
+    def _loop(self):
+        wintypes = lazy_import("ctypes.wintypes")
+        user32 = ctypes.windll.user32
+        LRESULT = ctypes.c_ssize_t
+        WNDPROC = ctypes.WINFUNCTYPE(LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+        user32.DefWindowProcW.argtypes = (wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+        user32.DefWindowProcW.restype = LRESULT
+        
+        class WNDCLASSW(ctypes.Structure):
+            _fields_ = [("style", wintypes.UINT), ("lpfnWndProc", WNDPROC),
+                        ("cbClsExtra", ctypes.c_int), ("cbWndExtra", ctypes.c_int),
+                        ("hInstance", wintypes.HINSTANCE), ("hIcon", wintypes.HICON),
+                        ("hCursor", wintypes.HANDLE), ("hbrBackground", wintypes.HBRUSH),
+                        ("lpszMenuName", wintypes.LPCWSTR), ("lpszClassName", wintypes.LPCWSTR)]
+        
+        def wndproc(hwnd, msg, wparam, lparam):
+            if msg == self.WM_WTSSESSION_CHANGE and wparam in self.EVENTS:
+                try:
+                    self.callback(self.EVENTS[wparam])
+                except Exception as e:
+                    logging.error(f"会话变化回调出错: {e}")
+            return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+        
+        self.wndproc = WNDPROC(wndproc)  # 保持引用，避免回调被回收
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+        hinstance = kernel32.GetModuleHandleW(None)
+        
+        wc = WNDCLASSW()
+        wc.lpfnWndProc = self.wndproc
+        wc.hInstance = hinstance
+        wc.lpszClassName = "LazyShutdownSessionWatcher"
+        user32.RegisterClassW(ctypes.byref(wc))
+        
+        user32.CreateWindowExW.argtypes = (wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+                                           ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                           wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID)
+        user32.CreateWindowExW.restype = wintypes.HWND
+        hwnd = user32.CreateWindowExW(0, wc.lpszClassName, wc.lpszClassName, 0,
+                                      0, 0, 0, 0, None, None, hinstance, None)
+        if not hwnd or not ctypes.windll.wtsapi32.WTSRegisterSessionNotification(hwnd, 0):
+            raise ctypes.WinError()
+        
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+def key_released(scan_code):
+    """按系统实际的按键状态判断键是否已松开，无法判断时返回 None"""
+    if platform.system() != "Windows":
+        return None
+    user32 = ctypes.windll.user32
+    user32.GetAsyncKeyState.restype = ctypes.c_short
+    vk = user32.MapVirtualKeyW(scan_code, 1)  # MAPVK_VSC_TO_VK：左右两侧的修饰键映射到同一个虚拟键
+    if not vk:
+        return None
+    return not user32.GetAsyncKeyState(vk) & 0x8000
+
+class HotkeyManager:
+    """全局热键：所有组合键共用一个键盘钩子，按预先编译的查找表分发
+
+    记录注册状态，只在注册失败或会话变化时重新注册，失败时指数退避重试
+    """
+    def __init__(self, on_state=None):
+        self.bindings = {}  # {组合键: (动作描述, 回调)}
+        self.table = {}
+        self.invalid = {}
+        self.hook = None
+        self.pressed = {}  # {扫描码: 最近一次按下事件的时间}
+        self.swallowed = set()
+        self.state = "unregistered"
+        self.last_error = None
+        self.failures = 0
+        self.on_state = on_state  # 状态变化回调 on_state(state)，可能在任意线程中调用
+        self.lock = threading.RLock()
+        self.retry_timer = None
+        self.session_watcher = None
+    
+    def bind(self, bindings):
+        """设置 {组合键: (动作描述, 回调)} 并注册；组合键和动作都未变时不做任何操作"""
+        bindings = {combo: action for combo, action in bindings.items() if combo}
+        signature = {combo: label for combo, (label, _) in bindings.items()}
+        with self.lock:
+            current = {combo: label for combo, (label, _) in self.bindings.items()}
+            if signature == current and self.state == "registered":
+                return True
+            self.bindings = bindings
+            self.failures = 0
+            return self.register()
+    
+    def compile(self, keyboard):
+        """编译查找表 {触发键扫描码: [(修饰键扫描码组, 全部修饰键扫描码, 回调), ...]}"""
+        table = {}
+        self.invalid = {}
+        for combo, (label, callback) in self.bindings.items():
+            try:
+                steps = keyboard.parse_hotkey(combo)
+                if len(steps) != 1:
+                    raise ValueError("不支持多步组合键")
+                *modifiers, trigger = steps[0]
+            except Exception as e:
+                self.invalid[combo] = str(e)
+                logging.warning(f"忽略无效的热键 '{combo}' ({label}): {e}")
+                continue
+            groups = tuple(frozenset(group) for group in modifiers)
+            entry = (groups, frozenset().union(*groups), callback)
+            for code in trigger:
+                table.setdefault(code, []).append(entry)
+        return table
+    
+    def register(self, reason=None):
+        with self.lock:
+            if self.retry_timer is not None:
+                self.retry_timer.cancel()
+                self.retry_timer = None
+            try:
+                keyboard = lazy_import("keyboard")
+                if self.hook is not None:
+                    keyboard.unhook(self.hook)
+                    self.hook = None
+                self.table = self.compile(keyboard)
+                self.pressed.clear()
+                self.swallowed.clear()
+                if self.table:
+                    self.hook = keyboard.hook(self.on_key, suppress=True)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                delay = min(HOTKEY_RETRY_MAX, HOTKEY_RETRY_BASE * 2 ** (self.failures - 1))
+                logging.error(f"热键注册失败（第 {self.failures} 次），{delay} 秒后重试: {e}")
+                self.retry_timer = threading.Timer(delay, self.register, args=("重试",))
+                self.retry_timer.daemon = True
+                self.retry_timer.start()
+                self._set_state("failed")
+                return False
+            
+            self.failures = 0
+            self.last_error = None
+            if self.table:
+                suffix = f"（{reason}）" if reason else ""
+                names = ", ".join(f"{combo}={label}" for combo, (label, _) in self.bindings.items()
+                                  if combo not in self.invalid)
+                logging.info(f"热键 {names} 注册成功{suffix}")
+            self._set_state("registered" if self.table else "unregistered")
+            return True
+    
+    def on_key(self, event):
+        """键盘钩子回调（在钩子线程中，必须尽快返回）；返回 False 表示吞掉该按键"""
+        code = event.scan_code
+        if event.event_type == "up":
+            self.pressed.pop(code, None)
+            if code in self.swallowed:
+                self.swallowed.discard(code)
+                return False
+            return True
+        
+        now = time.monotonic()
+        self.release_stale(now)
+        if code in self.pressed:
+            # 按住不放时系统重复发送 down，只在第一次触发；已吞掉的键继续吞掉
+            self.pressed[code] = now
+            return code not in self.swallowed
+        self.pressed[code] = now
+        entries = self.table.get(code)
+        if not entries:
+            return True
+        held = self.pressed.keys() - {code}
+        for groups, allowed, callback in entries:
+            # 需要的修饰键都按下，且没有按下其他键
+            if held <= allowed and all(held & group for group in groups):
+                self.swallowed.add(code)
+                threading.Thread(target=self._run, args=(callback,), daemon=True, name="HotkeyAction").start()
+                return False
+        return True
+    
+    def release_stale(self, now):
+        """丢弃抬起事件丢失的键（例如在 UAC 或 Ctrl+Alt+Del 安全桌面上松开），否则之后的组合键都无法匹配"""
+        for code, seen in list(self.pressed.items()):
+            released = key_released(code)
+            if released is None:
+                released = now - seen > HOTKEY_STALE_AFTER
+            if released:
+                del self.pressed[code]
+                self.swallowed.discard(code)
+    
+    @staticmethod
+    def _run(callback):
+        try:
+            callback()
+        except Exception as e:
+            logging.error(f"热键动作执行出错: {e}")
+    
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_state:
+            self.on_state(state)
+    
+    def watch_sessions(self):
+        """会话解锁或重新连接后重新注册（键盘钩子可能在会话切换后失效）"""
+        if platform.system() != "Windows" or self.session_watcher is not None:
+            return
+        self.session_watcher = SessionWatcher(lambda event: self.register(f"会话{event}"))
+        self.session_watcher.start()
+    
+    def describe(self):
+        text = HOTKEY_STATE_TEXT.get(self.state, self.state)
+        if self.state == "failed":
+            text += f"（已失败 {self.failures} 次: {self.last_error}）"
+        if self.invalid:
+            text += f"；无效: {', '.join(self.invalid)}"
+        return text
+
+def compile_quick_action(core, spec):
+    """把 "shutdown_in:30" / "cancel" / "snooze:15" 编译为直接调用调度核心的动作"""
+    name, _, arg = spec.partition(":")
+    if name == "shutdown_in":
+        minutes = positive_minutes(int(arg))
+        return lambda: core.quick_timer(minutes)
+    if name == "cancel":
+        return core.cancel_pending
+    if name == "snooze":
+        minutes = positive_minutes(int(arg or 15))
+        return lambda: core.snooze(minutes)
+    raise ValueError(f"未知的快捷操作: {spec}")
+
+def hotkey_bindings(config, core, show):
+    """唤醒热键加上（启用时）快捷操作热键"""
+    bindings = {config.get("hotkey", "ctrl+alt+l"): ("show", show)}
+    if config.get("quick_hotkeys_enabled", False):
+        for combo, spec in config.get("quick_hotkeys", DEFAULT_CONFIG["quick_hotkeys"]).items():
+            try:
+                bindings[combo] = (spec, compile_quick_action(core, spec))
+            except ValueError as e:
+                logging.warning(f"忽略快捷热键 '{combo}': {e}")
+    return bindings
+
+def register_service_hotkey(core):
+    """服务模式下注册唤醒热键，按下时显示界面客户端（没有时启动一个）"""
+    hotkeys = HotkeyManager()
+    
+    def register(event=None, data=None):
+        hotkeys.bind(hotkey_bindings(core.config, core, core.show_client))
+    
+    register()
+    hotkeys.watch_sessions()
+    core.add_listener(lambda event, data=None: register() if event == EVENT_CONFIG_CHANGED else None)
+    return hotkeys
+
+class GuardianManager:
+    """启动、停止并监控守护进程"""
+    def __init__(self, config, on_state=None):
+        self.config = config
+        self.on_state = on_state  # 状态变化回调，在监控线程中调用
+        self.state = "stopped"
+        self.guardian_process = None
+        self.guardian_monitor_running = False
+        self.guardian_monitor_thread = None
+        self.guardian_supervisor = RestartSupervisor(
+            "守护进程", window=GUARDIAN_RESTART_WINDOW, max_restarts=GUARDIAN_RESTART_MAX,
+            base=GUARDIAN_BACKOFF_BASE, max_delay=GUARDIAN_BACKOFF_MAX,
+            cooldown=GUARDIAN_BREAKER_COOLDOWN, stable_after=GUARDIAN_STABLE_AFTER)
+    
     def setup_guardian(self):
         """根据配置设置守护进程"""
         enabled = self.config.get("guardian_enabled", False)
@@ -290,6 +2848,13 @@ class LazyShutdownApp:
         if not self.guardian_monitor_running:
             self.start_guardian_monitor()
     
+    def set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        if self.on_state:
+            self.on_state(state)
+    
     def get_guardian_args(self):
         """获取当前守护进程的启动参数"""
         return {
@@ -334,8 +2899,16 @@ class LazyShutdownApp:
                 
             # 检查守护进程是否在运行
             if self.guardian_process is None or self.guardian_process.poll() is not None:
-                logging.warning("守护进程未运行，尝试重新启动")
-                self.start_guardian()
+                if self.guardian_supervisor.allow():
+                    logging.warning("守护进程未运行，尝试重新启动")
+                    self.set_state("restarting")
+                    self.start_guardian()
+                    self.guardian_supervisor.record_restart()
+                elif self.guardian_supervisor.state == RestartSupervisor.OPEN:
+                    self.set_state("tripped")
+            else:
+                self.guardian_supervisor.record_running()
+                self.set_state("running")
     
     def start_guardian(self):
         """启动守护进程"""
@@ -368,37 +2941,412 @@ class LazyShutdownApp:
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
             logging.info(f"守护进程已启动，参数: {args}")
+            self.set_state("running")
+        except Exception as e:
+            logging.error(f"启动守护进程失败: {e}")
+    
+    def stop_guardian(self):
+        """停止守护进程"""
+        if self.guardian_process:
+            try:
+                self.guardian_process.terminate()
+                try:
+                    self.guardian_process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.guardian_process.kill()
+                logging.info("守护进程已停止")
+            except Exception as e:
+                logging.error(f"停止守护进程失败: {e}")
+            finally:
+                self.guardian_process = None
+                self.set_state("stopped")
+    
+    def status(self):
+        supervisor = self.guardian_supervisor
+        return {"state": self.state, "breaker": supervisor.state,
+                "restarts": supervisor.total_restarts, "trips": supervisor.total_trips}
+    
+    def shutdown(self):
+        self.stop_guardian_monitor()
+        self.stop_guardian()
+        logging.info(f"守护进程重启统计: {self.guardian_supervisor.summary()}")
+
+def next_enabled_fire(schedules, now=None):
+    """所有启用计划中最早的下一次执行，返回 (时间, 计划字典)，没有时返回 (None, None)"""
+    now = now or datetime.datetime.now()
+    best = (None, None)
+    for data in schedules:
+        if not data.get("enabled", True):
+            continue
+        try:
+            fire = ShutdownSchedule.from_dict(data).next_fire(now)
+        except Exception:
+            continue
+        if fire and (best[0] is None or fire < best[0]):
+            best = (fire, data)
+    return best
+
+class TrayIcon:
+    """常驻的托盘图标：只创建一次、在一个长期线程中运行，通过可见性切换显示/隐藏"""
+    def __init__(self, on_show, on_quit):
+        self.on_show = on_show
+        self.on_quit = on_quit
+        self.images = {}
+        self.font = None
+        self.icon = None
+        self.ready = False
+        self.lock = threading.Lock()
+        self.state = None
+        self.title = APP_NAME
+        self.visible = False
+    
+    def image(self, state):
+        """按状态取图标，每种状态只渲染一次"""
+        image = self.images.get(state)
+        if image is None:
+            Image = lazy_import("PIL.Image")
+            ImageDraw = lazy_import("PIL.ImageDraw")
+            if self.font is None:
+                ImageFont = lazy_import("PIL.ImageFont")
+                try:
+                    self.font = ImageFont.truetype("arial.ttf", 20) if os.name == 'nt' else ImageFont.load_default()
+                except Exception:
+                    self.font = ImageFont.load_default()
+            image = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(image)
+            draw.rectangle((16, 16, 48, 48), fill=TRAY_STATE_COLORS[state])
+            draw.text((32, 32), "LS", fill="white", anchor="mm", font=self.font)
+            self.images[state] = image
+        return image
+    
+    def start(self, state="armed"):
+        if self.icon is not None:
+            return
+        pystray = lazy_import("pystray")
+        
+        # 托盘回调运行在托盘线程，由调用方转交主线程执行
+        menu = pystray.Menu(
+            pystray.MenuItem("显示主界面", lambda: self.on_show()),
+            pystray.MenuItem("退出", lambda: self.on_quit())
+        )
+        self.state = state
+        self.icon = pystray.Icon("lazy_shutdown", self.image(state), self.title, menu)
+        threading.Thread(target=self.run, daemon=True, name="TrayIconThread").start()
+    
+    def run(self):
+        def setup(icon):
+            with self.lock:
+                icon.visible = self.visible
+                self.ready = True
+        
+        try:
+            self.icon.run(setup=setup)
+        except Exception as e:
+            logging.error(f"托盘图标运行出错: {str(e)}")
+    
+    def set_visible(self, visible):
+        """托盘线程尚未就绪时只记录期望状态，由 setup 应用"""
+        with self.lock:
+            self.visible = visible
+            if self.icon is None or not self.ready:
+                return
+            try:
+                self.icon.visible = visible
+            except Exception as e:
+                logging.error(f"切换托盘图标可见性出错: {e}")
+    
+    def show(self):
+        self.set_visible(True)
+    
+    def hide(self):
+        self.set_visible(False)
+    
+    def update(self, state, title):
+        """状态或提示文字变化时才替换图标"""
+        if self.icon is None:
+            return
+        try:
+            if state != self.state:
+                self.state = state
+                self.icon.icon = self.image(state)
+            if title != self.title:
+                self.title = title
+                self.icon.title = title
         except Exception as e:
-            logging.error(f"启动守护进程失败: {e}")
+            logging.error(f"更新托盘图标出错: {e}")
     
-    def stop_guardian(self):
-        """停止守护进程"""
-        if self.guardian_process:
+    def notify(self, message):
+        """托盘气泡通知（不支持时忽略）"""
+        if self.icon is None or not self.ready:
+            return
+        try:
+            self.icon.notify(message, APP_NAME)
+        except Exception as e:
+            logging.debug(f"托盘通知失败: {e}")
+    
+    def stop(self):
+        if self.icon is None:
+            return
+        try:
+            self.icon.stop()
+        except Exception as e:
+            logging.error(f"关闭托盘图标时出错: {e}")
+        self.icon = None
+        self.ready = False
+        self.visible = False
+
+class UiWatchdog:
+    """界面卡顿监测：after 定时器测量事件循环延迟，后台线程在卡顿时转储所有线程栈"""
+    def __init__(self, threshold_ms=1000):
+        self.threshold = threshold_ms / 1000
+        self.samples = deque(maxlen=UI_WATCHDOG_SAMPLES)
+        self.stalls = 0
+        self.running = False
+        self.root = None
+        self.last_tick = time.monotonic()
+        self.expected = self.last_tick
+        self.dump_file = None
+    
+    def start(self, root):
+        if self.running:
+            return
+        self.root = root
+        self.running = True
+        self.last_tick = time.monotonic()
+        self.expected = self.last_tick + UI_WATCHDOG_TICK_MS / 1000
+        root.after(UI_WATCHDOG_TICK_MS, self.tick)
+        threading.Thread(target=self.watch, daemon=True, name="UiWatchdog").start()
+        logging.info(f"界面卡顿监测已启用，阈值 {self.threshold * 1000:.0f} ms")
+    
+    def stop(self):
+        self.running = False
+    
+    def tick(self):
+        if not self.running:
+            return
+        now = time.monotonic()
+        self.samples.append(max(0.0, now - self.expected) * 1000)
+        self.last_tick = now
+        self.expected = now + UI_WATCHDOG_TICK_MS / 1000
+        self.root.after(UI_WATCHDOG_TICK_MS, self.tick)
+    
+    def watch(self):
+        """主循环超过阈值没有响应时转储一次线程栈，恢复后重新计数"""
+        faulthandler = lazy_import("faulthandler")
+        dumped = False
+        while self.running:
+            time.sleep(min(self.threshold / 4, 0.5))
+            lag = time.monotonic() - self.last_tick - UI_WATCHDOG_TICK_MS / 1000
+            if lag < self.threshold:
+                dumped = False
+                continue
+            if dumped:
+                continue
+            dumped = True
+            self.stalls += 1
+            logging.warning(f"界面已卡顿 {lag * 1000:.0f} ms，线程栈已写入 {UI_STALL_LOG}")
             try:
-                self.guardian_process.terminate()
-                try:
-                    self.guardian_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    self.guardian_process.kill()
-                logging.info("守护进程已停止")
+                if self.dump_file is None:
+                    self.dump_file = open(UI_STALL_LOG, "a", encoding="utf-8")
+                self.dump_file.write(f"\n[{datetime.datetime.now()}] 界面卡顿 {lag * 1000:.0f} ms\n")
+                self.dump_file.flush()
+                faulthandler.dump_traceback(file=self.dump_file, all_threads=True)
             except Exception as e:
-                logging.error(f"停止守护进程失败: {e}")
-            finally:
-                self.guardian_process = None
+                logging.error(f"转储线程栈失败: {e}")
+    
+    def percentiles(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return None
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+        return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": samples[-1],
+                "count": len(samples), "stalls": self.stalls}
     
-    def start_heartbeat(self):
-        def heartbeat():
+    def summary(self):
+        stats = self.percentiles()
+        if not stats:
+            return "暂无数据"
+        return (f"事件循环延迟 p50 {stats['p50']:.0f} ms / p90 {stats['p90']:.0f} ms / "
+                f"p99 {stats['p99']:.0f} ms / 最大 {stats['max']:.0f} ms\n"
+                f"样本 {stats['count']} 个，卡顿 {stats['stalls']} 次（线程栈见 {UI_STALL_LOG.name}）")
+
+class EventBus:
+    """线程安全的界面事件总线：任意线程投递，界面线程批量取出并按类型合并"""
+    def __init__(self):
+        self.queue = queue.Queue()
+    
+    def post(self, kind, data=None):
+        self.queue.put((kind, data))
+    
+    def drain(self, block=False, timeout=None):
+        """取出当前积压的事件，返回 {类型: [数据, ...]}，按首次出现的顺序"""
+        batch = {}
+        try:
+            kind, data = self.queue.get(block, timeout)
+        except queue.Empty:
+            return batch
+        batch[kind] = [data]
+        for _ in range(EVENT_BUS_BATCH - 1):
             try:
-                if self.show_main_window_hotkey is None:
-                    self.setup_hotkey()
-            except Exception as e:
-                logging.error(f"心跳检测中热键检查失败: {e}")
-            
-            self.root.after(60000, heartbeat)
+                kind, data = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.setdefault(kind, []).append(data)
+        return batch
+
+class LazyShutdownApp:
+    def __init__(self, root, icon_path, core):
+        """root 为 None 时（最小化启动）不创建主窗口，第一次打开主界面时再创建"""
+        self.root = None
+        self.core = core
+        self.icon_path = icon_path
+        
+        # 配置由调度核心持有；客户端模式下计划、热键和守护进程都由常驻服务负责
+        self.config = core.config
+        self.client_mode = core.remote
+        
+        # 其他线程（计划、IPC、热键、托盘、守护进程监控）只通过事件总线与界面交互
+        self.bus = EventBus()
+        self.guardian_state = "stopped"
+        self.guardian = None if self.client_mode else GuardianManager(
+            self.config, on_state=lambda state: self.bus.post(EVENT_GUARDIAN_STATE, state))
+        if self.guardian:
+            # 由调度核心负责退出时关闭，控制接口也经由核心查询守护进程状态
+            core.guardian = self.guardian
+        self.admin_checked = False
+        self.watchdog = None
+        self.autostart_probe = AutostartProbe()
+        
+        # 初始化：先只创建界面，其余在首帧绘制之后进行
+        self.tray = None
+        self.tray_generation = 0  # 托盘定期刷新链的编号
+        self.hotkeys = HotkeyManager(on_state=lambda state: self.bus.post(EVENT_HOTKEY_STATE, state))
+        if root is not None:
+            self.build_window(root)
+        core.add_listener(self.on_core_event)
+        self.after(STARTUP_DEFER_MS, self.deferred_init)
+    
+    def build_window(self, root):
+        """创建主窗口及其控件"""
+        root.title(APP_NAME)        
+        root.geometry("600x500")
         
-        heartbeat()
+        style = ttk.Style()
+        style.configure(".", font=("微软雅黑", 10))
+        style.configure("TButton", padding=6)
+        style.configure("TCheckbutton", padding=8)
+        
+        self.center_window(root, 600, 500)
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
+        root.resizable(True, True)
+        root.bind("<Unmap>", self.on_minimize)
+        self.icon_path = root.icon_path
+        self.root = root
+        self.create_widgets()
+        root.after(EVENT_BUS_POLL_MS, self.pump_events)
+        self.set_ui_watchdog(self.config.get("ui_watchdog", False))
+        mark_startup("创建界面")
+    
+    def ensure_window(self):
+        """最小化启动时，第一次打开主界面才创建 Tk 和全部控件（须在主线程调用）"""
+        if self.root is None:
+            self.build_window(create_root(self.icon_path))
+            if not self.admin_checked:
+                self.root.after(STARTUP_DEFER_MS, self.check_admin_privileges)
+        return self.root
+    
+    def after(self, ms, callback):
+        """在界面线程上延迟执行回调；其他线程或主窗口创建前经事件总线转交"""
+        if self.root is not None and threading.current_thread() is threading.main_thread():
+            self.root.after(ms, callback)
+        elif ms <= 0:
+            self.bus.post(EVENT_CALL, callback)
+        else:
+            timer = threading.Timer(ms / 1000, self.bus.post, args=(EVENT_CALL, callback))
+            timer.daemon = True
+            timer.start()
+    
+    def run(self):
+        """主线程循环：主窗口创建前直接阻塞等待事件，创建后交给 Tk 事件循环定时取出"""
+        while self.root is None:
+            self.dispatch_events(self.bus.drain(block=True))
+        self.root.mainloop()
+    
+    def pump_events(self):
+        try:
+            self.dispatch_events(self.bus.drain())
+        finally:
+            self.root.after(EVENT_BUS_POLL_MS, self.pump_events)
+    
+    def dispatch_events(self, batch):
+        """处理一批事件：同类事件合并，计划的多次变化只刷新一次界面"""
+        if not batch:
+            return
+        if batch.keys() & {EVENT_SCHEDULE_FIRED, EVENT_SCHEDULE_REMOVED, EVENT_CONFIG_CHANGED}:
+            if self.root is not None:
+                self.load_schedules()
+            if self.tray and self.tray.visible:
+                self.refresh_tray()
+        if EVENT_QUICK_ACTION in batch and self.tray and self.tray.visible:
+            self.refresh_tray()
+            self.tray.notify(batch[EVENT_QUICK_ACTION][-1])
+        if EVENT_SHOW_WINDOW in batch:
+            self.show_main_window()
+        if EVENT_GUARDIAN_STATE in batch:
+            self.guardian_state = batch[EVENT_GUARDIAN_STATE][-1]
+        if batch.keys() & {EVENT_GUARDIAN_STATE, EVENT_HOTKEY_STATE}:
+            self.update_status()
+        for callback in dict.fromkeys(batch.get(EVENT_CALL, ())):
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"界面回调出错: {e}")
+    
+    def set_ui_watchdog(self, enabled):
+        if enabled and self.watchdog is None:
+            self.watchdog = UiWatchdog(self.config.get("ui_stall_threshold_ms", 1000))
+            self.watchdog.start(self.root)
+        elif not enabled and self.watchdog is not None:
+            self.watchdog.stop()
+            self.watchdog = None
+    
+    def update_status(self):
+        if self.root is not None:
+            self.guardian_label.configure(text=self.status_text())
+    
+    def status_text(self):
+        """标题栏右侧的状态：热键不可用时优先提示"""
+        if self.hotkeys.state == "failed":
+            return f"热键 {self.config.get('hotkey', '')} 不可用"
+        return GUARDIAN_STATE_TEXT.get(self.guardian_state, "")
+    
+    def deferred_init(self):
+        """非关键的启动步骤：热键、管理员检查；自启动与守护进程随后在主线程中设置"""
+        if self.client_mode:
+            self.poll_remote()
+        else:
+            self.setup_hotkey()
+            self.hotkeys.watch_sessions()
+        
+        def autostart_and_guardian():
+            self.apply_autostart()
+            self.setup_guardian()
+            mark_startup("自启动与守护进程")
+            report_startup()
+        
+        # 与设置对话框保存时一样在主线程中执行，两者不会同时改写自启动项或启停守护进程
+        self.after(0, autostart_and_guardian)
+        mark_startup("热键注册")
+        if self.root is not None:
+            self.check_admin_privileges()
+
+    def setup_guardian(self):
+        """根据配置设置守护进程（客户端模式下由常驻服务负责）"""
+        if self.guardian:
+            self.guardian.setup_guardian()
     
     def check_admin_privileges(self):
+        self.admin_checked = True
         if platform.system() == "Windows":
             try:
                 if ctypes.windll.shell32.IsUserAnAdmin() == 0:
@@ -432,24 +3380,6 @@ class LazyShutdownApp:
                 logging.error(f"重新启动为管理员失败: {str(e)}")
                 messagebox.showerror("错误", "无法以管理员权限重新启动程序")
     
-    def init_logging(self):
-        log_file = CONFIG_DIR / "lazy_shutdown.log"
-        log_file.parent.mkdir(parents=True, exist_ok=True)
-    
-        handler = logging.handlers.RotatingFileHandler(
-            log_file, 
-            maxBytes=1024*1024,
-            backupCount=3,
-            encoding='utf-8'
-        )
-        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-    
-        logger = logging.getLogger()
-        logger.setLevel(logging.DEBUG)
-        logger.addHandler(handler)
-    
-        logging.info(f"{APP_NAME} 启动")
-    
     def center_window(self, window, width, height):
         window.update_idletasks()
         screen_width = window.winfo_screenwidth()
@@ -461,36 +3391,17 @@ class LazyShutdownApp:
         window.geometry(f"{width}x{height}+{x}+{y}")
     
     def setup_hotkey(self):
-        hotkey = self.config.get("hotkey", "ctrl+alt+l")
-        
-        def hotkey_callback():
-            try:
-                self.show_main_window_from_hotkey()
-            except Exception as e:
-                logging.error(f"热键回调出错: {e}")
-                self.root.after(1000, self.setup_hotkey)
-        
-        try:
-            if self.show_main_window_hotkey is not None:
-                try:
-                    keyboard.remove_hotkey(self.show_main_window_hotkey)
-                except:
-                    pass
-        
-            self.show_main_window_hotkey = keyboard.add_hotkey(
-                hotkey, 
-                hotkey_callback,
-                suppress=True
-            )
-            logging.info(f"热键 '{hotkey}' 注册成功")
-        except Exception as e:
-            logging.error(f"热键设置失败: {e}")
-            self.root.after(5000, self.setup_hotkey)
+        """注册唤醒热键（客户端模式下由常驻服务负责）"""
+        if self.client_mode:
+            return
+        # 唤醒回调运行在热键线程中，界面操作转交主线程
+        self.hotkeys.bind(hotkey_bindings(
+            self.config, self.core, lambda: self.after(0, self.show_main_window_from_hotkey)))
     
     def show_main_window_from_hotkey(self):
         try:
-            if self.root.state() == 'iconic' or not self.root.winfo_viewable() or self.tray_icon:
-                self.root.after(0, self.show_main_window)
+            if self.root is None or self.root.state() == 'iconic' or not self.root.winfo_viewable() or (self.tray and self.tray.visible):
+                self.after(0, self.show_main_window)
         except Exception as e:
             logging.error(f"热键唤醒失败: {e}")
             try:
@@ -513,6 +3424,13 @@ class LazyShutdownApp:
         )
         title_label.pack(side=tk.LEFT)
         
+        self.guardian_label = ttk.Label(
+            title_frame,
+            text=self.status_text(),
+            foreground="gray"
+        )
+        self.guardian_label.pack(side=tk.RIGHT)
+        
         self.schedule_frame = ttk.Frame(main_frame)
         self.schedule_frame.pack(fill=tk.BOTH, expand=True)
         
@@ -578,7 +3496,7 @@ class LazyShutdownApp:
             return
         
         for idx, schedule_data in enumerate(self.config["schedules"]):
-            schedule = ShutdownSchedule.from_dict(schedule_data, self)
+            schedule = ShutdownSchedule.from_dict(schedule_data, self.core)
             self.add_schedule_to_ui(schedule, idx)
     
     def add_schedule_to_ui(self, schedule, idx):
@@ -622,12 +3540,19 @@ class LazyShutdownApp:
             if isinstance(child, ttk.Checkbutton):
                 child.config(text="启用" if schedule.enabled else "禁用")
         
-        if schedule.enabled:
-            schedule.start()
-        else:
-            schedule.stop()
-        
-        self.save_config()
+        self.edit_schedules([{"op": "enable" if schedule.enabled else "disable", "name": schedule.name}])
+    
+    def edit_schedules(self, ops):
+        """计划修改交给调度核心作为一个事务执行（与命令行、控制接口相同），
+        界面由随后的配置变化事件刷新；失败时提示并返回 False"""
+        try:
+            self.core.batch(ops)
+            return True
+        except Exception as e:
+            logging.error(f"修改计划失败: {e}")
+            messagebox.showerror("错误", str(e), parent=self.root)
+            self.load_schedules()
+            return False
     
     def show_schedule_context_menu(self, event, schedule):
         menu = tk.Menu(self.root, tearoff=0)
@@ -647,21 +3572,24 @@ class LazyShutdownApp:
             time_str,
             [now.isoweekday()],
             True,
-            True,
-            self
+            True
         )
         
-        self.config["schedules"].append(one_time_schedule.to_dict())
-        self.save_config()
-        self.load_schedules()
-        one_time_schedule.start()
-        
+        if not self.edit_schedules([{"op": "add", "schedule": one_time_schedule.to_dict()}]):
+            return
         messagebox.showinfo("单次执行", f"已创建单次执行计划，将在 {time_str} 执行")
     
-    def remove_executed_schedule(self, schedule_name):
-        self.config["schedules"] = [s for s in self.config["schedules"] if s["name"] != schedule_name]
-        self.save_config()
-        self.load_schedules()
+    def on_core_event(self, event, data=None):
+        """调度核心的事件（可能来自计划线程或 IPC 线程），转交事件总线"""
+        self.bus.post(event, data)
+    
+    def poll_remote(self):
+        """客户端模式下定期检查服务端配置是否被其他途径修改"""
+        try:
+            self.core.poll()
+        except Exception as e:
+            logging.error(f"与常驻服务通信失败: {e}")
+        self.after(REMOTE_POLL_MS, self.poll_remote)
     
     def create_new_schedule(self):
         dialog = ScheduleDialog(self.root, "新建关机计划", self.icon_path)
@@ -669,28 +3597,9 @@ class LazyShutdownApp:
         self.root.wait_window(dialog.top)
         
         if dialog.result:
-            new_schedule = ShutdownSchedule(
-                dialog.result.name,
-                dialog.result.shutdown_type,
-                dialog.result.time,
-                dialog.result.days,
-                True,
-                dialog.result.one_time,
-                self
-            )
-            
-            self.config["schedules"].append(new_schedule.to_dict())
-            self.save_config()
-            self.load_schedules()
-            new_schedule.start()
+            self.edit_schedules([{"op": "add", "schedule": dialog.result.to_dict()}])
     
     def modify_schedule(self, schedule):
-        idx = next((i for i, s in enumerate(self.config["schedules"]) if s["name"] == schedule.name), -1)
-        if idx == -1:
-            return
-            
-        schedule.stop()
-        
         dialog = ScheduleDialog(
             self.root, 
             "修改计划",
@@ -704,18 +3613,10 @@ class LazyShutdownApp:
         self.root.wait_window(dialog.top)
         
         if dialog.result:
-            schedule.name = dialog.result.name
-            schedule.shutdown_type = dialog.result.shutdown_type
-            schedule.time = dialog.result.time
-            schedule.days = dialog.result.days
-            schedule.one_time = dialog.result.one_time
-            
-            self.config["schedules"][idx] = schedule.to_dict()
-            self.save_config()
-            self.load_schedules()
-            
-            if schedule.enabled:
-                schedule.start()
+            # 按名称修改：对话框打开期间计划可能已被命令行或控制接口删除、调整顺序
+            changes = dialog.result.to_dict()
+            del changes["enabled"]
+            self.edit_schedules([{"op": "update", "name": schedule.name, "schedule": changes}])
     
     def delete_schedule(self, schedule):
         self.root.attributes('-topmost', True)
@@ -725,10 +3626,7 @@ class LazyShutdownApp:
             return
         
         self.root.attributes('-topmost', False)
-        schedule.stop()
-        self.config["schedules"] = [s for s in self.config["schedules"] if s["name"] != schedule.name]
-        self.save_config()
-        self.load_schedules()
+        self.edit_schedules([{"op": "rm", "name": schedule.name}])
     
     def show_delete_dialog(self):
         if not self.config.get("schedules", []):
@@ -743,49 +3641,22 @@ class LazyShutdownApp:
         self.root.wait_window(dialog.top)
         
         if dialog.selected_schedules:
-            for name in dialog.selected_schedules:
-                schedule = next((s for s in self.config["schedules"] if s["name"] == name), None)
-                if schedule:
-                    sched_obj = ShutdownSchedule.from_dict(schedule, self)
-                    sched_obj.stop()
-            
-            self.config["schedules"] = [s for s in self.config["schedules"] if s["name"] not in dialog.selected_schedules]
-            self.save_config()
-            self.load_schedules()
+            # 对话框打开期间已被别处删除的计划直接跳过
+            names = {s["name"] for s in self.config["schedules"]}
+            self.edit_schedules([{"op": "rm", "name": name} for name in dialog.selected_schedules if name in names])
     
     def show_settings(self):
         SettingsDialog(self.root, self.config, self, self.icon_path)
     
-    def start_all_schedules(self):
-        logging.info("启动所有计划")
-        for schedule_data in self.config.get("schedules", []):
-            schedule = ShutdownSchedule.from_dict(schedule_data, self)
-            if schedule.enabled:
-                logging.info(f"启动计划: {schedule.name}")
-                schedule.start()
-    
-    def stop_all_schedules(self):
-        logging.info("停止所有计划")
-        for schedule_data in self.config.get("schedules", []):
-            schedule = ShutdownSchedule.from_dict(schedule_data, self)
-            schedule.stop()
-    
-    def set_auto_start(self, enable):
-        if platform.system() != "Windows":
-            return False
-            
-        app_name = "LazyShutdown"
-        app_path = os.path.abspath(sys.argv[0])
-        
-        if enable and self.config.get("use_task_scheduler", False):
-            return self.set_task_scheduler(enable)
-        
-        return self.set_registry_auto_start(enable)
-    
     def set_task_scheduler(self, enable):
-        app_name = "LazyShutdown"
+        app_name = AUTO_START_NAME
         app_path = os.path.abspath(sys.argv[0])
         
+        # 系统中的任务已是期望状态时不再启动 schtasks
+        command, arguments = f'"{app_path}"', autostart_args(self.config)
+        if self.autostart_probe.task_state(command, arguments) == ("match" if enable else "absent"):
+            return True
+        
         try:
             if enable:
                 xml_template = f"""<?xml version="1.0" encoding="UTF-16"?>
@@ -827,7 +3698,7 @@ class LazyShutdownApp:
   <Actions Context="Author">
     <Exec>
       <Command>"{app_path}"</Command>
-      <Arguments>--minimized</Arguments>
+      <Arguments>{autostart_args(self.config)}</Arguments>
     </Exec>
   </Actions>
 </Task>
@@ -845,6 +3716,7 @@ class LazyShutdownApp:
                 
                 if result.returncode == 0:
                     logging.info("已创建任务计划实现开机自启动")
+                    self.autostart_probe.applied(command, arguments, "match")
                     return True
                 else:
                     logging.error(f"任务计划创建失败: {result.stderr.decode('gbk')}")
@@ -859,6 +3731,7 @@ class LazyShutdownApp:
                 
                 if result.returncode == 0:
                     logging.info("已删除开机自启动任务")
+                    self.autostart_probe.applied(command, arguments, "absent")
                     return True
                 else:
                     logging.error(f"任务计划删除失败: {result.stderr.decode('gbk')}")
@@ -868,14 +3741,19 @@ class LazyShutdownApp:
             return False
     
     def set_registry_auto_start(self, enable):
-        app_name = "LazyShutdown"
+        app_name = AUTO_START_NAME
         app_path = os.path.abspath(sys.argv[0])
         
         if enable:
-            app_path_with_args = f'"{app_path}" --minimized'
+            app_path_with_args = f'"{app_path}" {autostart_args(self.config)}'
         else:
             app_path_with_args = app_path
         
+        # 注册表已是期望状态时不再写入
+        current = read_registry_autostart()
+        if (current == app_path_with_args) if enable else (current is None):
+            return True
+        
         try:
             key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, AUTO_START_KEY, 0, winreg.KEY_WRITE)
             
@@ -896,31 +3774,60 @@ class LazyShutdownApp:
             logging.error(error_msg)
             return False
     
-    def create_tray_icon(self):
-        if self.tray_icon:
+    def apply_autostart(self):
+        """按配置设置开机自启动：先清理未选用的方式，再设置选用的方式"""
+        if platform.system() != "Windows":
             return
-            
-        image = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(image)
-        draw.rectangle((16, 16, 48, 48), fill="#4b6eaf")
-        font = ImageFont.truetype("arial.ttf", 20) if os.name == 'nt' else ImageFont.load_default()
-        draw.text((32, 32), "LS", fill="white", anchor="mm", font=font)
-        
-        menu = pystray.Menu(
-            pystray.MenuItem("显示主界面", self.show_main_window),
-            pystray.MenuItem("退出", self.quit_app)
-        )
-        
-        self.tray_icon = pystray.Icon("lazy_shutdown", image, APP_NAME, menu)
+        use_task = self.config.get("use_task_scheduler", False)
+        use_registry = self.config.get("auto_start", False) and not use_task
+        if not use_registry:
+            self.set_registry_auto_start(False)
+        if not use_task:
+            self.set_task_scheduler(False)
+        if use_registry:
+            self.set_registry_auto_start(True)
+        elif use_task:
+            self.set_task_scheduler(True)
+    
+    def tray_status(self):
+        """根据下一次执行的计划（或快捷定时）得出托盘状态和提示文字"""
+        fire, data = next_enabled_fire(self.config.get("schedules", []))
+        quick = getattr(self.core, "engine", None) and self.core.engine.quick
+        if quick and (fire is None or quick["time"] <= fire):
+            fire, data = quick["time"], {"type": quick["type"]}
+        if fire is None:
+            return "idle", f"{APP_NAME} - 无待执行计划"
+        minutes = int((fire - datetime.datetime.now()).total_seconds() + 59) // 60
+        when = fire.strftime("%H:%M") if fire.date() == datetime.date.today() else fire.strftime("%m-%d %H:%M")
+        title = f"{APP_NAME} - {when} {data.get('type', '')}"
+        if minutes < TRAY_SOON_MINUTES:
+            return "soon", f"{title}（{max(minutes, 0)} 分钟后）"
+        return "armed", title
+    
+    def refresh_tray(self):
+        if self.tray:
+            self.tray.update(*self.tray_status())
+    
+    def tray_tick(self, generation=None):
+        """托盘可见时定期刷新状态（仅在状态变化时换图）
+        
+        不带参数调用时开始新的刷新链；旧链（托盘隐藏后又很快显示时仍在等待）在下一次触发时自行结束
+        """
+        if generation is None:
+            self.tray_generation += 1
+            generation = self.tray_generation
+        elif generation != self.tray_generation:
+            return
+        if not (self.tray and self.tray.visible):
+            return
+        self.refresh_tray()
+        self.after(TRAY_REFRESH_MS, lambda: self.tray_tick(generation))
     
     def show_main_window(self, icon=None, item=None):
-        if self.tray_icon:
-            try:
-                self.tray_icon.stop()
-            except Exception as e:
-                logging.error(f"关闭托盘图标时出错: {e}")
-            self.tray_icon = None
+        if self.tray:
+            self.tray.hide()
         
+        self.ensure_window()
         self.root.deiconify()
         self.root.attributes('-topmost', True)
         self.root.after_idle(lambda: self.root.attributes('-topmost', False))
@@ -930,74 +3837,50 @@ class LazyShutdownApp:
         if not self.config.get("minimize_to_tray", True):
             return
             
-        if self.config.get("hide_tray_icon", False):
+        if self.root is not None:
             self.root.withdraw()
+        if self.config.get("hide_tray_icon", False):
             logging.info("最小化到任务栏")
         else:
-            self.root.withdraw()
-            self.create_tray_icon()
-            
-            if self.tray_icon:
-                self.tray_running = True
-                
-                threading.Thread(
-                    target=self.run_tray_icon, 
-                    daemon=True,
-                    name="TrayIconThread"
-                ).start()
-                
-                logging.info("最小化到系统托盘")
-    
-    def run_tray_icon(self):
-        try:
-            self.tray_icon.run()
-        except Exception as e:
-            logging.error(f"托盘图标运行出错: {str(e)}")
+            state, title = self.tray_status()
+            if self.tray is None:
+                self.tray = TrayIcon(
+                    on_show=lambda: self.after(0, self.show_main_window),
+                    on_quit=lambda: self.after(0, self.quit_app)
+                )
+                self.tray.title = title
+                self.tray.start(state)
+            was_visible = self.tray.visible
+            self.tray.show()
+            if not was_visible:
+                self.tray_tick()
+            logging.info("最小化到系统托盘")
     
     def on_minimize(self, event):
+        if self.client_mode:
+            return
         if event.widget == self.root and self.config.get("minimize_to_tray", True):
             self.minimize_to_tray()
     
     def quit_app(self, icon=None, item=None):
-        try:
-            if self.tray_icon:
-                self.tray_icon.stop()
-        except:
-            pass
-            
-        self.stop_guardian_monitor()
-        self.stop_guardian()
-        self.stop_all_schedules()
+        if self.tray:
+            self.tray.stop()
+        
+        self.core.stop()
         logging.info("程序退出")
-        self.root.destroy()
+        if self.root is not None:
+            self.root.destroy()
         sys.exit(0)
     
     def on_close(self):
-        if self.config.get("minimize_to_tray", True):
+        # 客户端关闭即完全退出，计划由常驻服务继续执行
+        if self.config.get("minimize_to_tray", True) and not self.client_mode:
             self.minimize_to_tray()
         else:
             self.quit_app()
     
-    def load_config(self):
-        try:
-            if CONFIG_FILE.exists():
-                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-        except Exception as e:
-            error_msg = f"加载配置失败: {e}"
-            logging.error(error_msg)
-        return DEFAULT_CONFIG.copy()
-    
     def save_config(self):
-        try:
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
-            logging.info("配置文件已保存")
-            return True
-        except Exception as e:
-            error_msg = f"保存配置失败: {e}"
-            logging.error(error_msg)
-            return False
+        return self.core.save()
 
 class ScheduleDialog:
     def __init__(self, parent, title, icon_path, name="", shutdown_type="关机", time="00:00", days=None):
@@ -1274,6 +4157,11 @@ class SettingsDialog:
         notebook.add(security_frame, text="安全")
         self.create_security_settings(security_frame)
         
+        # 日志标签页
+        logs_frame = ttk.Frame(notebook)
+        notebook.add(logs_frame, text="日志")
+        self.create_log_viewer(logs_frame)
+        
         # 关于标签页
         about_frame = ttk.Frame(notebook)
         notebook.add(about_frame, text="关于")
@@ -1386,6 +4274,67 @@ class SettingsDialog:
         hotkey_entry.pack(side=tk.LEFT)
         ttk.Label(hotkey_frame, text="(例如: ctrl+alt+l)").pack(side=tk.LEFT, padx=(5, 0))
         
+        self.quick_hotkeys_var = tk.BooleanVar(value=self.config.get("quick_hotkeys_enabled", False))
+        ttk.Checkbutton(
+            tray_frame,
+            text="启用快捷操作热键",
+            variable=self.quick_hotkeys_var
+        ).pack(anchor=tk.W, padx=10, pady=(5, 0))
+        quick_specs = {"shutdown_in": "{}分钟后关机", "cancel": "取消即将执行的操作", "snooze": "推迟{}分钟"}
+        quick_lines = []
+        for combo, spec in self.config.get("quick_hotkeys", DEFAULT_CONFIG["quick_hotkeys"]).items():
+            name, _, arg = spec.partition(":")
+            quick_lines.append(f"{combo}: {quick_specs.get(name, spec).format(arg)}")
+        ttk.Label(
+            tray_frame,
+            text="* " + "  ".join(quick_lines),
+            font=("微软雅黑", 8),
+            wraplength=420,
+            justify=tk.LEFT
+        ).pack(anchor=tk.W, padx=20, pady=(0, 5))
+        
+        if not self.app.client_mode:
+            hotkey_state = self.app.hotkeys.state
+            ttk.Label(
+                tray_frame,
+                text=f"热键状态: {self.app.hotkeys.describe()}",
+                foreground="red" if hotkey_state == "failed" else "gray",
+                font=("微软雅黑", 8)
+            ).pack(anchor=tk.W, padx=20, pady=(0, 5))
+        
+        self.service_mode_var = tk.BooleanVar(value=self.config.get("service_mode", False))
+        service_cb = ttk.Checkbutton(
+            tray_frame,
+            text="后台服务模式（关闭界面后计划继续运行，界面按需启动）",
+            variable=self.service_mode_var
+        )
+        service_cb.pack(anchor=tk.W, padx=10, pady=5)
+        
+        service_note = ttk.Label(
+            tray_frame,
+            text="* 服务模式下按唤醒热键或再次运行程序即可打开界面\n"
+                 "* 重新启动程序后生效",
+            font=("微软雅黑", 8),
+            justify=tk.LEFT
+        )
+        service_note.pack(anchor=tk.W, padx=20, pady=(0, 5))
+        
+        self.offload_var = tk.BooleanVar(value=self.config.get("offload_schedules", False))
+        offload_cb = ttk.Checkbutton(
+            tray_frame,
+            text="交给系统任务计划程序执行（程序无需常驻）",
+            variable=self.offload_var
+        )
+        offload_cb.pack(anchor=tk.W, padx=10, pady=5)
+        
+        self.watchdog_var = tk.BooleanVar(value=self.config.get("ui_watchdog", False))
+        watchdog_cb = ttk.Checkbutton(
+            tray_frame,
+            text="记录界面卡顿（诊断用，结果见“关于”页）",
+            variable=self.watchdog_var
+        )
+        watchdog_cb.pack(anchor=tk.W, padx=10, pady=5)
+        
         perm_frame = ttk.LabelFrame(parent, text="权限设置")
         perm_frame.pack(fill=tk.X, pady=10, padx=5)
         
@@ -1475,6 +4424,16 @@ class SettingsDialog:
         )
         show_console_cb.pack(anchor=tk.W, pady=2)
         
+        # 守护进程开销（读取守护进程写出的指标文件）
+        metrics_frame = ttk.LabelFrame(parent, text="守护进程开销")
+        metrics_frame.pack(fill=tk.X, pady=10, padx=5)
+        ttk.Label(
+            metrics_frame,
+            text=format_guardian_metrics(load_guardian_metrics()),
+            font=("微软雅黑", 8),
+            justify=tk.LEFT
+        ).pack(anchor=tk.W, padx=10, pady=5)
+        
         self.toggle_guardian_settings()
     
     def create_about_settings(self, parent):
@@ -1514,6 +4473,81 @@ class SettingsDialog:
         copy_button.pack(side=tk.RIGHT, padx=(10, 0))
         
         github_label.bind("<Button-1>", lambda e: webbrowser.open(GITHUB_URL))
+        
+        # 界面响应情况（启用卡顿监测时）
+        ui_frame = ttk.LabelFrame(parent, text="界面响应")
+        ui_frame.pack(fill=tk.X, pady=10, padx=5)
+        watchdog = self.app.watchdog
+        ttk.Label(
+            ui_frame,
+            text=watchdog.summary() if watchdog else "未启用界面卡顿监测（可在“常规”页开启）",
+            justify=tk.LEFT,
+            font=("微软雅黑", 9)
+        ).pack(anchor=tk.W, padx=10, pady=5)
+    
+    def create_log_viewer(self, parent):
+        query_frame = ttk.LabelFrame(parent, text="查询日志")
+        query_frame.pack(fill=tk.X, pady=10, padx=5)
+        
+        row = ttk.Frame(query_frame)
+        row.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(row, text="来源:").pack(side=tk.LEFT)
+        self.log_source_var = tk.StringVar(value="主程序")
+        ttk.Combobox(row, textvariable=self.log_source_var, values=["主程序", "守护进程"],
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(row, text="计划:").pack(side=tk.LEFT)
+        self.log_schedule_var = tk.StringVar()
+        ttk.Combobox(row, textvariable=self.log_schedule_var,
+                     values=[""] + [s["name"] for s in self.config.get("schedules", [])],
+                     width=15).pack(side=tk.LEFT, padx=5)
+        
+        row = ttk.Frame(query_frame)
+        row.pack(fill=tk.X, padx=10, pady=5)
+        ttk.Label(row, text="从:").pack(side=tk.LEFT)
+        self.log_since_var = tk.StringVar(value=datetime.date.today().isoformat())
+        ttk.Entry(row, textvariable=self.log_since_var, width=17).pack(side=tk.LEFT, padx=5)
+        ttk.Label(row, text="到:").pack(side=tk.LEFT)
+        self.log_until_var = tk.StringVar()
+        ttk.Entry(row, textvariable=self.log_until_var, width=17).pack(side=tk.LEFT, padx=5)
+        self.log_query_button = ttk.Button(row, text="查询", width=6, command=self.query_logs)
+        self.log_query_button.pack(side=tk.RIGHT)
+        
+        ttk.Label(query_frame, text="* 时间格式: 2024-05-01 或 2024-05-01 22:00，留空表示不限",
+                  font=("微软雅黑", 8)).pack(anchor=tk.W, padx=20, pady=(0, 5))
+        
+        text_frame = ttk.Frame(parent)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 10))
+        self.log_text = tk.Text(text_frame, height=14, wrap=tk.NONE, font=("Consolas", 9))
+        log_scroll = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=log_scroll.set)
+        self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        log_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+    
+    def query_logs(self):
+        """在后台线程中查询，结果经事件总线交回界面线程显示"""
+        source = "guardian" if self.log_source_var.get() == "守护进程" else "main"
+        since = self.log_since_var.get().strip() or None
+        until = self.log_until_var.get().strip() or None
+        schedule = self.log_schedule_var.get().strip() or None
+        self.log_query_button.state(["disabled"])
+        
+        def worker():
+            try:
+                records = query_logs(source, since, until, schedule, limit=LOG_VIEW_LIMIT)
+                text = "\n".join(records) or "没有符合条件的记录"
+            except Exception as e:
+                text = f"查询日志失败: {e}"
+            self.app.after(0, lambda: self.show_log_result(text))
+        
+        threading.Thread(target=worker, daemon=True, name="LogQuery").start()
+    
+    def show_log_result(self, text):
+        if not self.top.winfo_exists():
+            return
+        self.log_query_button.state(["!disabled"])
+        self.log_text.delete("1.0", tk.END)
+        self.log_text.insert(tk.END, text)
+        self.log_text.see(tk.END)
     
     def toggle_guardian_settings(self):
         state = "normal" if self.guardian_enabled_var.get() else "disabled"
@@ -1527,42 +4561,79 @@ class SettingsDialog:
         messagebox.showinfo("已复制", "链接已复制到剪贴板")
     
     def on_ok(self):
-        current_option = self.startup_var.get()
+        values = self.collect()
+        changed = {key for key, value in values.items() if self.config.get(key, DEFAULT_CONFIG.get(key)) != value}
+        self.config.update(values)
         
-        if current_option != "registry":
-            self.app.set_registry_auto_start(False)
-        
-        if current_option != "task":
-            self.app.set_task_scheduler(False)
-        
-        if current_option == "registry":
-            self.app.set_registry_auto_start(True)
-        elif current_option == "task":
-            self.app.set_task_scheduler(True)
-        
-        self.config["auto_start"] = (current_option == "registry")
-        self.config["use_task_scheduler"] = (current_option == "task")
-        self.config["minimize_to_tray"] = self.tray_var.get()
-        self.config["hide_tray_icon"] = self.hide_tray_var.get()
-        self.config["hotkey"] = self.hotkey_var.get().strip()
-        self.config["run_as_admin"] = self.admin_var.get()
-        
-        # 更新守护进程配置
-        self.config["guardian_enabled"] = self.guardian_enabled_var.get()
-        self.config["guardian_autostart"] = self.guardian_autostart_var.get()
-        self.config["guardian_autorestart"] = self.guardian_autorestart_var.get()
-        self.config["guardian_terminate_taskmgr"] = self.guardian_terminate_taskmgr_var.get()
-        self.config["guardian_hide_window"] = self.guardian_hide_window_var.get()
-        self.config["guardian_show_console"] = self.guardian_show_console_var.get()  # 新增控制台显示选项
-        
-        self.app.setup_hotkey()
-        self.app.setup_guardian()
-        self.app.save_config()
-        
-        if self.config["run_as_admin"]:
+        if not changed:
+            self.top.destroy()
+            return
+        logging.info(f"设置已修改: {', '.join(sorted(changed))}")
+        
+        # 只调用受影响的部分；各自先检查系统中的现状，已一致时不做任何操作
+        if changed & {"auto_start", "use_task_scheduler", "service_mode"}:
+            self.app.apply_autostart()
+        if changed & {"hotkey", "quick_hotkeys_enabled"}:
+            self.app.setup_hotkey()
+        if any(key.startswith("guardian_") for key in changed):
+            self.app.setup_guardian()
+        if "ui_watchdog" in changed:
+            self.app.set_ui_watchdog(self.config["ui_watchdog"])
+        if "offload_schedules" in changed:
+            self.app.core.apply_schedules()
+        else:
+            self.app.save_config()
+        
+        if "run_as_admin" in changed and self.config["run_as_admin"]:
             self.app.check_admin_privileges()
         
         self.top.destroy()
+    
+    def collect(self):
+        """对话框中各设置项的当前值"""
+        current_option = self.startup_var.get()
+        return {
+            "auto_start": current_option == "registry",
+            "use_task_scheduler": current_option == "task",
+            "service_mode": self.service_mode_var.get(),
+            "minimize_to_tray": self.tray_var.get(),
+            "hide_tray_icon": self.hide_tray_var.get(),
+            "hotkey": self.hotkey_var.get().strip(),
+            "quick_hotkeys_enabled": self.quick_hotkeys_var.get(),
+            "run_as_admin": self.admin_var.get(),
+            "offload_schedules": self.offload_var.get(),
+            "ui_watchdog": self.watchdog_var.get(),
+            "guardian_enabled": self.guardian_enabled_var.get(),
+            "guardian_autostart": self.guardian_autostart_var.get(),
+            "guardian_autorestart": self.guardian_autorestart_var.get(),
+            "guardian_terminate_taskmgr": self.guardian_terminate_taskmgr_var.get(),
+            "guardian_hide_window": self.guardian_hide_window_var.get(),
+            "guardian_show_console": self.guardian_show_console_var.get(),
+        }
+
+def app_icon_path():
+    if platform.system() != "Windows":
+        return None
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, "icon.ico")
+
+def create_root(icon_path):
+    """创建（隐藏的）Tk 根窗口"""
+    load_tk()
+    root = tk.Tk()
+    root.withdraw()
+    if icon_path:
+        try:
+            root.iconbitmap(icon_path)
+        except Exception as e:
+            logging.error(f"设置图标失败: {str(e)}")
+            icon_path = None
+    root.icon_path = icon_path
+    mark_startup("创建 Tk")
+    return root
 
 def is_admin():
     if platform.system() == "Windows":
@@ -1573,20 +4644,55 @@ def is_admin():
     return False
 
 def main():
-    if platform.system() == "Windows":
-        mutex = ctypes.windll.kernel32.CreateMutexW(None, False, "LazyShutdownMutex")
-        if ctypes.windll.kernel32.GetLastError() == 183:
-            ctypes.windll.user32.MessageBoxW(0, "程序已在运行中", APP_NAME, 0)
-            return
+    if CLI:
+        attach_console()
+        if sys.argv[1] == "logs":
+            sys.exit(logs_main(sys.argv[2:]))
+        sys.exit(schedules_main(sys.argv[1], sys.argv[2:]))
+    
+    try:
+        actions = parse_instance_args(sys.argv[1:])
+    except ValueError as e:
+        if sys.stderr:
+            print(e, file=sys.stderr)
+        sys.exit(2)
     
+    client_mode = "--client" in sys.argv
     start_minimized = "--minimized" in sys.argv
     
+    # 已有实例在运行：转发参数后立即退出（此时还没有导入 Tk/PIL，也不请求管理员权限）
+    if not client_mode and not HEADLESS and forward_to_instance(actions):
+        return
+    
+    if platform.system() == "Windows" and not client_mode:
+        mutex = ctypes.windll.kernel32.CreateMutexW(None, False, "LazyShutdownMutex")
+        if ctypes.windll.kernel32.GetLastError() == 183:
+            # 已有常驻服务在运行时，作为界面客户端连接它
+            try:
+                info = probe_instance()
+            except Exception:
+                info = None
+            if info and info.get("mode") == "service" and not HEADLESS:
+                CloseHandle(mutex)
+                client_mode = True
+            elif HEADLESS:
+                # 无界面模式可能运行在无人登录的机器上，不能弹出等待点击的对话框
+                if sys.stderr:
+                    print("程序已在运行中", file=sys.stderr)
+                sys.exit(1)
+            else:
+                ctypes.windll.user32.MessageBoxW(0, "程序已在运行中", APP_NAME, 0)
+                return
+    
     run_as_admin = True
+    service_mode = False
+    config = {}
     try:
         if CONFIG_FILE.exists():
             with open(CONFIG_FILE, "r", encoding="utf-8") as f:
                 config = json.load(f)
                 run_as_admin = config.get("run_as_admin", True)
+                service_mode = config.get("service_mode", False)
     except:
         pass
     
@@ -1600,43 +4706,88 @@ def main():
             with open(log_file, "a", encoding="utf-8") as log:
                 log.write(f"[{datetime.datetime.now()}] 请求管理员权限失败: {str(e)}\n")
     
-    root = tk.Tk()
-    root.withdraw()
+    init_logging("lazy_shutdown_client.log" if client_mode else "lazy_shutdown.log", config)
+    mark_startup("单实例与权限检查")
     
-    try:
-        if platform.system() == "Windows":
-            base_path = os.path.dirname(os.path.abspath(__file__))
-            icon_path = os.path.join(base_path, "icon.ico")
-            
-            if getattr(sys, 'frozen', False):
-                base_path = sys._MEIPASS
-                icon_path = os.path.join(base_path, "icon.ico")
-                
-            root.iconbitmap(icon_path)
-        else:
-            icon_path = None
-    except Exception as e:
-        log_file = CONFIG_DIR / "lazy_shutdown.log"
-        with open(log_file, "a", encoding="utf-8") as log:
-            log.write(f"[{datetime.datetime.now()}] 设置图标失败: {str(e)}\n")
-        icon_path = None
+    # 无界面/服务模式：只运行调度核心，通过本地 IPC 控制
+    if HEADLESS:
+        core = SchedulerCore(mode="service" if SERVICE else "headless")
+        try:
+            core.start()
+        except InstanceRunningError as e:
+            logging.error(str(e))
+            sys.exit(1)
+        mark_startup("启动调度核心")
+        if SERVICE:
+            core.guardian = GuardianManager(core.config)
+            core.guardian.setup_guardian()
+            register_service_hotkey(core)
+            mark_startup("守护进程与热键")
+        core.run_actions(actions)
+        report_startup()
+        logging.info(f"以{'常驻服务' if SERVICE else '无界面'}模式运行")
+        core.run_forever()
+        logging.info("程序退出")
+        return
     
-    root.icon_path = icon_path
+    # 服务模式但服务尚未运行：先启动服务，再作为客户端连接
+    if service_mode and not client_mode:
+        if platform.system() == "Windows":
+            CloseHandle(mutex)
+        if not start_service_process():
+            logging.error("常驻服务启动超时")
+            return
+        if start_minimized:
+            return
+        client_mode = True
     
-    app = LazyShutdownApp(root, icon_path)
+    if client_mode:
+        try:
+            core = RemoteCore()
+            attached = core.attach()
+        except Exception as e:
+            logging.error(f"连接常驻服务失败: {e}")
+            load_tk().Tk().withdraw()
+            messagebox.showerror(APP_NAME, f"无法连接后台服务: {e}")
+            return
+        if not attached:
+            logging.info("已有界面客户端在运行，已让其显示到前台")
+            return
+    else:
+        core = SchedulerCore()
+        try:
+            core.start()
+        except InstanceRunningError as e:
+            # 转发参数之后才有实例启动完成
+            logging.error(str(e))
+            return
+    mark_startup("启动调度核心")
+    # 没有实例可转发时由本进程执行参数（主窗口是否显示仍由 --minimized 决定）
+    actions = [action for action in actions if action[0] != "show"]
+    if actions:
+        try:
+            if client_mode:
+                ipc_request({"cmd": "forward", "actions": actions})
+            else:
+                core.run_actions(actions)
+        except Exception as e:
+            logging.error(f"执行命令行参数失败: {e}")
     
-    if start_minimized:
+    icon_path = app_icon_path()
+    if start_minimized and not client_mode:
+        # 最小化启动只运行调度核心和托盘，Tk 和主窗口在第一次打开时才创建
+        app = LazyShutdownApp(None, icon_path, core)
         app.minimize_to_tray()
     else:
+        root = create_root(icon_path)
+        app = LazyShutdownApp(root, icon_path, core)
         root.deiconify()
         
     try:
-        root.mainloop()
+        app.run()
     except KeyboardInterrupt:
-        log_file = CONFIG_DIR / "lazy_shutdown.log"
-        with open(log_file, "a", encoding="utf-8") as log:
-            log.write(f"[{datetime.datetime.now()}] 程序被用户中断\n")
+        logging.info("程序被用户中断")
         app.quit_app()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,47 @@
 import os, sys, time, psutil, subprocess, ctypes, json, logging, argparse
+import queue, gzip, shutil, re, fnmatch
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from collections import deque
 from datetime import datetime
 import tkinter as tk
 from threading import Thread
+from restart_supervisor import RestartSupervisor
 
 APP_NAME = "懒人关机器"
 MAIN_EXE = "懒人关机器.exe"
-CHECK_INTERVAL = 5
+CHECK_INTERVAL = 5           # 最短检查间隔（秒），有事件发生后立即回到该值
+MAX_CHECK_INTERVAL = 60      # 空闲时检查间隔的默认上限（秒）
+INTERVAL_BACKOFF = 1.5       # 每次空闲检查后间隔放大的倍数
 TASK_MANAGERS = ["taskmgr.exe", "processhacker.exe", "procexp.exe", "procexp64.exe"]
+CONFIG_CHANGED_EVENT = "Local\\LazyShutdownConfigChanged"  # 主程序保存配置后触发的命名事件
+
+# 主程序重启策略
+RESTART_WINDOW = 600         # 统计重启次数的滑动窗口（秒）
+RESTART_MAX_IN_WINDOW = 5    # 窗口内最多重启次数，超过则熔断
+BACKOFF_BASE = 5             # 首次退避时间（秒）
+BACKOFF_MAX = 300            # 单次退避上限（秒）
+BREAKER_COOLDOWN = 1800      # 熔断后冷却时间（秒）
+STABLE_AFTER = 60            # 主程序持续运行多久视为启动成功（秒）
+
+# 守护进程窗口日志视图
+LOG_VIEW_MAX_LINES = 2000    # 窗口最多保留的日志行数，超出后丢弃最旧的行
+LOG_VIEW_FLUSH_MS = 200      # 界面刷新间隔（毫秒）
+LOG_VIEW_BATCH = 200         # 每次刷新最多写入的行数
+LOG_VIEW_COLORS = {"error": "red", "warning": "orange", "info": "black"}
+
+# keep_alive 规则：command 只能是安装目录下的程序；未配置频率限制时使用默认限制，避免立即退出的程序被每轮重启
+KEEP_ALIVE_LIMIT_MAX = 3
+KEEP_ALIVE_LIMIT_PER = 300
+
+# 自身指标
+METRICS_DUMP_INTERVAL = 30   # 指标文件写入间隔（秒）
+SCAN_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)  # 扫描耗时直方图的分桶上界（毫秒）
+
+# 日志
+LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+_log_queue = queue.Queue(-1)
+_log_listener = None
+_log_signature = None
 
 def is_guardian_running():
     """检查是否已有守护进程实例在运行（排除自身）"""
@@ -58,6 +93,20 @@ if sys.platform == "win32":
     SetStdHandle = ctypes.windll.kernel32.SetStdHandle
     STD_OUTPUT_HANDLE = -11
     STD_ERROR_HANDLE = -12
+    
+    # 配置变更通知（命名事件）
+    CreateEventW = ctypes.windll.kernel32.CreateEventW
+    CreateEventW.argtypes = (ctypes.c_void_p, ctypes.c_bool, ctypes.c_bool, ctypes.c_wchar_p)
+    CreateEventW.restype = ctypes.c_void_p
+    WaitForSingleObject = ctypes.windll.kernel32.WaitForSingleObject
+    WaitForSingleObject.argtypes = (ctypes.c_void_p, ctypes.c_uint32)
+    WaitForSingleObject.restype = ctypes.c_uint32
+    CloseHandle = ctypes.windll.kernel32.CloseHandle
+    CloseHandle.argtypes = (ctypes.c_void_p,)
+    WAIT_OBJECT_0 = 0
+
+def config_path():
+    return os.path.join(os.getenv('APPDATA'), "LazyShutdown", "lazy_shutdown_config.json")
 
 def load_config():
     cfg = {
@@ -65,37 +114,136 @@ def load_config():
         "autorestart": True, 
         "hide_window": True, 
         "show_window": False,
-        "show_console": False  # 控制台显示选项
+        "show_console": False,  # 控制台显示选项
+        "log_max_bytes": 1024 * 1024,
+        "log_backup_count": 3,
+        "log_compress": False,
+        "rules": [],            # 自定义进程规则
+        "max_interval": MAX_CHECK_INTERVAL
     }
-    path = os.path.join(os.getenv('APPDATA'), "LazyShutdown", "lazy_shutdown_config.json")
     try:
-        with open(path, encoding='utf-8') as f:
+        with open(config_path(), encoding='utf-8') as f:
             j = json.load(f)
             cfg.update({
                 "terminate_taskmgr": j.get("guardian_terminate_taskmgr", True),
                 "autorestart":      j.get("guardian_autorestart", True),
                 "hide_window":      j.get("guardian_hide_window", True),
                 "show_window": j.get("guardian_show_window", False),
-                "show_console": j.get("guardian_show_console", False)  # 读取控制台配置
+                "show_console": j.get("guardian_show_console", False),  # 读取控制台配置
+                "log_max_bytes": j.get("guardian_log_max_bytes", 1024 * 1024),
+                "log_backup_count": j.get("guardian_log_backup_count", 3),
+                "log_compress": j.get("guardian_log_compress", False),
+                "rules": j.get("guardian_rules", []),
+                "max_interval": j.get("guardian_max_interval", MAX_CHECK_INTERVAL)
             })
     except:
         pass
     return cfg
 
-def setup_logging(hide_window, show_window, show_console):
+def config_fingerprint(path):
+    """配置文件的廉价指纹 (mtime_ns, size, inode)，文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        return None
+
+class ConfigWatcher:
+    """只在 stat 指纹变化时才需要重新解析配置；Windows 下可被主程序的变更通知提前唤醒"""
+    def __init__(self, path):
+        self.path = path
+        self.fingerprint = config_fingerprint(path)
+        self.event = None
+        if sys.platform == "win32":
+            try:
+                self.event = CreateEventW(None, False, False, CONFIG_CHANGED_EVENT)
+            except Exception as e:
+                logging.warning("无法创建配置变更通知事件: %s", str(e))
+
+    def changed(self):
+        fp = config_fingerprint(self.path)
+        if fp == self.fingerprint:
+            return False
+        self.fingerprint = fp
+        return True
+
+    def wait(self, timeout):
+        """等待 timeout 秒，收到变更通知时提前返回 True"""
+        if self.event:
+            return WaitForSingleObject(self.event, int(timeout * 1000)) == WAIT_OBJECT_0
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        if self.event:
+            CloseHandle(self.event)
+            self.event = None
+
+def _gzip_rotator(source, dest):
+    """轮转时把旧日志压缩为 .gz"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def _build_log_handlers(cfg):
     log_dir = os.path.join(os.getenv('APPDATA'), "LazyShutdown", "Logs")
     os.makedirs(log_dir, exist_ok=True)
-    fh = logging.FileHandler(os.path.join(log_dir, "Guardian.log"), encoding='utf-8')
-    fh.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
-    root = logging.getLogger()
-    root.setLevel(logging.INFO)
-    root.addHandler(fh)
+    fh = RotatingFileHandler(
+        os.path.join(log_dir, "Guardian.log"),
+        maxBytes=cfg["log_max_bytes"],
+        backupCount=cfg["log_backup_count"],
+        encoding='utf-8'
+    )
+    if cfg["log_compress"]:
+        fh.namer = lambda name: name + ".gz"
+        fh.rotator = _gzip_rotator
+    fh.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [fh]
     
     # 如果配置要求显示窗口或控制台，添加控制台日志处理器
-    if show_window or show_console:
+    if cfg["show_window"] or cfg["show_console"]:
         ch = logging.StreamHandler()
-        ch.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
-        root.addHandler(ch)
+        ch.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(ch)
+    return handlers
+
+def setup_logging(cfg):
+    """配置日志：记录经队列交给后台线程写入，重复调用只在配置变化时替换处理器"""
+    global _log_listener, _log_signature
+    
+    root = logging.getLogger()
+    if not any(isinstance(h, QueueHandler) and h.queue is _log_queue for h in root.handlers):
+        root.setLevel(logging.INFO)
+        root.addHandler(QueueHandler(_log_queue))
+    
+    signature = (bool(cfg["show_window"] or cfg["show_console"]), cfg["log_max_bytes"],
+                 cfg["log_backup_count"], cfg["log_compress"])
+    if signature == _log_signature:
+        return
+    
+    handlers = _build_log_handlers(cfg)
+    if _log_listener is None:
+        _log_listener = QueueListener(_log_queue, *handlers, respect_handler_level=True)
+        _log_listener.start()
+    else:
+        # 先停止后台线程（会写完队列中已有的记录），替换处理器后再启动，期间的记录留在队列中
+        old_handlers = _log_listener.handlers
+        _log_listener.stop()
+        _log_listener.handlers = tuple(handlers)
+        _log_listener.start()
+        for h in old_handlers:
+            h.close()
+    _log_signature = signature
+
+def stop_logging():
+    """写完剩余日志并关闭处理器"""
+    global _log_listener, _log_signature
+    if _log_listener is not None:
+        _log_listener.stop()
+        for h in _log_listener.handlers:
+            h.close()
+        _log_listener = None
+        _log_signature = None
 
 class GuardianWindow:
     def __init__(self, title):
@@ -117,6 +265,14 @@ class GuardianWindow:
         
         scrollbar.config(command=self.text_area.yview)
         
+        # 标签颜色只需配置一次
+        for tag, color in LOG_VIEW_COLORS.items():
+            self.text_area.tag_config(tag, foreground=color)
+        
+        # 待显示的日志（环形缓冲，日志线程写入，界面线程定时批量取出）
+        self.pending = deque(maxlen=LOG_VIEW_MAX_LINES)
+        self.pending_status = None
+        
         # 状态栏
         self.status_var = tk.StringVar()
         self.status_var.set("守护进程正在运行...")
@@ -135,39 +291,81 @@ class GuardianWindow:
                 self.root.iconbitmap(icon_path)
         except:
             pass
+        
+        self.root.after(LOG_VIEW_FLUSH_MS, self.flush)
 
     def on_close(self):
         # 最小化而不是关闭
         self.root.iconify()
 
     def add_log(self, record):
-        self.text_area.config(state=tk.NORMAL)
-        
-        # 根据日志级别设置颜色
+        """可在任意线程调用，只入队不操作界面"""
         if record.levelno >= logging.ERROR:
             tag = "error"
-            color = "red"
         elif record.levelno >= logging.WARNING:
             tag = "warning"
-            color = "orange"
         else:
             tag = "info"
-            color = "black"
-        
-        # 添加带颜色的文本
-        self.text_area.insert(tk.END, self.format(record) + "\n", tag)
-        self.text_area.see(tk.END)
-        self.text_area.config(state=tk.DISABLED)
-        
-        # 配置标签颜色
-        self.text_area.tag_config(tag, foreground=color)
+        self.pending.append((self.log_handler.format(record) + "\n", tag))
+
+    def flush(self):
+        """在界面线程中批量写入日志并裁剪到固定行数"""
+        try:
+            chunks = []
+            for _ in range(min(LOG_VIEW_BATCH, len(self.pending))):
+                chunks.extend(self.pending.popleft())
+            
+            if chunks:
+                at_bottom = self.text_area.yview()[1] >= 0.999
+                self.text_area.config(state=tk.NORMAL)
+                self.text_area.insert(tk.END, *chunks)
+                
+                lines = int(self.text_area.index("end-1c").split(".")[0]) - 1
+                if lines > LOG_VIEW_MAX_LINES:
+                    self.text_area.delete("1.0", f"{lines - LOG_VIEW_MAX_LINES + 1}.0")
+                
+                self.text_area.config(state=tk.DISABLED)
+                if at_bottom:
+                    self.text_area.see(tk.END)
+            
+            if self.pending_status is not None:
+                self.status_var.set(self.pending_status)
+                self.pending_status = None
+        finally:
+            self.root.after(LOG_VIEW_FLUSH_MS, self.flush)
 
     def update_status(self, message):
-        self.status_var.set(message)
+        # 同样由界面线程在下一次刷新时应用
+        self.pending_status = message
 
     def run(self):
         self.root.mainloop()
 
+    @staticmethod
+    def start(title):
+        """在独立线程中创建并运行窗口，返回窗口对象，创建失败时返回 None
+        
+        Tk 根窗口、after 回调和 mainloop 必须在同一个线程：在主线程创建、另一线程运行 mainloop 时，
+        线程化的 Tcl（Windows 默认）会报 "Calling Tcl from different apartment"，窗口不再刷新
+        """
+        created = queue.Queue()
+
+        def run():
+            try:
+                window = GuardianWindow(title)
+            except Exception as e:
+                created.put(e)
+                return
+            created.put(window)
+            window.run()
+
+        Thread(target=run, daemon=True, name="GuardianWindow").start()
+        window = created.get()
+        if isinstance(window, Exception):
+            logging.error("创建守护进程窗口失败: %s", window)
+            return None
+        return window
+
 class CustomLogHandler(logging.Handler):
     def __init__(self, window):
         super().__init__()
@@ -193,17 +391,137 @@ def run_as_admin():
         ShellExecuteW(None, "runas", exe, args, None, SW_SHOW)
         sys.exit(0)
 
-def find_main():
-    for p in psutil.process_iter(['pid','name','exe']):
+class AdaptiveInterval:
+    """根据观察到的事件调整检查间隔：空闲时逐渐放大，有事件时立即回到最短间隔"""
+    def __init__(self, minimum=CHECK_INTERVAL, maximum=MAX_CHECK_INTERVAL, factor=INTERVAL_BACKOFF):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.factor = factor
+        self.current = minimum
+
+    def set_maximum(self, maximum):
+        self.maximum = max(self.minimum, maximum)
+        self.current = min(self.current, self.maximum)
+
+    def update(self, busy):
+        """busy 为本轮是否发生了终止/重启等事件，返回新的间隔"""
+        previous = self.current
+        if busy:
+            self.current = self.minimum
+        else:
+            self.current = min(self.maximum, self.current * self.factor)
+        if self.current != previous:
+            logging.debug("检查间隔调整为 %.1f 秒", self.current)
+        return self.current
+
+class GuardianMetrics:
+    """守护进程自身的计数器和仪表，定期写入 Guardian.log 旁的 JSON 文件"""
+    def __init__(self, path):
+        self.path = path
+        self.started = time.time()
+        self.process = psutil.Process()
+        self.counters = {"ticks": 0, "main_restarts": 0, "kills": 0, "taskmgr_kills": 0,
+                         "keep_alive_starts": 0, "config_reloads": 0}
+        self.gauges = {"processes_seen": 0, "check_interval": CHECK_INTERVAL,
+                       "rss_bytes": 0, "cpu_seconds": 0.0}
+        self.scan_buckets = [0] * (len(SCAN_BUCKETS_MS) + 1)
+        self.scan_total_ms = 0.0
+        self.scan_max_ms = 0.0
+        self.last_dump = 0.0
+
+    def inc(self, name, value=1):
+        self.counters[name] += value
+
+    def observe_scan(self, ms, processes):
+        self.counters["ticks"] += 1
+        self.gauges["processes_seen"] = processes
+        self.scan_total_ms += ms
+        self.scan_max_ms = max(self.scan_max_ms, ms)
+        for i, bound in enumerate(SCAN_BUCKETS_MS):
+            if ms <= bound:
+                self.scan_buckets[i] += 1
+                break
+        else:
+            self.scan_buckets[-1] += 1
+
+    def _sample_process(self):
+        try:
+            self.gauges["rss_bytes"] = self.process.memory_info().rss
+            cpu = self.process.cpu_times()
+            self.gauges["cpu_seconds"] = round(cpu.user + cpu.system, 3)
+        except Exception as e:
+            logging.debug("读取自身资源占用失败: %s", str(e))
+
+    def snapshot(self, rules=None):
+        ticks = self.counters["ticks"]
+        labels = ["<=%d" % b for b in SCAN_BUCKETS_MS] + [">%d" % SCAN_BUCKETS_MS[-1]]
+        return {
+            "pid": os.getpid(),
+            "updated": datetime.now().isoformat(timespec="seconds"),
+            "uptime_seconds": round(time.time() - self.started),
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "scan_ms": {
+                "avg": round(self.scan_total_ms / ticks, 3) if ticks else 0.0,
+                "max": round(self.scan_max_ms, 3),
+                "histogram": dict(zip(labels, self.scan_buckets))
+            },
+            "rules": rules or []
+        }
+
+    def status_text(self):
+        ticks = self.counters["ticks"]
+        avg = self.scan_total_ms / ticks if ticks else 0.0
+        return ("检查间隔 %.0f 秒 | 扫描 %.1f ms | 重启 %d | 终止 %d | 内存 %.1f MB"
+                % (self.gauges["check_interval"], avg, self.counters["main_restarts"],
+                   self.counters["kills"], self.gauges["rss_bytes"] / 1048576))
+
+    def maybe_dump(self, rules=None, force=False):
+        now = time.time()
+        if not force and now - self.last_dump < METRICS_DUMP_INTERVAL:
+            return
+        self.last_dump = now
+        self._sample_process()
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(rules), f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logging.debug("写入指标文件失败: %s", str(e))
+
+def take_snapshot(attrs=('pid', 'name', 'exe')):
+    """每轮检查只遍历一次进程表，供查找主程序和规则匹配共用"""
+    return list(psutil.process_iter(list(attrs)))
+
+def find_main(snapshot=None):
+    for p in (snapshot if snapshot is not None else psutil.process_iter(['pid','name','exe'])):
         name = p.info['name'] or ''
         exe  = os.path.basename(p.info.get('exe') or '')
         if name.lower() == MAIN_EXE.lower() or exe.lower() == MAIN_EXE.lower():
             return p
     return None
 
+def app_dir():
+    """安装目录（打包后为 exe 所在目录）"""
+    return getattr(sys, 'frozen', False) and os.path.dirname(sys.executable) or os.path.dirname(os.path.abspath(__file__))
+
+def keep_alive_command(command):
+    """校验 keep_alive 的 command，返回 [程序, 参数...]
+    
+    守护进程以管理员权限运行，而配置文件普通用户可写，所以只允许启动安装目录下的程序
+    """
+    args = list(command) if isinstance(command, list) else [command]
+    if not args or not all(isinstance(a, str) and a for a in args):
+        raise ValueError("command 须为程序路径或 [程序, 参数...] 列表")
+    base = os.path.realpath(app_dir())
+    exe = os.path.realpath(os.path.join(base, args[0]))
+    if os.path.commonpath([base, exe]) != base or exe == base:
+        raise ValueError("command 只能是安装目录 %s 下的程序: %s" % (base, args[0]))
+    return [exe] + args[1:]
+
 def start_main():
-    base = getattr(sys, 'frozen', False) and os.path.dirname(sys.executable) or os.path.dirname(__file__)
-    path = os.path.join(base, MAIN_EXE)
+    path = os.path.join(app_dir(), MAIN_EXE)
     if not os.path.exists(path):
         logging.error("找不到主程序: %s", path)
         return None
@@ -212,15 +530,215 @@ def start_main():
     si.wShowWindow = SW_HIDE
     return subprocess.Popen([path, "--minimized"], startupinfo=si, creationflags=subprocess.CREATE_NO_WINDOW)
 
-def kill_taskmgr():
-    for p in psutil.process_iter(['name']):
-        nm = (p.info['name'] or '').lower()
-        if any(tm == nm for tm in TASK_MANAGERS):
+def _compile_patterns(value):
+    """把规则中的模式拆成 精确值集合 + 编译后的正则列表（均不区分大小写）
+    
+    以 re: 开头的按正则处理，含 * ? [ 的按通配符处理，其余为精确匹配
+    """
+    if value is None:
+        return None
+    values = value if isinstance(value, list) else [value]
+    exact, regexes = set(), []
+    for v in values:
+        v = str(v)
+        if v.startswith("re:"):
+            regexes.append(re.compile(v[3:], re.IGNORECASE))
+        elif any(c in v for c in "*?["):
+            regexes.append(re.compile(fnmatch.translate(v), re.IGNORECASE))
+        else:
+            exact.add(v.lower())
+    return exact, regexes
+
+def _match_patterns(patterns, value):
+    if patterns is None:
+        return True
+    if not value:
+        return False
+    exact, regexes = patterns
+    if value.lower() in exact:
+        return True
+    return any(r.match(value) for r in regexes)
+
+class ProcessRule:
+    """一条进程策略：kill 终止匹配的进程，keep_alive 在没有匹配进程时启动 command"""
+    def __init__(self, spec):
+        self.name = spec.get("name") or "未命名规则"
+        self.action = spec.get("action", "kill")
+        if self.action not in ("kill", "keep_alive"):
+            raise ValueError("未知动作: %s" % self.action)
+        
+        match = spec.get("match") or {}
+        self.name_patterns = _compile_patterns(match.get("name"))
+        self.exe_patterns = _compile_patterns(match.get("exe"))
+        self.parent_patterns = _compile_patterns(match.get("parent"))
+        self.user_patterns = _compile_patterns(match.get("user"))
+        if not any((self.name_patterns, self.exe_patterns, self.parent_patterns, self.user_patterns)):
+            raise ValueError("规则 %s 没有任何匹配条件" % self.name)
+        
+        self.command = None
+        if self.action == "keep_alive":
+            if not spec.get("command"):
+                raise ValueError("keep_alive 规则 %s 缺少 command" % self.name)
+            self.command = keep_alive_command(spec["command"])
+        
+        limit = spec.get("rate_limit") or {}
+        self.limit_max = limit.get("max")
+        self.limit_per = limit.get("per", 60)
+        if self.action == "keep_alive" and not self.limit_max:
+            self.limit_max = KEEP_ALIVE_LIMIT_MAX
+            self.limit_per = limit.get("per", KEEP_ALIVE_LIMIT_PER)
+        self.recent = deque()
+        
+        # 统计
+        self.builtin = False
+        self.matches = 0
+        self.actions = 0
+        self.throttled = 0
+        self.cost = 0.0
+
+    @property
+    def exact_names(self):
+        """只有精确进程名、没有通配符时才能走哈希查找"""
+        if self.name_patterns and not self.name_patterns[1]:
+            return self.name_patterns[0]
+        return None
+
+    def matches_process(self, info, parent_name):
+        return (_match_patterns(self.name_patterns, info.get('name'))
+                and _match_patterns(self.exe_patterns, info.get('exe'))
+                and _match_patterns(self.parent_patterns, parent_name)
+                and _match_patterns(self.user_patterns, info.get('username')))
+
+    def allow_action(self, now):
+        if not self.limit_max:
+            return True
+        while self.recent and now - self.recent[0] > self.limit_per:
+            self.recent.popleft()
+        if len(self.recent) >= self.limit_max:
+            self.throttled += 1
+            return False
+        self.recent.append(now)
+        return True
+
+    def stats(self):
+        return {"name": self.name, "action": self.action, "matches": self.matches,
+                "actions": self.actions, "throttled": self.throttled,
+                "cost_ms": round(self.cost * 1000, 3)}
+
+class RuleEngine:
+    """加载配置时把规则编译为：精确进程名哈希表 + 需要逐个匹配的规则列表"""
+    def __init__(self, rules):
+        self.rules = rules
+        self.by_name = {}
+        self.scan_rules = []
+        for rule in rules:
+            names = rule.exact_names
+            if names:
+                for n in names:
+                    self.by_name.setdefault(n, []).append(rule)
+            else:
+                self.scan_rules.append(rule)
+        
+        attrs = {'pid', 'name', 'exe'}
+        if any(r.parent_patterns for r in rules):
+            attrs.add('ppid')
+        if any(r.user_patterns for r in rules):
+            attrs.add('username')
+        self.attrs = tuple(sorted(attrs))
+
+    @staticmethod
+    def from_config(cfg):
+        rules = []
+        if cfg["terminate_taskmgr"]:
+            rule = ProcessRule({"name": "任务管理器", "action": "kill", "match": {"name": TASK_MANAGERS}})
+            rule.builtin = True
+            rules.append(rule)
+        for spec in cfg.get("rules") or []:
             try:
-                p.kill()
-                logging.info("终止任务管理器: %s", nm)
+                rules.append(ProcessRule(spec))
             except Exception as e:
-                logging.warning("无法终止任务管理器 %s: %s", nm, str(e))
+                logging.warning("忽略无效的进程规则 %s: %s", spec, str(e))
+        return RuleEngine(rules)
+
+    def run(self, snapshot):
+        """对本轮进程快照执行所有规则，返回本轮各类动作的次数"""
+        counts = {"kill": 0, "keep_alive": 0, "taskmgr": 0}
+        if not self.rules:
+            return counts
+        now = time.time()
+        parents = None
+        if 'ppid' in self.attrs:
+            parents = {p.info['pid']: p.info.get('name') for p in snapshot}
+        
+        def parent_of(info):
+            return parents.get(info.get('ppid')) if parents is not None else None
+        
+        hits = {}
+        # 先走哈希查找
+        if self.by_name:
+            for p in snapshot:
+                candidates = self.by_name.get((p.info.get('name') or '').lower())
+                if not candidates:
+                    continue
+                for rule in candidates:
+                    start = time.perf_counter()
+                    ok = rule.matches_process(p.info, parent_of(p.info))
+                    rule.cost += time.perf_counter() - start
+                    if ok:
+                        hits.setdefault(rule, []).append(p)
+        # 再逐个匹配通配符/正则规则
+        for rule in self.scan_rules:
+            start = time.perf_counter()
+            matched = [p for p in snapshot if rule.matches_process(p.info, parent_of(p.info))]
+            rule.cost += time.perf_counter() - start
+            if matched:
+                hits[rule] = matched
+        
+        for rule in self.rules:
+            procs = hits.get(rule, [])
+            rule.matches += len(procs)
+            if rule.action == "kill":
+                done = sum(self._kill(rule, p, now) for p in procs)
+                counts["kill"] += done
+                if rule.builtin:
+                    counts["taskmgr"] += done
+            elif not procs:
+                counts["keep_alive"] += self._keep_alive(rule, now)
+        return counts
+
+    def _kill(self, rule, proc, now):
+        nm = proc.info.get('name') or ''
+        if not rule.allow_action(now):
+            logging.debug("规则 %s 已达到频率限制，跳过终止 %s", rule.name, nm)
+            return 0
+        try:
+            proc.kill()
+            rule.actions += 1
+            logging.info("规则 %s 终止进程: %s (PID=%d)", rule.name, nm, proc.info['pid'])
+            return 1
+        except Exception as e:
+            logging.warning("规则 %s 无法终止进程 %s: %s", rule.name, nm, str(e))
+            return 0
+
+    def _keep_alive(self, rule, now):
+        if not rule.allow_action(now):
+            return 0
+        cmd = rule.command
+        try:
+            kwargs = {}
+            if sys.platform == "win32":
+                kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+            subprocess.Popen(cmd, **kwargs)
+            rule.actions += 1
+            logging.info("规则 %s 启动进程: %s", rule.name, cmd)
+            return 1
+        except Exception as e:
+            logging.warning("规则 %s 启动进程失败 %s: %s", rule.name, cmd, str(e))
+            return 0
+
+    def log_stats(self):
+        for rule in self.rules:
+            logging.info("规则统计: %s", rule.stats())
 
 def create_console():
     """创建控制台窗口并重定向输出"""
@@ -266,7 +784,7 @@ def main():
     
     # 加载配置
     cfg = load_config()
-    setup_logging(cfg["hide_window"], cfg["show_window"], cfg["show_console"])
+    setup_logging(cfg)
     
     # 解析命令行参数
     parser = argparse.ArgumentParser(description=f"{APP_NAME} 守护进程")
@@ -296,40 +814,76 @@ def main():
     # 如果配置要求显示窗口，创建并运行窗口
     window = None
     if cfg["show_window"]:
-        window = GuardianWindow(f"{APP_NAME} - 守护进程")
-        # 在新线程中运行窗口
-        window_thread = Thread(target=window.run, daemon=True)
-        window_thread.start()
-        logging.info("守护进程窗口已启动")
+        window = GuardianWindow.start(f"{APP_NAME} - 守护进程")
+        if window:
+            logging.info("守护进程窗口已启动")
     
-    last_config_check = time.time()
+    watcher = ConfigWatcher(config_path())
+    engine = RuleEngine.from_config(cfg)
+    interval = AdaptiveInterval(maximum=cfg["max_interval"])
+    supervisor = RestartSupervisor("主程序", window=RESTART_WINDOW, max_restarts=RESTART_MAX_IN_WINDOW,
+                                   base=BACKOFF_BASE, max_delay=BACKOFF_MAX, cooldown=BREAKER_COOLDOWN,
+                                   stable_after=STABLE_AFTER)
+    metrics = GuardianMetrics(os.path.join(os.getenv('APPDATA'), "LazyShutdown", "Logs", "Guardian.metrics.json"))
     
     try:
         while True:
             try:
-                # 每分钟检查一次配置是否更新
-                if time.time() - last_config_check > 60:
+                # 配置文件指纹变化时才重新解析
+                if watcher.changed():
                     new_cfg = load_config()
                     if new_cfg != cfg:
                         logging.info("检测到配置更新，重新加载配置")
+                        metrics.inc("config_reloads")
                         cfg = new_cfg
-                        setup_logging(cfg["hide_window"], cfg["show_window"], cfg["show_console"])
-                    last_config_check = time.time()
+                        setup_logging(cfg)
+                        engine.log_stats()
+                        engine = RuleEngine.from_config(cfg)
+                        interval.set_maximum(cfg["max_interval"])
+                
+                scan_start = time.perf_counter()
+                snapshot = take_snapshot(engine.attrs)
+                scan_ms = (time.perf_counter() - scan_start) * 1000
+                busy = False
                 
                 # 检查主程序是否运行
-                main_process = find_main()
+                main_process = find_main(snapshot)
                 if not main_process and cfg["autorestart"]:
-                    logging.warning("主程序未运行，正在启动...")
-                    start_main()
+                    if supervisor.allow():
+                        logging.warning("主程序未运行，正在启动...")
+                        start_main()
+                        supervisor.record_restart()
+                        metrics.inc("main_restarts")
+                        busy = True
+                    else:
+                        logging.debug("主程序重启退避中，%.0f 秒后重试", supervisor.remaining())
                 elif main_process:
+                    supervisor.record_running()
                     logging.debug("主程序运行中: PID=%d", main_process.pid)
 
-                # 检查并终止任务管理器
-                if cfg["terminate_taskmgr"]:
-                    kill_taskmgr()
+                # 执行进程规则（包括终止任务管理器）
+                rules_start = time.perf_counter()
+                counts = engine.run(snapshot)
+                scan_ms += (time.perf_counter() - rules_start) * 1000
+                if counts["kill"] or counts["keep_alive"]:
+                    busy = True
+                metrics.inc("kills", counts["kill"])
+                metrics.inc("taskmgr_kills", counts["taskmgr"])
+                metrics.inc("keep_alive_starts", counts["keep_alive"])
+                metrics.observe_scan(scan_ms, len(snapshot))
+                
+                # 空闲时逐渐放大检查间隔，但不错过主程序的下一次重启时间
+                wait = interval.update(busy)
+                if not main_process and cfg["autorestart"]:
+                    wait = min(wait, max(CHECK_INTERVAL, supervisor.remaining()))
+                metrics.gauges["check_interval"] = wait
+                metrics.maybe_dump([r.stats() for r in engine.rules])
+                if window:
+                    window.update_status(metrics.status_text())
                 
-                # 等待下一次检查
-                time.sleep(CHECK_INTERVAL)
+                # 等待下一次检查，主程序保存配置时会提前唤醒
+                if watcher.wait(wait):
+                    logging.debug("收到配置变更通知")
             except Exception as e:
                 logging.exception("主循环错误: %s, 10秒后重试", str(e))
                 time.sleep(10)
@@ -341,8 +895,13 @@ def main():
         print(f"\n[错误] 严重错误: {str(e)}")
     finally:
         # 清理资源
+        logging.info("主程序重启统计: %s", supervisor.summary())
+        engine.log_stats()
+        metrics.maybe_dump([r.stats() for r in engine.rules], force=True)
+        watcher.close()
         close_console()
         logging.info("守护进程已退出")
+        stop_logging()
         print("守护进程已安全退出")
 
 if __name__ == "__main__":
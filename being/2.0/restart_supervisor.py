@@ -0,0 +1,106 @@
+"""进程重启监督，主程序（监督守护进程）和守护进程（监督主程序）共用"""
+import logging
+import random
+import time
+from collections import deque
+
+
+class RestartSupervisor:
+    """重启监督：滑动窗口计数、带抖动的指数退避以及熔断"""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, window=600, max_restarts=5, base=5, max_delay=300,
+                 cooldown=1800, stable_after=60):
+        """
+        window: 统计重启次数的滑动窗口（秒），窗口内达到 max_restarts 次则熔断
+        base / max_delay: 首次退避时间和单次退避上限（秒）
+        cooldown: 熔断后冷却时间（秒）
+        stable_after: 被监督的进程持续运行多久视为启动成功（秒）
+        """
+        self.name = name
+        self.window = window
+        self.max_restarts = max_restarts
+        self.base = base
+        self.max_delay = max_delay
+        self.cooldown = cooldown
+        self.stable_after = stable_after
+        self.state = self.CLOSED
+        self.restarts = deque()      # 窗口内的重启时间戳
+        self.failures = 0            # 连续失败次数
+        self.next_allowed = 0.0
+        self.opened_at = 0.0
+        self.last_start = None
+        self.probing = False
+        self.total_restarts = 0
+        self.total_trips = 0
+
+    def _prune(self, now):
+        while self.restarts and now - self.restarts[0] > self.window:
+            self.restarts.popleft()
+
+    def _trip(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.probing = False
+        self.total_trips += 1
+        logging.error("%s 频繁退出，暂停重启 %d 秒: %s", self.name, self.cooldown, self.summary(now))
+
+    def allow(self, now=None):
+        """当前是否允许重启"""
+        now = time.time() if now is None else now
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self.probing = False
+            logging.info("%s 熔断冷却结束，尝试重启一次", self.name)
+        elif self.state == self.HALF_OPEN and self.probing:
+            # 试探性重启后再次退出，重新熔断
+            self._trip(now)
+            return False
+        return now >= self.next_allowed
+
+    def remaining(self, now=None):
+        """距离下一次允许重启还有多少秒"""
+        now = time.time() if now is None else now
+        if self.state == self.OPEN:
+            return max(0.0, self.opened_at + self.cooldown - now)
+        return max(0.0, self.next_allowed - now)
+
+    def record_restart(self, now=None):
+        """记录一次重启并计算下一次退避时间"""
+        now = time.time() if now is None else now
+        self._prune(now)
+        self.restarts.append(now)
+        self.total_restarts += 1
+        self.failures += 1
+        self.last_start = now
+
+        if self.state == self.HALF_OPEN:
+            self.probing = True
+        elif len(self.restarts) >= self.max_restarts:
+            self._trip(now)
+            return
+
+        delay = min(self.max_delay, self.base * (2 ** (self.failures - 1)))
+        self.next_allowed = now + random.uniform(delay / 2, delay)
+
+    def record_running(self, now=None):
+        """被监督的进程处于运行状态，持续足够久则清零失败计数"""
+        now = time.time() if now is None else now
+        if not self.failures or self.last_start is None:
+            return
+        if now - self.last_start < self.stable_after:
+            return
+        if self.state == self.HALF_OPEN:
+            logging.info("%s 已恢复正常，解除熔断", self.name)
+        self.state = self.CLOSED
+        self.probing = False
+        self.failures = 0
+        self.next_allowed = 0.0
+
+    def summary(self, now=None):
+        self._prune(time.time() if now is None else now)
+        return ("状态=%s, 窗口内重启=%d/%d, 连续失败=%d, 累计重启=%d, 累计熔断=%d"
+                % (self.state, len(self.restarts), self.max_restarts, self.failures,
+                   self.total_restarts, self.total_trips))
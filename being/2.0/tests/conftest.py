@@ -0,0 +1,39 @@
+import importlib.util
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# 主程序在导入时创建配置目录，测试使用临时目录，不碰真实配置
+_home = tempfile.mkdtemp(prefix="lazy-shutdown-tests-")
+os.environ["HOME"] = _home
+os.environ["APPDATA"] = _home
+
+
+def load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, APP_DIR / filename)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+sys.path.insert(0, str(APP_DIR))
+APP = load_module("lazy_shutdown_app", "2.0.py")
+
+
+@pytest.fixture(scope="session")
+def app():
+    """主程序模块（文件名 2.0.py 不能直接 import）"""
+    return APP
+
+
+@pytest.fixture(scope="session")
+def guardian():
+    """守护进程模块（依赖 psutil，未安装时跳过）"""
+    pytest.importorskip("psutil")
+    return sys.modules.get("guardian") or load_module("guardian", "guardian.py")
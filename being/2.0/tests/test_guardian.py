@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+
+def test_adaptive_interval_backs_off_and_resets(guardian):
+    interval = guardian.AdaptiveInterval(minimum=5, maximum=20, factor=2)
+    assert [interval.update(False) for _ in range(4)] == [10, 20, 20, 20]
+    assert interval.update(True) == 5
+    interval.update(False)
+    interval.set_maximum(8)
+    assert interval.current == 8
+    interval.set_maximum(1)  # 上限不低于最短间隔
+    assert interval.maximum == 5
+
+
+def test_rule_rate_limit_uses_sliding_window(guardian):
+    rule = guardian.ProcessRule({"name": "r", "match": {"name": "a.exe"}, "rate_limit": {"max": 2, "per": 10}})
+    assert rule.allow_action(0) and rule.allow_action(1)
+    assert not rule.allow_action(5)
+    assert rule.throttled == 1
+    assert rule.allow_action(10.5)
+
+
+@pytest.fixture
+def install_dir(guardian, tmp_path, monkeypatch):
+    (tmp_path / "tool.exe").write_bytes(b"")
+    monkeypatch.setattr(guardian, "app_dir", lambda: str(tmp_path))
+    return tmp_path
+
+
+def test_keep_alive_command_only_runs_programs_in_install_dir(guardian, install_dir):
+    exe = os.path.realpath(install_dir / "tool.exe")
+    assert guardian.keep_alive_command("tool.exe") == [exe]
+    assert guardian.keep_alive_command(["tool.exe", "--quiet"]) == [exe, "--quiet"]
+    for bad in ("../evil.exe", os.path.abspath(os.sep + "evil.exe"), ".", [], ["tool.exe", 1]):
+        with pytest.raises(ValueError):
+            guardian.keep_alive_command(bad)
+
+
+def test_keep_alive_rule_gets_default_rate_limit(guardian, install_dir):
+    rule = guardian.ProcessRule({"action": "keep_alive", "match": {"name": "tool.exe"}, "command": "tool.exe"})
+    assert (rule.limit_max, rule.limit_per) == (guardian.KEEP_ALIVE_LIMIT_MAX, guardian.KEEP_ALIVE_LIMIT_PER)
+
+
+def test_rule_engine_skips_invalid_rules_and_indexes_exact_names(guardian, install_dir):
+    cfg = {"terminate_taskmgr": True, "rules": [
+        {"name": "坏规则", "action": "keep_alive", "match": {"name": "x"}, "command": "../x.exe"},
+        {"name": "通配", "match": {"name": "game*.exe"}},
+    ]}
+    engine = guardian.RuleEngine.from_config(cfg)
+    assert [r.name for r in engine.rules] == ["任务管理器", "通配"]
+    assert "taskmgr.exe" in engine.by_name
+    assert [r.name for r in engine.scan_rules] == ["通配"]
+
+
+def test_window_is_created_on_the_thread_that_runs_it(guardian, monkeypatch):
+    import threading
+    threads = {}
+
+    def init(self, title):
+        threads["created"] = threading.get_ident()
+
+    def run(self):
+        threads["run"] = threading.get_ident()
+
+    monkeypatch.setattr(guardian.GuardianWindow, "__init__", init)
+    monkeypatch.setattr(guardian.GuardianWindow, "run", run)
+    window = guardian.GuardianWindow.start("t")
+    for _ in range(200):
+        if "run" in threads:
+            break
+        threading.Event().wait(0.01)
+    assert window is not None
+    assert threads["created"] == threads["run"] != threading.get_ident()
@@ -0,0 +1,91 @@
+import threading
+import time
+import types
+
+CODES = {"ctrl": (29,), "alt": (56,), "s": (31,), "l": (38,)}
+PARSER = types.SimpleNamespace(parse_hotkey=lambda combo: (tuple(CODES[k] for k in combo.split("+")),))
+
+
+def key(event_type, code):
+    return types.SimpleNamespace(event_type=event_type, scan_code=code)
+
+
+def make_manager(app, calls):
+    manager = app.HotkeyManager()
+    manager.bindings = {"ctrl+alt+s": ("推迟", lambda: calls.append("snooze"))}
+    manager.table = manager.compile(PARSER)
+    return manager
+
+
+def wait_for(calls, count):
+    deadline = time.time() + 2
+    while len(calls) < count and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_combo_fires_once_while_held(app):
+    calls = []
+    manager = make_manager(app, calls)
+    assert manager.on_key(key("down", 29)) is True
+    assert manager.on_key(key("down", 56)) is True
+    # 按住 s：系统重复发送 down，每次都吞掉，但动作只触发一次
+    assert [manager.on_key(key("down", 31)) for _ in range(30)] == [False] * 30
+    assert manager.on_key(key("up", 31)) is False
+    wait_for(calls, 1)
+    time.sleep(0.05)
+    assert calls == ["snooze"]
+    # 松开后再按一次会再次触发
+    manager.on_key(key("down", 31))
+    manager.on_key(key("up", 31))
+    wait_for(calls, 2)
+    assert calls == ["snooze", "snooze"]
+
+
+def test_unbound_keys_pass_through_and_extra_modifiers_block(app):
+    calls = []
+    manager = make_manager(app, calls)
+    assert [manager.on_key(key("down", 38)) for _ in range(3)] == [True] * 3
+    manager.on_key(key("down", 29))
+    manager.on_key(key("down", 56))
+    assert manager.on_key(key("down", 31)) is True  # 还按着 l，不匹配
+    time.sleep(0.05)
+    assert calls == []
+
+
+def test_key_ups_lost_on_secure_desktop_are_dropped(app, monkeypatch):
+    calls = []
+    manager = make_manager(app, calls)
+    down = set()
+    # 钩子回调中系统按键状态还是按下之前的状态
+    monkeypatch.setattr(app, "key_released", lambda code: code not in down)
+
+    def press(code):
+        result = manager.on_key(key("down", code))
+        down.add(code)
+        return result
+
+    press(29), press(56)
+    assert press(31) is False
+    wait_for(calls, 1)
+    # 在安全桌面上松开，钩子收不到抬起事件
+    down.clear()
+    assert press(31) is True  # 单独按 s 不再被吞掉
+    down.clear()
+    press(29), press(56)
+    assert press(31) is False
+    wait_for(calls, 2)
+    assert calls == ["snooze", "snooze"]
+
+
+def test_stale_keys_expire_without_key_state(app, monkeypatch):
+    calls = []
+    manager = make_manager(app, calls)
+    monkeypatch.setattr(app, "key_released", lambda code: None)
+    for code in (29, 56, 31):
+        manager.on_key(key("down", code))
+    wait_for(calls, 1)
+    past = time.monotonic() - app.HOTKEY_STALE_AFTER - 1
+    manager.pressed = dict.fromkeys(manager.pressed, past)
+    assert manager.on_key(key("down", 38)) is True
+    assert manager.pressed.keys() == {38}
+    assert manager.swallowed == set()
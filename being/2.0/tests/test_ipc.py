@@ -0,0 +1,140 @@
+import os
+import platform
+import threading
+
+import pytest
+
+
+def test_private_secret_is_created_once_and_private(app, tmp_path):
+    path = tmp_path / "ipc.key"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(app.private_secret(path, lambda: os.urandom(32))))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(results)) == 1 and len(results[0]) == 32
+    if platform.system() != "Windows":
+        assert path.stat().st_mode & 0o777 == 0o600
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="POSIX 权限位")
+def test_private_secret_tightens_existing_file(app, tmp_path):
+    path = tmp_path / "api.token"
+    path.write_bytes(b"abc")
+    os.chmod(path, 0o644)
+    assert app.private_secret(path, lambda: b"new") == b"abc"
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+@pytest.fixture
+def service(app):
+    if platform.system() == "Windows":
+        pytest.skip("命名管道地址是全局的，可能与正在运行的程序冲突")
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore(mode="service")
+    core.offload = None
+    core.start()
+    yield core
+    core.stop()
+
+
+def test_remote_save_does_not_undo_service_side_changes(app, service):
+    remote = app.RemoteCore()
+    service.batch([{"op": "add", "schedule": {"name": "夜间", "time": "23:00", "days": [1, 2, 3]}}])
+    remote.config["hotkey"] = "ctrl+alt+k"
+    assert remote.save()
+    assert [s["name"] for s in service.config["schedules"]] == ["夜间"]
+    assert service.config["hotkey"] == "ctrl+alt+k"
+    assert remote.revision == service.revision
+
+
+def test_set_config_rejects_stale_revision(app, service):
+    stale = service.revision
+    service.batch([{"op": "add", "schedule": {"name": "a", "time": "22:00", "days": [1]}}])
+    reply = app.ipc_request({"cmd": "set_config", "config": {"schedules": []}, "revision": stale})
+    assert reply["conflict"] and len(service.config["schedules"]) == 1
+
+
+def test_second_core_does_not_take_over_running_instance(app, service):
+    other = app.SchedulerCore(mode="headless")
+    with pytest.raises(app.InstanceRunningError):
+        other.start()
+    assert other.engine.schedules == {}
+    assert app.ipc_request({"cmd": "ping"})["pid"] == os.getpid()
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="Unix 套接字")
+def test_stale_socket_is_removed(app):
+    import socket
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    sock = socket.socket(socket.AF_UNIX)
+    sock.bind(app.IPC_ADDRESS)
+    sock.close()  # 文件还在，但已无人监听
+    server = app.IpcServer(lambda request: {"ok": True})
+    server.start()
+    try:
+        assert app.ipc_request({"cmd": "ping"}) == {"ok": True}
+    finally:
+        server.stop()
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="Unix 套接字")
+def test_cli_does_not_edit_offline_when_instance_is_unreachable(app, capsys):
+    from multiprocessing.connection import Listener
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    assert app.probe_instance() is None
+    # 有实例在监听，但无法通过认证（例如密钥文件已被替换）
+    listener = Listener(app.IPC_ADDRESS, family=app.IPC_FAMILY, authkey=b"other")
+
+    def accept():
+        try:
+            listener.accept()
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    try:
+        assert app.schedules_main("add", ["x", "-t", "22:00", "-d", "1"]) == 1
+        assert "无法连接正在运行的实例" in capsys.readouterr().err
+        assert not app.CONFIG_FILE.exists()
+    finally:
+        thread.join(2)
+        listener.close()
+
+
+def test_set_config_restarts_guardian_only_when_its_settings_change(app):
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore()
+    core.offload = None
+    calls = []
+    core.guardian = type("Guardian", (), {"setup_guardian": lambda self: calls.append(1)})()
+    config = dict(core.config, hotkey="ctrl+alt+k")
+    assert core.set_config(config)
+    assert calls == []
+    assert core.set_config(dict(config, guardian_enabled=True))
+    assert calls == [1]
+
+
+def test_service_shows_its_client_instead_of_launching_another(app, monkeypatch):
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore(mode="service")
+    launched = []
+    monkeypatch.setattr(app, "launch_gui_client", lambda: launched.append(1))
+    assert core.show_client() == "已打开界面"
+    assert core.show_client() == "界面正在启动"  # 客户端尚未登记，不再启动第二个
+    assert launched == [1]
+
+    me, other = os.getpid(), os.getppid()
+    assert core.attach_client(me)
+    # 第二个客户端启动时让已有的客户端显示，自己退出
+    assert not core.attach_client(other)
+    assert core.wait_client_show(me, 1) == {"show": True, "attached": True}
+    assert core.run_actions([("show", None)]) == ["已显示界面"]
+    assert core.wait_client_show(me, 1)["show"]
+    assert launched == [1]
+
+    core.detach_client(me)
+    assert core.wait_client_show(me, 1)["attached"] is False
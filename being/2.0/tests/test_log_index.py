@@ -0,0 +1,78 @@
+import json
+
+LINES = [
+    "2024-05-01 22:59:00,100 INFO 计划 '夜间' 即将执行: 关机 (等待 60 秒)\n",
+    "2024-05-01 23:00:00,200 INFO 计划 '夜间' 执行命令: shutdown /s /t 0\n",
+    "2024-05-01 23:00:01,300 ERROR 计划 '夜间' 执行关机命令失败: denied\n",
+    "Traceback (most recent call last):\n",
+    "2024-05-01 23:05:00,000 INFO 配置文件已保存\n",
+]
+
+
+def mark(index_path):
+    data = json.loads(index_path.read_text(encoding="utf-8"))
+    data["schedules"]["__marker__"] = []
+    index_path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def test_schedule_query_includes_execution_records(app, tmp_path):
+    log = tmp_path / "main.log"
+    log.write_text("".join(LINES), encoding="utf-8")
+    records = app.LogIndex(log).query(schedule="夜间")
+    assert len(records) == 3
+    assert records[2].endswith("Traceback (most recent call last):")
+
+
+def test_time_range_query(app, tmp_path):
+    log = tmp_path / "main.log"
+    log.write_text("".join(LINES), encoding="utf-8")
+    records = app.LogIndex(log).query(since="2024-05-01 23:00", until="2024-05-01 23:00")
+    assert [r[:19] for r in records] == ["2024-05-01 23:00:00", "2024-05-01 23:00:01"]
+
+
+def test_small_growing_log_is_indexed_incrementally(app, tmp_path):
+    log = tmp_path / "main.log"
+    index = app.LogIndex(log)
+    log.write_text(LINES[0], encoding="utf-8")  # 小于 256 字节
+    assert len(index.query()) == 1
+    mark(index.index_path)
+    with open(log, "a", encoding="utf-8") as f:
+        f.writelines(LINES[1:])
+    assert len(index.query()) == 4
+    assert "__marker__" in json.loads(index.index_path.read_text(encoding="utf-8"))["schedules"]
+
+
+def test_rotated_log_is_reindexed(app, tmp_path):
+    log = tmp_path / "main.log"
+    index = app.LogIndex(log)
+    log.write_text("".join(LINES), encoding="utf-8")
+    index.query()
+    mark(index.index_path)
+    log.write_text("".join(LINES).replace("2024-05-01", "2024-05-02"), encoding="utf-8")
+    assert index.query()[0].startswith("2024-05-02")
+    assert "__marker__" not in json.loads(index.index_path.read_text(encoding="utf-8"))["schedules"]
+
+
+def test_query_releases_mapping_before_filtering(app, tmp_path, monkeypatch):
+    import mmap
+
+    log = tmp_path / "main.log"
+    log.write_text("".join(LINES), encoding="utf-8")
+    mappings = []
+
+    class TrackedMmap(mmap.mmap):
+        def __new__(cls, *args, **kwargs):
+            mapping = super().__new__(cls, *args, **kwargs)
+            mappings.append(mapping)
+            return mapping
+
+    monkeypatch.setattr(mmap, "mmap", TrackedMmap)
+    record_at = app.LogIndex.record_at
+
+    def checked_record_at(mm, offset, limit):
+        assert all(m.closed for m in mappings)
+        return record_at(mm, offset, limit)
+
+    monkeypatch.setattr(app.LogIndex, "record_at", staticmethod(checked_record_at))
+    assert len(app.LogIndex(log).query(schedule="夜间")) == 3
+    assert mappings and all(m.closed for m in mappings)
@@ -0,0 +1,40 @@
+import types
+
+
+def test_histogram_samples_are_cumulative(app):
+    histogram = app.Histogram((1, 5))
+    for value in (0.5, 3, 3, 10):
+        histogram.observe(value)
+    assert histogram.samples("h") == [
+        'h_bucket{le="1"} 1',
+        'h_bucket{le="5"} 3',
+        'h_bucket{le="+Inf"} 4',
+        "h_sum 16.500000",
+        "h_count 4",
+    ]
+
+
+def fake_core(app, config):
+    return types.SimpleNamespace(config=config, lock=app.threading.RLock(), guardian=None,
+                                 engine=types.SimpleNamespace(quick=None, schedules={}))
+
+
+def test_render_metrics_survives_a_cleared_config(app):
+    text = app.render_metrics(fake_core(app, {}))
+    assert "lazy_shutdown_schedules 0" in text
+
+
+def test_render_metrics_counts_schedules(app):
+    config = {"schedules": [{"name": "a", "type": "关机", "time": "23:00", "days": [1, 2, 3, 4, 5, 6, 7]},
+                            {"name": "b", "type": "关机", "time": "23:00", "days": [1], "enabled": False}]}
+    text = app.render_metrics(fake_core(app, config))
+    assert "lazy_shutdown_schedules 2" in text
+    assert "lazy_shutdown_schedules_enabled 1" in text
+    assert "lazy_shutdown_next_fire_timestamp_seconds " in text
+
+
+def test_metrics_interval_falls_back_on_invalid_values(app):
+    assert app.metrics_interval({"metrics_interval": "abc"}) == 30
+    assert app.metrics_interval({"metrics_interval": None}) == 30
+    assert app.metrics_interval({"metrics_interval": 1}) == 5
+    assert app.metrics_interval({}) == 30
@@ -0,0 +1,59 @@
+from restart_supervisor import RestartSupervisor
+
+
+def make(**kwargs):
+    options = dict(window=600, max_restarts=3, base=10, max_delay=40, cooldown=100, stable_after=60)
+    options.update(kwargs)
+    return RestartSupervisor("测试", **options)
+
+
+def test_backoff_grows_and_is_capped():
+    sup = make(max_restarts=100)
+    now = 1000.0
+    for expected in (10, 20, 40, 40):
+        assert sup.allow(now)
+        sup.record_restart(now)
+        assert expected / 2 <= sup.next_allowed - now <= expected
+        assert not sup.allow(now)
+        now = sup.next_allowed
+
+
+def test_trips_after_max_restarts_and_probes_once_after_cooldown():
+    sup = make()
+    now = 1000.0
+    for _ in range(3):
+        sup.record_restart(now)
+        now += 1
+    assert sup.state == RestartSupervisor.OPEN and sup.total_trips == 1
+    assert not sup.allow(now)
+    assert 0 < sup.remaining(now) <= 100
+
+    now += 100
+    assert sup.allow(now) and sup.state == RestartSupervisor.HALF_OPEN
+    sup.record_restart(now)
+    # 试探性重启后又退出，重新熔断
+    now += 200
+    assert not sup.allow(now) and sup.state == RestartSupervisor.OPEN
+    assert sup.total_trips == 2
+
+
+def test_half_open_closes_once_process_stays_up():
+    sup = make()
+    for t in (0, 1, 2):
+        sup.record_restart(t)
+    assert sup.allow(200)
+    sup.record_restart(200)
+    sup.record_running(230)
+    assert sup.state == RestartSupervisor.HALF_OPEN
+    sup.record_running(260)
+    assert sup.state == RestartSupervisor.CLOSED and sup.failures == 0
+    assert sup.allow(260)
+
+
+def test_window_forgets_old_restarts():
+    sup = make(window=50)
+    sup.record_restart(0)
+    sup.record_restart(30)
+    sup.record_restart(60)  # 第一次重启已在窗口之外，不熔断
+    assert sup.state == RestartSupervisor.CLOSED
+    assert "窗口内重启=2/3" in sup.summary(60)
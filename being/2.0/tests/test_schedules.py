@@ -0,0 +1,161 @@
+import pytest
+
+
+def test_validate_schedule_rejects_control_characters_and_percent(app):
+    for name in ("x\n* * * * * rm -rf ~", "a\rb", "50%"):
+        with pytest.raises(ValueError):
+            app.validate_schedule({"name": name, "time": "22:00", "days": [1]})
+
+
+def test_cron_entry_keeps_name_on_one_line(app):
+    entry = app.CronBackend().compile(
+        {"name": "x\n* * * * * rm -rf ~ %", "type": "关机", "time": "22:30", "days": [1, 7]})
+    assert "\n" not in entry
+    assert entry.startswith("30 22 * * 1,0 systemctl poweroff  # ")
+    assert "%" not in entry.split("#", 1)[1]
+
+
+SCHEDULES = [
+    {"name": "a", "type": "关机", "time": "23:00", "days": [1, 2, 3, 4, 5], "enabled": True, "one_time": False},
+    {"name": "b", "type": "重启", "time": "01:00", "days": [7], "enabled": False, "one_time": False},
+]
+
+
+def test_apply_schedule_ops_is_all_or_nothing(app):
+    with pytest.raises(ValueError):
+        app.apply_schedule_ops(SCHEDULES, [{"op": "disable", "name": "a"}, {"op": "rm", "name": "missing"}])
+    assert SCHEDULES[0]["enabled"] is True
+
+
+def test_apply_schedule_ops_add_update_rm(app):
+    result, messages = app.apply_schedule_ops(SCHEDULES, [
+        {"op": "add", "schedule": {"name": "c", "time": "22:00", "days": [3, 1, 1]}},
+        {"op": "update", "name": "a", "schedule": {"time": "23:30"}},
+        {"op": "enable", "name": "b"},
+        {"op": "rm", "name": "c"},
+    ])
+    assert [s["name"] for s in result] == ["a", "b"]
+    assert result[0]["time"] == "23:30" and result[1]["enabled"] is True
+    assert len(messages) == 4
+
+
+def test_update_cannot_rename_onto_existing(app):
+    with pytest.raises(ValueError):
+        app.apply_schedule_ops(SCHEDULES, [{"op": "update", "name": "a", "schedule": {"name": "b"}}])
+
+
+def test_import_merges_by_name_or_replaces(app):
+    imported = [{"name": "b", "type": "关机", "time": "02:00", "days": [1]}]
+    merged, _ = app.apply_schedule_ops(SCHEDULES, [{"op": "import", "schedules": imported}])
+    assert [(s["name"], s["time"]) for s in merged] == [("a", "23:00"), ("b", "02:00")]
+    replaced, _ = app.apply_schedule_ops(SCHEDULES, [{"op": "import", "schedules": imported, "replace": True}])
+    assert [s["name"] for s in replaced] == ["b"]
+
+
+def test_import_requires_a_list(app):
+    for bad in (None, {"schedule": []}, "x"):
+        with pytest.raises(ValueError):
+            app.apply_schedule_ops(SCHEDULES, [{"op": "import", "schedules": bad, "replace": True}])
+
+
+def test_cli_import_rejects_object_without_schedules(app, tmp_path, capsys):
+    app.CONFIG_FILE.write_text('{"schedules": [{"name": "a", "type": "关机", "time": "23:00", "days": [1]}]}',
+                               encoding="utf-8")
+    source = tmp_path / "import.json"
+    source.write_text('{"items": []}', encoding="utf-8")
+    assert app.schedules_main("import", [str(source), "--replace"]) == 1
+    assert len(app.load_config()["schedules"]) == 1
+
+
+def test_validate_schedule(app):
+    assert app.validate_schedule({"name": " x ", "time": "07:05", "days": [5, 1, 5]}) == {
+        "name": "x", "type": "关机", "time": "07:05", "days": [1, 5], "enabled": True, "one_time": False}
+    for bad in ({"name": "x", "time": "25:00", "days": [1]},
+                {"name": "x", "time": "07:00", "days": [8]},
+                {"name": "x", "time": "07:00", "days": []},
+                {"name": "x", "type": "爆炸", "time": "07:00", "days": [1]},
+                {"time": "07:00", "days": [1]}):
+        with pytest.raises(ValueError):
+            app.validate_schedule(bad)
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.calls = []
+
+    def sync(self, schedules):
+        self.calls.append(list(schedules))
+
+
+def test_offload_entries_cleared_only_when_turned_off(app):
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore()
+    backend = core.offload = RecordingBackend()
+    core.apply_schedules()
+    core.apply_schedules()
+    assert backend.calls == [[]]  # 启动时清理一次残留，之后不再查询系统计划
+
+    core.config["offload_schedules"] = True
+    core.apply_schedules()
+    core.config["offload_schedules"] = False
+    core.apply_schedules()
+    core.apply_schedules()
+    assert backend.calls == [[], [], []]
+    core.engine.sync([])
+
+
+def test_task_names_are_unique_per_schedule(app):
+    names = {app.TaskSchedulerBackend.task_name(n) for n in ("a/b", "a_b", "A_b", "a:b")}
+    assert len(names) == 4
+    assert all(not set('\\/:*?"<>|') & set(n) for n in names)
+
+
+class FakeTaskScheduler:
+    def __init__(self, app, monkeypatch, task_dir, query=None):
+        self.backend = app.TaskSchedulerBackend()
+        self.installed, self.removed = [], []
+        monkeypatch.setattr(self.backend, "TASK_DIR", task_dir)
+        monkeypatch.setattr(self.backend, "install", lambda name, content: self.installed.append(name))
+        monkeypatch.setattr(self.backend, "remove", self.removed.append)
+
+        def fake_query(*args):
+            if query is None:
+                raise RuntimeError("schtasks 不可用")
+            return query(*args)
+
+        monkeypatch.setattr(self.backend, "_query", fake_query)
+
+
+NIGHT = {"name": "夜间", "type": "关机", "time": "23:00", "days": [1, 2]}
+
+
+def test_unreadable_task_is_not_reinstalled_every_sync(app, monkeypatch, tmp_path):
+    fake = FakeTaskScheduler(app, monkeypatch, tmp_path)
+    # 读不出内容的任务文件（这里用同名目录模拟），schtasks 也查不到
+    (tmp_path / app.TaskSchedulerBackend.task_name("夜间")).mkdir()
+    fake.backend.sync([NIGHT])
+    assert fake.installed == [] and fake.removed == []
+
+
+def test_registered_falls_back_to_schtasks_when_folder_is_denied(app, monkeypatch, tmp_path):
+    backend = app.TaskSchedulerBackend()
+    name = backend.task_name("夜间")
+    digest = "0" * 40
+    xml = (f"<Tasks><!-- \\Microsoft\\Other --><Task>x</Task>"
+           f"<!-- \\{app.OFFLOAD_TASK_FOLDER}\\{name} --><Task>lazy-shutdown:{digest}</Task></Tasks>")
+    fake = FakeTaskScheduler(app, monkeypatch, tmp_path / "denied", query=lambda *args: xml)
+    monkeypatch.setattr(app.Path, "iterdir", lambda self: (_ for _ in ()).throw(PermissionError(13, "denied")))
+    assert fake.backend.registered() == {name: digest}
+
+
+def test_expired_offloaded_one_time_schedule_is_pruned_with_a_single_save(app, monkeypatch):
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore()
+    backend = core.offload = RecordingBackend()
+    core.config["offload_schedules"] = True
+    core.config["schedules"] = [dict(NIGHT, name="过期", time="00:00", one_time=True), NIGHT]
+    saves = []
+    monkeypatch.setattr(app, "save_config", lambda config: saves.append([s["name"] for s in config["schedules"]]) or True)
+    core.apply_schedules()
+    assert saves == [["夜间"]]
+    assert backend.calls == [[NIGHT]]
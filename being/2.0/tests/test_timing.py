@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+
+MONDAY_NOON = datetime.datetime(2026, 10, 19, 12, 0)
+
+
+def schedule(app, time, days=(1, 2, 3, 4, 5, 6, 7), **extra):
+    return app.ShutdownSchedule.from_dict({"name": extra.pop("name", "s"), "type": "关机",
+                                           "time": time, "days": list(days), **extra})
+
+
+def test_next_fire_same_day_or_next_matching_weekday(app):
+    assert schedule(app, "23:00", days=[1]).next_fire(MONDAY_NOON) == MONDAY_NOON.replace(hour=23)
+    # 今天的时间已过，下一次是下周一
+    assert schedule(app, "08:00", days=[1]).next_fire(MONDAY_NOON) == datetime.datetime(2026, 10, 26, 8, 0)
+    assert schedule(app, "08:00", days=[3]).next_fire(MONDAY_NOON) == datetime.datetime(2026, 10, 21, 8, 0)
+    assert schedule(app, "12:00", days=[]).next_fire(MONDAY_NOON) is None
+
+
+def test_one_time_schedule_expires(app):
+    assert schedule(app, "13:00", one_time=True).next_fire(MONDAY_NOON) == MONDAY_NOON.replace(hour=13)
+    assert schedule(app, "11:59", one_time=True).next_fire(MONDAY_NOON) is None
+
+
+def test_next_enabled_fire_skips_disabled_and_broken(app):
+    schedules = [
+        {"name": "a", "type": "关机", "time": "13:00", "days": [1], "enabled": False},
+        {"name": "b", "type": "重启", "time": "bad", "days": [1]},
+        {"name": "c", "type": "休眠", "time": "18:00", "days": [1]},
+    ]
+    fire, data = app.next_enabled_fire(schedules, MONDAY_NOON)
+    assert fire == MONDAY_NOON.replace(hour=18) and data["name"] == "c"
+    assert app.next_enabled_fire([], MONDAY_NOON) == (None, None)
+
+
+def test_cancel_pending_skips_only_this_occurrence(app):
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore()
+    soon = datetime.datetime.now() + datetime.timedelta(minutes=30)
+    pending = schedule(app, f"{soon:%H:%M}")
+    # 不启动计划线程，只让取消逻辑能找到该计划
+    core.engine.schedules[pending.name] = pending
+    assert core.pending_action()["schedule"] is pending
+    core.cancel_pending()
+    assert pending.skip_at == pending.next_fire()
+    assert core.pending_action() is None
+
+
+def test_parse_instance_args(app):
+    argv = ["--minimized", "--shutdown-in", "30", "--snooze=10", "--cancel", "--show"]
+    assert app.parse_instance_args(argv) == [("shutdown_in", 30), ("snooze", 10), ("cancel", None), ("show", None)]
+    for bad in (["--shutdown-in"], ["--snooze=0"], ["--shutdown-in", "abc"]):
+        with pytest.raises(ValueError):
+            app.parse_instance_args(bad)
+
+
+@pytest.mark.parametrize("minutes", [0, -5, 1.5, "3", True, None])
+def test_quick_timer_rejects_non_positive_or_non_integer_minutes(app, minutes):
+    app.CONFIG_FILE.unlink(missing_ok=True)
+    core = app.SchedulerCore()
+    with pytest.raises(ValueError):
+        core.quick_timer(minutes)
+    with pytest.raises(ValueError):
+        core.handle_command({"cmd": "quick", "minutes": minutes})
+    with pytest.raises(ValueError):
+        core.snooze(minutes)
+    assert core.engine.quick is None
+
+
+def test_stale_quick_timer_does_not_fire_its_replacement(app):
+    engine = app.ScheduleEngine(app=None)
+    later = datetime.datetime.now() + datetime.timedelta(hours=1)
+    engine.start_quick(later, "关机")
+    stale = engine.quick
+    # 旧定时器已到期、正在等锁时被推迟：它不能执行新的快捷定时
+    engine.start_quick(later + datetime.timedelta(minutes=15), "关机")
+    engine._fire_quick(stale)
+    assert engine.quick is not None and engine.quick["time"] > later
+    engine.cancel_quick()